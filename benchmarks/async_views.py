@@ -0,0 +1,240 @@
+"""
+Benchmark: page throughput under WSGI, ASGI + sync views and ASGI + async views.
+
+Each mode runs in its own process, because the views are chosen when the
+URLconf is imported (settings.ASYNC_VIEWS):
+
+    wsgi        WSGIHandler, one thread per concurrent client (like a
+                threaded WSGI server), sync views
+    asgi-sync   ASGIHandler on one event loop, sync views (each request is
+                handed to a thread by Django)
+    asgi-async  ASGIHandler on one event loop, the views in async_views.py
+
+Requests go straight to Django's handlers, without a network server, so
+the numbers compare the request handling itself. The clients cycle through
+the home page, a search, a recipe detail page and a saved meal plan,
+logged in as the first user in the database.
+
+Usage (from the project root, with a database containing recipes, a meal
+plan and a user):
+    python benchmarks/async_views.py
+    python benchmarks/async_views.py --clients 50 --requests 2000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ["wsgi", "asgi-sync", "asgi-async"]
+
+
+def setup_django(mode):
+    sys.path.insert(0, PROJECT_DIR)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "foodApp.settings")
+    os.environ["DJANGO_ASYNC_VIEWS"] = "1" if mode == "asgi-async" else "0"
+    import django
+
+    django.setup()
+
+
+def prepare():
+    """Log in the first user; return (urls, session, cookie header)."""
+    from django.conf import settings
+    from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY
+    from django.contrib.auth import SESSION_KEY, get_user_model
+    from django.contrib.sessions.backends.db import SessionStore
+    from django.urls import reverse
+
+    from food_application.models import Item, MealPlan
+
+    user = get_user_model().objects.order_by("pk").first()
+    item = Item.objects.order_by("pk").only("pk").first()
+    meal_plan = MealPlan.objects.filter(days__isnull=False).order_by("pk").first()
+    if user is None or item is None or meal_plan is None:
+        raise SystemExit("The database needs a user, a recipe and a meal plan.")
+
+    session = SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.create()
+
+    urls = [
+        reverse("food_application:index"),
+        reverse("food_application:search") + "?q=chicken",
+        reverse("food_application:detail", args=[item.pk]),
+        reverse("food_application:view_meal_plan", args=[meal_plan.pk]),
+    ]
+    return urls, session, f"{settings.SESSION_COOKIE_NAME}={session.session_key}"
+
+
+def split_url(url):
+    path, _, query_string = url.partition("?")
+    return path, query_string
+
+
+def run_wsgi(urls, cookie, clients, total):
+    from django.core.wsgi import get_wsgi_application
+
+    application = get_wsgi_application()
+
+    def fetch(n):
+        path, query_string = split_url(urls[n % len(urls)])
+        environ = {
+            "REQUEST_METHOD": "GET",
+            "PATH_INFO": path,
+            "QUERY_STRING": query_string,
+            "SERVER_NAME": "localhost",
+            "SERVER_PORT": "80",
+            "HTTP_HOST": "localhost",
+            "HTTP_COOKIE": cookie,
+            "wsgi.input": BytesIO(),
+            "wsgi.url_scheme": "http",
+        }
+        statuses = []
+        started = time.perf_counter()
+        response = application(environ, lambda status, headers: statuses.append(status))
+        try:
+            b"".join(response)
+        finally:
+            response.close()  # Sends request_finished (closes the connection)
+        check_status(statuses[0], path)
+        return time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        return list(executor.map(fetch, range(total)))
+
+
+def run_asgi(urls, cookie, clients, total):
+    from django.core.asgi import get_asgi_application
+
+    application = get_asgi_application()
+
+    async def fetch(n):
+        path, query_string = split_url(urls[n % len(urls)])
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query_string.encode(),
+            "root_path": "",
+            "headers": [(b"host", b"localhost"), (b"cookie", cookie.encode())],
+            "client": ("127.0.0.1", 50000),
+            "server": ("localhost", 80),
+        }
+        request_sent = False
+        disconnected = asyncio.Event()
+        status = None
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await disconnected.wait()  # Never set: the client stays connected
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        started = time.perf_counter()
+        await application(scope, receive, send)
+        check_status(status, path)
+        return time.perf_counter() - started
+
+    async def main():
+        queue = iter(range(total))
+        latencies = []
+
+        async def client():
+            for n in queue:
+                latencies.append(await fetch(n))
+
+        await asyncio.gather(*(client() for _ in range(clients)))
+        return latencies
+
+    return asyncio.run(main())
+
+
+def check_status(status, path):
+    if not str(status).startswith("200"):
+        raise SystemExit(f"GET {path} returned {status}")
+
+
+def run_mode(args):
+    """Run one mode in this process and print its results as JSON."""
+    setup_django(args.mode)
+    urls, session, cookie = prepare()
+    run = run_wsgi if args.mode == "wsgi" else run_asgi
+    try:
+        run(urls, cookie, args.clients, len(urls) * 5)  # Warm up caches
+        started = time.perf_counter()
+        latencies = run(urls, cookie, args.clients, args.requests)
+        elapsed = time.perf_counter() - started
+    finally:
+        session.delete()
+
+    latencies.sort()
+    print(
+        json.dumps(
+            {
+                "requests_per_second": len(latencies) / elapsed,
+                "p50_ms": statistics.median(latencies) * 1000,
+                "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+            }
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--mode", choices=MODES, help="Run only this mode")
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args)
+        return
+
+    print(f"{args.clients} concurrent clients, {args.requests} requests per mode")
+    print(f"{'mode':<12} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for mode in MODES:
+        output = subprocess.run(
+            [
+                sys.executable,
+                os.path.abspath(__file__),
+                "--mode",
+                mode,
+                "--clients",
+                str(args.clients),
+                "--requests",
+                str(args.requests),
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"{mode:<12} {result['requests_per_second']:8.1f} "
+            f"{result['p50_ms']:8.1f} {result['p95_ms']:8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
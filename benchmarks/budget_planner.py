@@ -0,0 +1,83 @@
+"""
+Benchmark: budget-constrained plans as the catalog grows.
+
+Times plan_numpy() (when NumPy is installed) and plan_python() on synthetic
+(id, item_price) columns of 1,000 to 1,000,000 recipes, priced $1-$40 like
+the seed data, under three constraint sets:
+
+    loose       a $200 budget for 7 recipes: the first batch fits
+    per-day     a $10 price limit and the 70 recipes of 10 recent plans
+    tight       a $20 budget: rejection sampling gives up, greedy repair
+
+Usage (from the project root):
+    python benchmarks/budget_planner.py
+    python benchmarks/budget_planner.py --sizes 1000 50000 --repeat 20
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from food_application.planner import np, plan_numpy, plan_python  # noqa: E402
+
+SCENARIOS = {
+    "loose": {"budget": 200, "max_price": None, "recent": 0},
+    "per-day": {"budget": None, "max_price": 10, "recent": 70},
+    "tight": {"budget": 20, "max_price": None, "recent": 0},
+}
+
+
+def make_catalog(size):
+    rng = random.Random(size)
+    ids = array("q", range(1, size + 1))
+    prices = array("q", (rng.randint(1, 40) for _ in range(size)))
+    return ids, prices
+
+
+def time_plans(plan, ids, prices, scenario, repeat):
+    excluded = set(range(1, min(scenario["recent"], len(ids)) + 1))
+    timings = []
+    for seed in range(repeat):
+        started = time.perf_counter()
+        plan(ids, prices, 7, scenario["budget"], scenario["max_price"], excluded, seed)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000]
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    implementations = {"python": plan_python}
+    if np is not None:
+        implementations["numpy"] = plan_numpy
+    else:
+        print("NumPy is not installed, timing the pure-Python planner only")
+
+    print(f"Median ms per 7-day plan over {args.repeat} plans")
+    print(f"{'recipes':>9} {'backend':<8} " + " ".join(f"{s:>9}" for s in SCENARIOS))
+    for size in args.sizes:
+        ids, prices = make_catalog(size)
+        columns = {"python": (ids, prices)}
+        if np is not None:
+            columns["numpy"] = (np.array(ids), np.array(prices))
+        for backend, plan in implementations.items():
+            medians = [
+                time_plans(plan, *columns[backend], scenario, args.repeat)
+                for scenario in SCENARIOS.values()
+            ]
+            print(f"{size:>9} {backend:<8} " + " ".join(f"{m:9.2f}" for m in medians))
+
+
+if __name__ == "__main__":
+    main()
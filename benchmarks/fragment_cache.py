@@ -0,0 +1,98 @@
+"""
+Benchmark: rendering a recipe grid with and without the fragment cache.
+
+Renders home/index.html with an item_list of N recipes (1,000 by default,
+built in memory, no database needed) in three ways:
+
+    uncached    the "fragments" cache is a DummyCache, like before the
+                {% cache %} tags: every card and the navbar are rendered
+    cold        an empty local-memory cache: every fragment is rendered
+                and stored
+    warm        the same cache, now full: every fragment is a cache hit
+
+Usage (from the project root):
+    python benchmarks/fragment_cache.py
+    python benchmarks/fragment_cache.py --items 5000 --repeat 20
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "foodApp.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.cache import caches  # noqa: E402
+from django.template.loader import get_template  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+
+from food_application.models import Item  # noqa: E402
+
+TEMPLATE = "food_application/home/index.html"
+LOCMEM = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+
+
+def make_context(item_count):
+    items = [
+        Item(
+            id=n,
+            version=1,
+            item_name=f"Recipe {n}",
+            item_description="A hearty weeknight dinner with plenty of "
+            "vegetables, ready in under an hour. " * 3,
+            item_price=n % 40,
+        )
+        for n in range(1, item_count + 1)
+    ]
+    user = SimpleNamespace(is_authenticated=True, pk=1, username="bench")
+    return {"item_list": items, "user": user, "total_recipes": item_count}
+
+
+def time_renders(context, repeat):
+    template = get_template(TEMPLATE)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        template.render(context)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    context = make_context(args.items)
+    results = {}
+    dummy = {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+    with override_settings(CACHES={"default": LOCMEM, "fragments": dummy}):
+        time_renders(context, 1)  # Load and compile the templates
+        results["uncached"] = time_renders(context, args.repeat)
+
+    fragments = {**LOCMEM, "LOCATION": "bench", "OPTIONS": {"MAX_ENTRIES": 100000}}
+    with override_settings(CACHES={"default": LOCMEM, "fragments": fragments}):
+        caches["fragments"].clear()
+        results["cold"] = time_renders(context, 1)
+        results["warm"] = time_renders(context, args.repeat)
+
+    print(f"Rendering {TEMPLATE} with {args.items} recipe cards")
+    print(f"{'':<10} {'min ms':>9} {'median ms':>10}")
+    for name, timings in results.items():
+        print(f"{name:<10} {min(timings):9.1f} {statistics.median(timings):10.1f}")
+    speedup = statistics.median(results["uncached"]) / statistics.median(
+        results["warm"]
+    )
+    print(f"Warm cache: {speedup:.1f}x faster than uncached")
+
+
+if __name__ == "__main__":
+    main()
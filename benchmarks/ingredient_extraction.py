@@ -0,0 +1,84 @@
+"""
+Benchmark: streaming ingredient extractor vs. the BeautifulSoup version.
+
+Builds large recipes shaped like TinyMCE output (headings, paragraphs with
+inline formatting, long ingredient and step lists) and times both
+implementations on them.
+
+Usage (from the project root):
+    python benchmarks/ingredient_extraction.py
+    python benchmarks/ingredient_extraction.py --ingredients 500 --repeat 20
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from food_application.ingredients import (  # noqa: E402
+    extract_ingredients_from_html,
+    extract_ingredients_from_html_bs4,
+)
+
+UNITS = ["cups", "tbsp", "tsp", "oz", "lb", "g", "cloves", "cans", "slices"]
+FOODS = ["flour", "sugar", "butter", "garlic", "onion", "tomatoes", "rice", "beef"]
+
+
+def make_recipe(ingredient_count, step_count):
+    """Return recipe HTML similar to what the TinyMCE editor saves."""
+    parts = [
+        "<p>A family favourite. <em>Serves 4</em> &ndash; ready in "
+        "<strong>45 minutes</strong>.</p>",
+        '<p><img src="https://example.com/dish.jpg" alt="dish" width="600"></p>',
+        "<h2>Ingredients</h2>",
+        "<ul>",
+    ]
+    for i in range(ingredient_count):
+        unit = UNITS[i % len(UNITS)]
+        food = FOODS[i % len(FOODS)]
+        parts.append(
+            f"<li>{i % 4 + 1}&frac12; {unit} <strong>{food}</strong> "
+            f"#{i} (finely chopped)&nbsp;</li>"
+        )
+    parts.append("</ul><h2>Instructions</h2><ol>")
+    for i in range(step_count):
+        parts.append(
+            f'<li><p style="text-align: left;">Step {i}: stir the '
+            f"<em>{FOODS[i % len(FOODS)]}</em> and cook for {i} minutes.</p></li>"
+        )
+    parts.append("</ol><p>&nbsp;</p>")
+    return "\n".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ingredients", type=int, default=200)
+    parser.add_argument("--steps", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    html_content = make_recipe(args.ingredients, args.steps)
+    assert extract_ingredients_from_html(html_content) == (
+        extract_ingredients_from_html_bs4(html_content)
+    ), "implementations disagree"
+
+    print(f"Recipe size: {len(html_content) / 1024:.1f} KiB, repeat={args.repeat}")
+    results = {}
+    for label, func in [
+        ("BeautifulSoup", extract_ingredients_from_html_bs4),
+        ("HTMLParser (streaming)", extract_ingredients_from_html),
+    ]:
+        seconds = min(
+            timeit.repeat(lambda: func(html_content), number=args.repeat, repeat=3)
+        )
+        results[label] = seconds / args.repeat
+        print(f"{label:<24} {results[label] * 1000:8.2f} ms per recipe")
+
+    speedup = results["BeautifulSoup"] / results["HTMLParser (streaming)"]
+    print(f"Speedup: {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
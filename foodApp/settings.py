@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,11 +45,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so it times the whole request (see food_application/middleware.py)
+    "food_application.middleware.QueryInstrumentationMiddleware",
+    # Before anything reading the database (see food_application/routers.py)
+    "food_application.routers.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    # After AuthenticationMiddleware, it needs request.user
+    "food_application.profiling.ProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -57,7 +64,10 @@ ROOT_URLCONF = "foodApp.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # Django templates, timed for the Server-Timing header
+        # (food_application/middleware.py)
+        "BACKEND": "food_application.middleware.TimedDjangoTemplates",
+        "NAME": "django",
         "DIRS": [],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -83,6 +93,75 @@ DATABASES = {
     }
 }
 
+# Read replica (food_application/routers.py): GET requests read from it,
+# everything else uses "default". Locally, point DJANGO_REPLICA_DB at a second
+# SQLite file and fill it with `python manage.py sync_replica`. A client that
+# just wrote keeps reading from the primary for REPLICA_PIN_SECONDS.
+
+if os.environ.get("DJANGO_REPLICA_DB"):
+    DATABASES["replica"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.environ["DJANGO_REPLICA_DB"],
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["food_application.routers.PrimaryReplicaRouter"]
+REPLICA_PIN_SECONDS = 15
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory is per process; with several workers, a shared backend such as
+# "django.core.cache.backends.filebased.FileBasedCache" (LOCATION = a directory)
+# lets them share cached pages and their hit/miss counters.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # {% cache %} fragments: the navbar and one card per recipe, more entries
+    # than locmem's default of 300
+    "fragments": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "fragments",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+
+RECIPE_DETAIL_CACHE_ALIAS = "default"
+
+# Serve the busiest pages with native async views (food_application/async_views.py).
+# foodApp/asgi.py turns this on; set DJANGO_ASYNC_VIEWS=0 to run the sync views
+# under ASGI instead.
+
+ASYNC_VIEWS = os.environ.get("DJANGO_ASYNC_VIEWS", "0") == "1"
+
+# Query instrumentation (food_application/middleware.py): a query repeated
+# this many times in one request is reported as a possible N+1, and views
+# going over their @query_budget are logged, or raise an error in strict
+# mode. The view tests turn strict mode on with override_settings.
+
+QUERY_REPEAT_THRESHOLD = 5
+QUERY_BUDGET_STRICT = os.environ.get("DJANGO_QUERY_BUDGET_STRICT", "0") == "1"
+
+# Request profiling (food_application/profiling.py): staff users can profile
+# a page with ?_profile=cpu,memory; besides, this fraction of all requests is
+# profiled in PROFILING_SAMPLE_MODES. Results are written to PROFILING_DIR; the
+# files of sampled requests are logged at INFO by "food_application.profiling".
+
+PROFILING_DIR = os.environ.get("DJANGO_PROFILING_DIR", BASE_DIR / "profiles")
+PROFILING_SAMPLE_RATE = float(os.environ.get("DJANGO_PROFILING_SAMPLE_RATE", "0"))
+PROFILING_SAMPLE_MODES = ["cpu"]
+PROFILING_TOP_ALLOCATIONS = 25
+
+# Warm-up (food_application/warmup.py): with DJANGO_WARMUP=1, every process
+# compiles the templates, builds the URL resolver and fills the caches on
+# startup, before serving requests (and before forking with gunicorn
+# --preload). `python manage.py warmup` runs the same phases and times them.
+
+WARMUP_ON_STARTUP = os.environ.get("DJANGO_WARMUP", "0") == "1"
+WARMUP_RECIPES = 100
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -150,3 +229,9 @@ LOGOUT_REDIRECT_URL = "login"
 # Media files (Uploaded by users)
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+
+# Profile image thumbnails (users/thumbnails.py), stored under MEDIA_ROOT.
+# {% thumbnail_url %} rounds other sizes up to one of these.
+THUMBNAIL_SIZES = [64, 128, 256]
+THUMBNAIL_DIR = "thumbnails"
+THUMBNAIL_QUALITY = 85
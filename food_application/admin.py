@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.db.models import Count
 from .models import Item, MealPlan, MealPlanDay, ShoppingList
 
 
@@ -16,15 +17,27 @@ class MealPlanAdmin(admin.ModelAdmin):
     search_fields = ["name", "notes"]
     inlines = [MealPlanDayInline]
 
+    def get_queryset(self, request):
+        # Count the days in the list query instead of one query per row
+        return super().get_queryset(request).annotate(day_count=Count("days"))
+
     def get_days_count(self, obj):
-        return obj.days.count()
+        return obj.day_count
 
     get_days_count.short_description = "Number of Days"
+    get_days_count.admin_order_field = "day_count"
+
+
+# Custom admin for MealPlanDay
+class MealPlanDayAdmin(admin.ModelAdmin):
+    # __str__ shows the recipe name; join it instead of one query per row
+    list_select_related = ["recipe"]
 
 
 # Custom admin for ShoppingList
 class ShoppingListAdmin(admin.ModelAdmin):
     list_display = ["meal_plan", "created_at", "get_ingredient_count"]
+    list_select_related = ["meal_plan"]
     list_filter = ["created_at"]
     search_fields = ["meal_plan__name", "ingredients"]
     readonly_fields = ["created_at"]
@@ -40,5 +53,5 @@ class ShoppingListAdmin(admin.ModelAdmin):
 # Register your models here.
 admin.site.register(Item)
 admin.site.register(MealPlan, MealPlanAdmin)
-admin.site.register(MealPlanDay)
+admin.site.register(MealPlanDay, MealPlanDayAdmin)
 admin.site.register(ShoppingList, ShoppingListAdmin)
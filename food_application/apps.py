@@ -1,6 +1,27 @@
+import warnings
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class FoodApplicationConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "food_application"
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from .middleware import install_query_recorder
+
+        # Count the queries of every connection, in every thread, for
+        # QueryInstrumentationMiddleware (a no-op outside of a request)
+        connection_created.connect(install_query_recorder)
+
+        if getattr(settings, "WARMUP_ON_STARTUP", False):
+            from .warmup import warm_up
+
+            # Filling the caches queries the database, which Django warns
+            # against during initialization; it is deliberate here
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)
+                warm_up(recipes=getattr(settings, "WARMUP_RECIPES", 100))
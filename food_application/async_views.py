@@ -0,0 +1,160 @@
+"""
+Native async versions of the busiest read-only pages.
+
+Under an ASGI server (foodApp/asgi.py) a sync view occupies a worker thread
+for the whole request. These views run on the event loop instead and use
+Django's async ORM (aget, ain_bulk, acount, async for). They are routed in
+place of their sync twins in views.py when settings.ASYNC_VIEWS is on, and
+render exactly the same HTML.
+
+Django templates can't be rendered asynchronously, so the finished page is
+still rendered with sync_to_async, like any other blocking call.
+"""
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.core.paginator import Paginator
+from django.db.models import Prefetch, Q
+from django.http import Http404
+from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.utils.translation import gettext as _
+
+from . import search as search_index
+from .conditional import (
+    conditional_page,
+    meal_plan_last_modified,
+    recipe_last_modified,
+)
+from .middleware import query_budget
+from .models import Item, MealPlan, MealPlanDay
+from .page_cache import recipe_detail_cache
+from .sampling import recipe_sampler
+from .views import (
+    ITEM_CARD_FIELDS,
+    MEAL_PLAN_RECIPE_FIELDS,
+    SEARCH_PAGE_SIZE,
+    IndexClassView,
+    RecipeDetailView,
+)
+
+render_async = sync_to_async(render)
+
+
+async def aget_page(paginator, number):
+    """Paginator.get_page() for a QuerySet, running the queries asynchronously."""
+    paginator.count = await paginator.object_list.acount()
+    page_obj = paginator.get_page(number)
+    page_obj.object_list = [obj async for obj in page_obj.object_list]
+    return page_obj
+
+
+@query_budget(4)
+async def index(request):
+    """Async IndexClassView: the home page grid of recipe cards."""
+    view = IndexClassView()
+    view.setup(request)
+    request.user = await request.auser()
+    if not request.user.is_authenticated:
+        return redirect_to_login(
+            request.get_full_path(),
+            view.get_login_url(),
+            view.get_redirect_field_name(),
+        )
+
+    view.object_list = view.paginate_rows(
+        [item async for item in view.get_page_query()]
+    )
+    context = view.get_context_data(total_recipes=await recipe_sampler.acount())
+    return await render_async(request, view.template_name, context)
+
+
+@query_budget(4)
+@conditional_page(recipe_last_modified)
+async def recipe_detail(request, id):
+    """Async RecipeDetailView, using the same rendered-body cache."""
+    detail_body = await sync_to_async(recipe_detail_cache.get)(id)
+    cache_status = "HIT"
+
+    if detail_body is None:
+        cache_status = "MISS"
+        try:
+            item = await Item.objects.aget(pk=id)
+        except Item.DoesNotExist:
+            raise Http404(
+                _("No %(verbose_name)s found matching the query")
+                % {"verbose_name": Item._meta.verbose_name}
+            )
+        detail_body = await sync_to_async(render_to_string)(
+            RecipeDetailView.body_template_name,
+            {RecipeDetailView.context_object_name: item},
+        )
+        await sync_to_async(recipe_detail_cache.set)(id, detail_body)
+
+    response = await render_async(
+        request,
+        RecipeDetailView.template_name,
+        {"detail_body": mark_safe(detail_body)},
+    )
+    response["X-Recipe-Cache"] = cache_status
+    return response
+
+
+@query_budget(5)
+async def search(request):
+    """Async search (see views.search)."""
+    query = request.GET.get("q", "")
+
+    if query and search_index.search_enabled():
+        paginator = Paginator(search_index.SearchResults(query), SEARCH_PAGE_SIZE)
+        # The index is read with raw SQL, which has no async API
+        page_obj = await sync_to_async(paginator.get_page)(request.GET.get("page"))
+        items_by_id = await Item.objects.only(*ITEM_CARD_FIELDS).ain_bulk(
+            page_obj.object_list
+        )
+        results = [items_by_id[pk] for pk in page_obj.object_list if pk in items_by_id]
+    else:
+        if query:
+            results = Item.objects.filter(
+                Q(item_name__icontains=query)
+                | Q(item_description__icontains=query)
+                | Q(item_recipe__icontains=query)
+            ).distinct()
+        else:
+            results = Item.objects.none()
+        paginator = Paginator(
+            results.only(*ITEM_CARD_FIELDS).order_by("id"), SEARCH_PAGE_SIZE
+        )
+        page_obj = await aget_page(paginator, request.GET.get("page"))
+        results = page_obj.object_list
+
+    context = {
+        "results": results,
+        "query": query,
+        "result_count": paginator.count,
+        "page_obj": page_obj,
+    }
+    return await render_async(
+        request, "food_application/home/search_results.html", context
+    )
+
+
+@query_budget(5)
+@conditional_page(meal_plan_last_modified)
+async def view_meal_plan(request, plan_id):
+    """Async view_meal_plan: one query for the plan, one for its days."""
+    meal_plan = await MealPlan.objects.prefetch_related(
+        Prefetch(
+            "days",
+            queryset=MealPlanDay.objects.select_related("recipe").only(
+                "meal_plan", "day_of_week", "order", *MEAL_PLAN_RECIPE_FIELDS
+            ),
+        )
+    ).aget(id=plan_id)
+    days = meal_plan.days.all()  # Already prefetched, no query
+
+    context = {"meal_plan": meal_plan, "days": days}
+    return await render_async(
+        request, "food_application/meal_planning/view_meal_plan.html", context
+    )
@@ -0,0 +1,153 @@
+"""
+Conditional GET (ETag / Last-Modified -> 304 Not Modified) for pages.
+
+Each page gets a "last modified" function that reads only timestamps, with
+a cheap indexed query, never the full row. If the browser already has the
+current version of the page it gets an empty 304 response and the view
+doesn't run at all.
+
+The ETag also includes the user id, because every page shows the logged in
+user in the navbar. It is read from the session, without loading the user,
+so a 304 for a logged in user costs the session and the timestamp queries.
+Requests with pending flash messages are always served in full, since the
+messages would otherwise never be displayed.
+
+A view that changes its own page's timestamps while rendering (e.g. the
+shopping list, which saves its ShoppingList) calls page_changed(): the
+validators are then computed again after the view, so the response doesn't
+carry an ETag that is already stale.
+
+The decorator works on both sync and async views.
+"""
+
+import hashlib
+from calendar import timegm
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.auth import SESSION_KEY
+from django.contrib.messages import get_messages
+from django.db.models import Max
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import condition
+
+from .models import Item, MealPlan
+
+
+def conditional_page(last_modified_func):
+    """
+    Decorator adding ETag/Last-Modified validators to a GET view.
+
+    Args:
+        last_modified_func: Called with the view's arguments; returns the
+            datetime the page content last changed, or None (no validators,
+            e.g. when the object doesn't exist)
+    """
+
+    def get_last_modified(request, *args, **kwargs):
+        # Both validators need the timestamp; query for it only once
+        if not hasattr(request, "_page_last_modified"):
+            request._page_last_modified = last_modified_func(request, *args, **kwargs)
+        return request._page_last_modified
+
+    def get_etag(request, *args, **kwargs):
+        last_modified = get_last_modified(request, *args, **kwargs)
+        if last_modified is None:
+            return None
+        key = f"{request.path}:{last_modified.isoformat()}:{session_user_id(request)}"
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def refresh_validators(request, response, *args, **kwargs):
+        """Replace the validators condition() set before a page_changed() view."""
+        if not getattr(request, "_page_changed", False) or response.status_code != 200:
+            return response
+        last_modified = get_last_modified(request, *args, **kwargs)
+        if last_modified is not None:
+            response["ETag"] = quote_etag(get_etag(request, *args, **kwargs))
+            response["Last-Modified"] = http_date(timegm(last_modified.utctimetuple()))
+        return response
+
+    def decorator(view_func):
+        conditional_view = condition(
+            etag_func=get_etag, last_modified_func=get_last_modified
+        )(view_func)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD") or has_messages(request):
+                return view_func(request, *args, **kwargs)
+            response = conditional_view(request, *args, **kwargs)
+            return refresh_validators(request, response, *args, **kwargs)
+
+        if iscoroutinefunction(view_func):
+
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method not in ("GET", "HEAD") or await sync_to_async(
+                    has_messages
+                )(request):
+                    return await view_func(request, *args, **kwargs)
+                # condition() calls the validators synchronously: load the
+                # session and the timestamp first, so they don't need the
+                # database
+                await sync_to_async(get_etag)(request, *args, **kwargs)
+                response = await conditional_view(request, *args, **kwargs)
+                return await sync_to_async(refresh_validators)(
+                    request, response, *args, **kwargs
+                )
+
+            return async_wrapper
+
+        return wrapper
+
+    return decorator
+
+
+def has_messages(request):
+    return bool(get_messages(request))
+
+
+def session_user_id(request):
+    """The logged in user's id, from the session (no query for the user)."""
+    if hasattr(request, "session"):
+        return request.session.get(SESSION_KEY)
+    user = getattr(request, "user", None)  # No SessionMiddleware
+    return str(user.pk) if user is not None and user.pk is not None else None
+
+
+def page_changed(request):
+    """Recompute the validators after this view (see the module docstring)."""
+    request.__dict__.pop("_page_last_modified", None)
+    request._page_changed = True
+
+
+def latest(*timestamps):
+    timestamps = [timestamp for timestamp in timestamps if timestamp is not None]
+    return max(timestamps) if timestamps else None
+
+
+def recipe_last_modified(request, id):
+    """When the recipe last changed."""
+    return Item.objects.filter(pk=id).values_list("updated_at", flat=True).first()
+
+
+def meal_plan_last_modified(request, plan_id):
+    """When the plan, one of its days or one of its recipes last changed."""
+    row = (
+        MealPlan.objects.filter(pk=plan_id)
+        .annotate(recipes_updated_at=Max("days__recipe__updated_at"))
+        .values_list("updated_at", "recipes_updated_at")
+        .first()
+    )
+    return latest(*row) if row else None
+
+
+def shopping_list_last_modified(request, plan_id):
+    """Like meal_plan_last_modified, plus changes to the list's exclusions."""
+    row = (
+        MealPlan.objects.filter(pk=plan_id)
+        .annotate(recipes_updated_at=Max("days__recipe__updated_at"))
+        .values_list("updated_at", "recipes_updated_at", "shopping_list__updated_at")
+        .first()
+    )
+    return latest(*row) if row else None
@@ -0,0 +1,175 @@
+"""
+Streaming exports of the recipe catalog and the saved meal plans.
+
+Rows are read with QuerySet.iterator(chunk_size=...), only the exported
+columns are loaded and every row is serialized as soon as it is read, so
+memory use doesn't grow with the size of the table. The same generators
+back the export views (StreamingHttpResponse) and the export_recipes /
+export_meal_plans management commands.
+
+Exports are ordered by (updated_at, id). For an incremental export, pass
+the cursor "<updated_at>,<id>" of the last row received last time: only
+rows changed after it are exported. A cursor may also be a timestamp on
+its own, meaning "changed at or after this time".
+"""
+
+import csv
+import json
+from datetime import datetime
+
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Item, MealPlan, MealPlanDay
+
+EXPORT_FORMATS = ["jsonl", "csv"]
+EXPORT_CHUNK_SIZE = 2000
+
+RECIPE_EXPORT_FIELDS = [
+    "id",
+    "item_name",
+    "item_description",
+    "item_recipe",
+    "item_price",
+    "item_image",
+    "version",
+    "updated_at",
+]
+MEAL_PLAN_EXPORT_FIELDS = ["id", "name", "notes", "created_at", "updated_at"]
+MEAL_PLAN_DAY_EXPORT_FIELDS = ["order", "day_of_week", "recipe_id"]
+
+# The CSV export has one row per day, repeating the plan's columns
+MEAL_PLAN_CSV_COLUMNS = MEAL_PLAN_EXPORT_FIELDS + [
+    f"day_{field}" for field in MEAL_PLAN_DAY_EXPORT_FIELDS
+]
+
+
+def parse_cursor(cursor):
+    """
+    Parse "<updated_at>" or "<updated_at>,<id>" into (datetime, id).
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    timestamp, _, last_id = cursor.partition(",")
+    updated_at = parse_datetime(timestamp.strip())
+    if updated_at is None:
+        raise ValueError(f"Invalid cursor timestamp: {timestamp!r}")
+    if timezone.is_naive(updated_at):
+        updated_at = timezone.make_aware(updated_at)
+    return updated_at, int(last_id) if last_id else 0
+
+
+def changed_since(queryset, cursor):
+    """Rows changed after the cursor (all rows if there is none), in cursor order."""
+    if cursor:
+        updated_at, last_id = parse_cursor(cursor)
+        queryset = queryset.filter(
+            Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=last_id)
+        )
+    return queryset.order_by("updated_at", "id")
+
+
+def recipe_rows(cursor=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Iterate over the recipes as dicts of RECIPE_EXPORT_FIELDS."""
+    queryset = changed_since(Item.objects.all(), cursor)
+    return queryset.values(*RECIPE_EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+
+
+def meal_plan_rows(cursor=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Iterate over the meal plans as dicts of MEAL_PLAN_EXPORT_FIELDS, each
+    with a "days" list. The days are fetched with one query per chunk.
+    """
+    queryset = (
+        changed_since(MealPlan.objects.all(), cursor)
+        .only(*MEAL_PLAN_EXPORT_FIELDS)
+        .prefetch_related(
+            Prefetch(
+                "days",
+                queryset=MealPlanDay.objects.only(
+                    "meal_plan", *MEAL_PLAN_DAY_EXPORT_FIELDS
+                ),
+            )
+        )
+    )
+    return (
+        {
+            **{field: getattr(plan, field) for field in MEAL_PLAN_EXPORT_FIELDS},
+            "days": [
+                {field: getattr(day, field) for field in MEAL_PLAN_DAY_EXPORT_FIELDS}
+                for day in plan.days.all()
+            ],
+        }
+        for plan in queryset.iterator(chunk_size=chunk_size)
+    )
+
+
+def export_recipes(export_format, cursor=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Iterate over the recipe catalog as JSONL or CSV text, a row at a time.
+
+    Raises:
+        ValueError: If the cursor is malformed (before anything is read)
+    """
+    rows = recipe_rows(cursor, chunk_size)
+    if export_format == "csv":
+        return csv_lines(
+            RECIPE_EXPORT_FIELDS,
+            ([row[field] for field in RECIPE_EXPORT_FIELDS] for row in rows),
+        )
+    return jsonl_lines(rows)
+
+
+def export_meal_plans(export_format, cursor=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Iterate over the meal plans and their days as JSONL or CSV text.
+
+    Raises:
+        ValueError: If the cursor is malformed (before anything is read)
+    """
+    rows = meal_plan_rows(cursor, chunk_size)
+    if export_format == "csv":
+        return csv_lines(MEAL_PLAN_CSV_COLUMNS, meal_plan_csv_rows(rows))
+    return jsonl_lines(rows)
+
+
+def meal_plan_csv_rows(rows):
+    """One CSV row per day; a plan without days gets one row with empty day columns."""
+    empty_day = dict.fromkeys(MEAL_PLAN_DAY_EXPORT_FIELDS, "")
+    for row in rows:
+        plan = [row[field] for field in MEAL_PLAN_EXPORT_FIELDS]
+        for day in row["days"] or [empty_day]:
+            yield plan + [day[field] for field in MEAL_PLAN_DAY_EXPORT_FIELDS]
+
+
+def jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps(row, default=export_value) + "\n"
+
+
+class Echo:
+    """File-like object whose write() returns the text, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(columns, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(
+            [
+                export_value(value) if isinstance(value, datetime) else value
+                for value in row
+            ]
+        )
+
+
+def export_value(value):
+    """Datetimes are exported in full ISO 8601, so they can be used as cursors."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot export {type(value).__name__}")
@@ -0,0 +1,489 @@
+"""
+Ingredient parsing helpers.
+
+These functions turn the TinyMCE HTML stored in ``Item.item_recipe`` into
+plain ingredient lines and strip the measurements off them so the same
+ingredient can be counted across recipes.
+
+This module deliberately does not import any Django models, so it can be
+used from worker processes (see the ``rebuild_ingredients`` command).
+"""
+
+import re
+from functools import lru_cache
+from html.parser import HTMLParser
+
+# Tags that can introduce an ingredient list ("<h2>Ingredients</h2>")
+HEADER_TAGS = frozenset(["h1", "h2", "h3", "h4", "h5", "h6", "p", "strong"])
+LIST_TAGS = frozenset(["ul", "ol"])
+
+# Tags that never have children (<br>, <img>, ...)
+VOID_TAGS = frozenset(
+    [
+        "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen",
+        "link", "menuitem", "meta", "param", "source", "track", "wbr",
+        "basefont", "bgsound", "command", "frame", "image", "isindex",
+        "nextid", "spacer",
+    ]
+)  # fmt: skip
+
+# Text inside these tags is not part of an ingredient line (scripts, styles...)
+NON_TEXT_TAGS = frozenset(["script", "style", "template", "rt", "rp"])
+
+INGREDIENT_HEADER_RE = re.compile(r"ingredient", re.IGNORECASE)
+
+# Measurement words stripped from the start of an ingredient line.
+# Each canonical unit maps to every spelling recipes use for it; the
+# measurement regex is built from this table (see build_measurement_pattern).
+UNIT_ALIASES = {
+    "cup": ["cup", "cups", "c."],
+    "tablespoon": ["tablespoon", "tablespoons", "tbsp"],
+    "teaspoon": ["teaspoon", "teaspoons", "tsp"],
+    "ounce": ["ounce", "ounces", "oz"],
+    "pound": ["pound", "pounds", "lb", "lbs"],
+    "gram": ["gram", "grams", "g"],
+    "kilogram": ["kilogram", "kilograms", "kg"],
+    "milliliter": ["milliliter", "milliliters", "ml"],
+    "liter": ["liter", "liters", "l"],
+    "pint": ["pint", "pints", "pt"],
+    "quart": ["quart", "quarts", "qt"],
+    "gallon": ["gallon", "gallons", "gal"],
+    "piece": ["piece", "pieces"],
+    "clove": ["clove", "cloves"],
+    "can": ["can", "cans"],
+    "package": ["package", "packages", "pkg"],
+    "slice": ["slice", "slices"],
+    # Sizes are not units, but are stripped the same way ("2 large eggs")
+    "medium": ["medium"],
+    "large": ["large"],
+    "small": ["small"],
+    "whole": ["whole"],
+}
+
+# Size words in UNIT_ALIASES: the amount before them is a count ("2 large eggs")
+SIZE_UNITS = frozenset(["medium", "large", "small", "whole"])
+
+# Unicode fraction characters allowed in the amount ("1½ cups")
+FRACTION_CHARS = "½¼¾⅓⅔⅛⅜⅝⅞"
+FRACTION_VALUES = {
+    "½": 1 / 2, "¼": 1 / 4, "¾": 3 / 4, "⅓": 1 / 3, "⅔": 2 / 3,
+    "⅛": 1 / 8, "⅜": 3 / 8, "⅝": 5 / 8, "⅞": 7 / 8,
+}  # fmt: skip
+
+# A leading amount: "1/2", "2", "1.5", "1 1/2", "1½" or "½"
+AMOUNT = (
+    r"\d+\s*/\s*\d+"
+    rf"|\d+(?:\.\d+)?(?:\s+\d+\s*/\s*\d+|\s*[{FRACTION_CHARS}])?"
+    rf"|[{FRACTION_CHARS}]"
+)
+AMOUNT_PART_RE = re.compile(rf"\d+\s*/\s*\d+|\d+(?:\.\d+)?|[{FRACTION_CHARS}]")
+
+PARENTHETICAL_RE = re.compile(r"\s*\([^)]*\)")
+
+
+class _Element:
+    """An open (or closed) tag seen by the streaming parser."""
+
+    __slots__ = ("name", "order", "lists_before", "child_count", "only_child", "parts")
+
+    def __init__(self, name, order, lists_before):
+        self.name = name
+        self.order = order  # Position of the start tag in the document
+        self.lists_before = lists_before  # How many lists started before this tag
+        self.child_count = 0
+        self.only_child = None  # The text or _Element child, if there is just one
+        self.parts = None  # Stripped text pieces, only used for <li>
+
+    def string(self):
+        """The single string inside this tag, like BeautifulSoup's ``.string``."""
+        if self.child_count != 1:
+            return None
+        if isinstance(self.only_child, _Element):
+            return self.only_child.string()
+        return self.only_child
+
+
+class IngredientListParser(HTMLParser):
+    """
+    Single-pass, event-driven ingredient extractor.
+
+    Instead of building a document tree, the parser keeps only a stack of
+    the currently open tags and records, as it streams through the HTML:
+    - every <ul>/<ol> with the <li> items inside it (in document order)
+    - every heading whose only text mentions "ingredient", and the first
+      list that starts after it
+
+    Tag nesting follows the same rules BeautifulSoup's "html.parser" builder
+    uses, so the results match the old tree-based implementation.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.lists = []  # Each list is a list of <li> _Elements
+        self.headers = []  # (header order, index of the list it introduces)
+        self._stack = []
+        self._text = []  # Text waiting for the next tag (one text node)
+        self._pending_headers = []  # Headers still waiting for a list
+        self._open_lists = []
+        self._open_items = []
+        self._non_text_depth = 0
+        self._order = 0
+
+    # Tree building -------------------------------------------------------
+
+    def _add_child(self, child):
+        if self._stack:
+            parent = self._stack[-1]
+            parent.child_count += 1
+            parent.only_child = child
+
+    def _flush_text(self):
+        if not self._text:
+            return
+        text = "".join(self._text)
+        self._text = []
+        self._add_child(text)
+        if self._open_items and not self._non_text_depth:
+            stripped = text.strip()
+            if stripped:
+                for item in self._open_items:
+                    item.parts.append(stripped)
+
+    def _push(self, name):
+        element = _Element(name, self._order, len(self.lists))
+        self._order += 1
+        self._add_child(element)
+        self._stack.append(element)
+
+        if name in LIST_TAGS:
+            for header_order in self._pending_headers:
+                self.headers.append((header_order, len(self.lists)))
+            self._pending_headers = []
+            self.lists.append([])
+            self._open_lists.append(self.lists[-1])
+        elif name == "li":
+            element.parts = []
+            for items in self._open_lists:
+                items.append(element)
+            self._open_items.append(element)
+        if name in NON_TEXT_TAGS:
+            self._non_text_depth += 1
+
+    def _pop(self):
+        element = self._stack.pop()
+        name = element.name
+
+        if name in LIST_TAGS:
+            self._open_lists.pop()
+        elif name == "li":
+            self._open_items.pop()
+        if name in NON_TEXT_TAGS:
+            self._non_text_depth -= 1
+
+        if name in HEADER_TAGS:
+            string = element.string()
+            if string is not None and INGREDIENT_HEADER_RE.search(string):
+                if element.lists_before < len(self.lists):
+                    # A list already started inside this tag
+                    self.headers.append((element.order, element.lists_before))
+                else:
+                    self._pending_headers.append(element.order)
+
+    # HTMLParser callbacks ------------------------------------------------
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        self._push(tag)
+        if tag in VOID_TAGS:
+            self._pop()
+
+    def handle_startendtag(self, tag, attrs):
+        self._flush_text()
+        self._push(tag)
+        self._pop()
+
+    def handle_endtag(self, tag):
+        self._flush_text()
+        # Close everything up to the most recent matching tag; a stray
+        # closing tag with nothing to match is ignored
+        for index in range(len(self._stack) - 1, -1, -1):
+            if self._stack[index].name == tag:
+                while len(self._stack) > index:
+                    self._pop()
+                break
+
+    def handle_data(self, data):
+        self._text.append(data)
+
+    def _handle_non_text(self, data):
+        # Comments, doctypes and CDATA count as children but are not
+        # part of an ingredient line
+        self._flush_text()
+        self._add_child(data)
+
+    handle_comment = _handle_non_text
+    handle_decl = _handle_non_text
+    handle_pi = _handle_non_text
+    unknown_decl = _handle_non_text
+
+    def close(self):
+        super().close()
+        self._flush_text()
+        while self._stack:
+            self._pop()
+
+    # Results -------------------------------------------------------------
+
+    def ingredients(self):
+        """Return the ingredient lines, deduplicated, in document order."""
+        # Method 1: the list that follows each "ingredient" heading
+        list_indexes = [index for order, index in sorted(self.headers)]
+        ingredients = _unique_item_texts(self.lists[i] for i in list_indexes)
+
+        # Method 2: If no ingredients were found, use every list in the content
+        if not ingredients:
+            ingredients = _unique_item_texts(self.lists)
+        return ingredients
+
+
+def _unique_item_texts(lists):
+    ingredients = []
+    seen = set()
+    for items in lists:
+        for item in items:
+            ingredient_text = "".join(item.parts)
+            if ingredient_text and ingredient_text not in seen:
+                seen.add(ingredient_text)
+                ingredients.append(ingredient_text)
+    return ingredients
+
+
+def extract_ingredients_from_html(html_content):
+    """
+    Extract ingredients from HTML recipe content.
+
+    This function streams through the HTML from the item_recipe field once
+    (see IngredientListParser) and looks for:
+    - A heading (or <p>/<strong>) containing "Ingredients", followed by a list
+    - Otherwise, any lists (<ul>, <ol>) in the content
+
+    Args:
+        html_content: HTML string from the item_recipe field
+
+    Returns:
+        A list of ingredient strings
+    """
+    if not html_content:
+        return []
+
+    parser = IngredientListParser()
+    parser.feed(html_content)
+    parser.close()
+    return parser.ingredients()
+
+
+class IngredientNormalizer:
+    """
+    Strips measurements from ingredient lines, with memoized results.
+
+    The regular expressions are compiled once, from the UNIT_ALIASES table,
+    when the normalizer is created. Results are kept in a bounded LRU cache
+    because the same lines ("1 tsp salt", "2 cloves garlic") show up in
+    many recipes.
+
+    parse() also returns the quantity and canonical unit of the measurement
+    it strips, so shopping lists can total them.
+
+    Usage:
+        normalizer.normalize("2 cups flour")           # "Flour"
+        normalizer.normalize_many(["1 tsp salt", ...])  # ["Salt", ...]
+        normalizer.parse("1½ Tbsp sugar")              # ("Sugar", 1.5, "tablespoon")
+    """
+
+    def __init__(self, unit_aliases=None, cache_size=4096):
+        if unit_aliases is None:
+            unit_aliases = UNIT_ALIASES
+        self.measurement_re = build_measurement_pattern(unit_aliases)
+        self.amount_re = build_amount_pattern(unit_aliases)
+        self.units = {
+            alias.lower(): "" if unit in SIZE_UNITS else unit
+            for unit, aliases in unit_aliases.items()
+            for alias in aliases
+        }
+        self.parenthetical_re = PARENTHETICAL_RE
+        # lru_cache on a per-instance function so each normalizer has its
+        # own cache (and its own hit/miss statistics via cache_info())
+        self.normalize = lru_cache(maxsize=cache_size)(self._normalize)
+        self.parse = lru_cache(maxsize=cache_size)(self._parse)
+        self.cache_info = self.normalize.cache_info
+        self.cache_clear = self.normalize.cache_clear
+
+    def _normalize(self, ingredient_text):
+        # Remove measurements from the beginning
+        cleaned = self.measurement_re.sub("", ingredient_text, count=1)
+
+        # Remove parenthetical notes like "(optional)" or "(or substitute X)"
+        cleaned = self.parenthetical_re.sub("", cleaned)
+
+        # Remove any leading/trailing whitespace and commas
+        cleaned = cleaned.strip().strip(",").strip()
+
+        # Capitalize first letter
+        if cleaned:
+            cleaned = cleaned[0].upper() + cleaned[1:]
+
+        return cleaned
+
+    def _parse(self, ingredient_text):
+        """
+        Return (name, quantity, unit) for an ingredient line.
+
+        quantity is a float and unit a UNIT_ALIASES key, or "" for a count
+        ("2 large eggs"). quantity is None unless normalize() stripped the
+        measurement off the name ("a pinch of salt", "2 eggs").
+        """
+        name = self.normalize(ingredient_text)
+        quantity, unit = None, ""
+        if self.measurement_re.match(ingredient_text):
+            match = self.amount_re.match(ingredient_text)
+            quantity = amount_value(match["amount"]) if match else None
+            if quantity is not None:
+                unit = self.units[match["unit"].lower()]
+        return name, quantity, unit
+
+    def normalize_many(self, ingredient_texts):
+        """Normalize a batch of ingredient lines, returning a list in the same order."""
+        normalize = self.normalize
+        return [normalize(ingredient_text) for ingredient_text in ingredient_texts]
+
+
+def build_measurement_pattern(unit_aliases):
+    """
+    Compile the "leading amount + unit" pattern from a unit alias table.
+
+    Matches: numbers, fractions, decimals, then one of the unit spellings
+    followed by whitespace, at the start of the line.
+    """
+    spellings = sorted(
+        {alias for aliases in unit_aliases.values() for alias in aliases},
+        key=lambda alias: (-len(alias), alias),
+    )
+    units = "|".join(re.escape(alias) for alias in spellings)
+    return re.compile(rf"^[\d\s/.,{FRACTION_CHARS}]*\s*(?:{units})\s+", re.IGNORECASE)
+
+
+def build_amount_pattern(unit_aliases):
+    """
+    Compile the pattern capturing the leading amount and unit of a line, for
+    the lines build_measurement_pattern() matches with a numeric amount.
+    """
+    spellings = sorted(
+        {alias for aliases in unit_aliases.values() for alias in aliases},
+        key=lambda alias: (-len(alias), alias),
+    )
+    units = "|".join(re.escape(alias) for alias in spellings)
+    return re.compile(
+        rf"^\s*(?P<amount>{AMOUNT})\s*(?P<unit>{units})\s+", re.IGNORECASE
+    )
+
+
+def amount_value(amount):
+    """The number an amount stands for ("1 1/2" -> 1.5), or None for "1/0"."""
+    value = 0.0
+    for part in AMOUNT_PART_RE.findall(amount):
+        if part in FRACTION_VALUES:
+            value += FRACTION_VALUES[part]
+        elif "/" in part:
+            numerator, denominator = (int(number) for number in part.split("/"))
+            if not denominator:
+                return None
+            value += numerator / denominator
+        else:
+            value += float(part)
+    return value
+
+
+def strip_measurements_from_ingredient(ingredient_text):
+    """
+    Remove measurement amounts from ingredient text, keeping only the ingredient name.
+
+    This function removes:
+    - Numbers (whole, fractions, decimals)
+    - Common measurement units (cups, tbsp, tsp, oz, lb, etc.)
+    - Parenthetical notes
+
+    Args:
+        ingredient_text: Full ingredient text with measurements
+
+    Returns:
+        Cleaned ingredient name without measurements
+    """
+    return normalizer.normalize(ingredient_text)
+
+
+def extract_ingredients_from_html_bs4(html_content):
+    """
+    Reference BeautifulSoup implementation of extract_ingredients_from_html.
+
+    Kept only for the parity tests and the extraction benchmark. bs4 is
+    imported inside the function so it never loads on the request path.
+
+    Args:
+        html_content: HTML string from the item_recipe field
+
+    Returns:
+        A list of ingredient strings
+    """
+    if not html_content:
+        return []
+
+    from bs4 import BeautifulSoup
+
+    # Parse HTML
+    soup = BeautifulSoup(html_content, "html.parser")
+    ingredients = []
+
+    # Method 1: Look for headings containing "ingredient" and get the next list
+    ingredient_headers = soup.find_all(
+        ["h1", "h2", "h3", "h4", "h5", "h6", "p", "strong"],
+        string=re.compile(r"ingredient", re.IGNORECASE),
+    )
+
+    for header in ingredient_headers:
+        # Find the next <ul> or <ol> after this header
+        next_list = header.find_next(["ul", "ol"])
+        if next_list:
+            for li in next_list.find_all("li"):
+                ingredient_text = li.get_text(strip=True)
+                if ingredient_text and ingredient_text not in ingredients:
+                    ingredients.append(ingredient_text)
+
+    # Method 2: If no ingredients found yet, look for any lists in the content
+    if not ingredients:
+        all_lists = soup.find_all(["ul", "ol"])
+        for list_element in all_lists:
+            for li in list_element.find_all("li"):
+                ingredient_text = li.get_text(strip=True)
+                if ingredient_text and ingredient_text not in ingredients:
+                    ingredients.append(ingredient_text)
+
+    return ingredients
+
+
+def parse_recipe_ingredients(html_content):
+    """
+    Parse a recipe's HTML into the rows stored in RecipeIngredient.
+
+    Returns:
+        A list of (position, raw_text, name, quantity, unit) tuples, in
+        recipe order (see IngredientNormalizer.parse())
+    """
+    parse = normalizer.parse
+    return [
+        (position, raw_text, *parse(raw_text))
+        for position, raw_text in enumerate(extract_ingredients_from_html(html_content))
+    ]
+
+
+# Shared normalizer used by the helpers above
+normalizer = IngredientNormalizer()
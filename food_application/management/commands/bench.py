@@ -0,0 +1,362 @@
+import json
+import os
+import random
+import statistics
+import time
+import tracemalloc
+from io import StringIO
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext,
+    override_settings,
+    setup_databases,
+    teardown_databases,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from food_application import search
+from food_application.models import Item, MealPlan
+from food_application.sampling import recipe_sampler
+from food_application.services import DAYS_OF_WEEK, create_meal_plan
+
+ADJECTIVES = ["Spicy", "Creamy", "Smoky", "Zesty", "Rustic", "Classic", "Garlic"]
+FOODS = ["Chicken", "Beef", "Salmon", "Tofu", "Mushroom", "Lentil", "Pork", "Shrimp"]
+DISHES = ["Soup", "Curry", "Stew", "Tacos", "Pasta", "Salad", "Stir Fry", "Bake"]
+UNITS = ["cups", "tbsp", "tsp", "oz", "lb", "g", "cloves", "cans", "slices"]
+INGREDIENTS = [
+    "flour",
+    "sugar",
+    "butter",
+    "garlic",
+    "onion",
+    "tomatoes",
+    "rice",
+    "olive oil",
+    "salt",
+    "black pepper",
+    "chicken stock",
+    "parmesan",
+    "cumin",
+    "paprika",
+    "lemon juice",
+]
+
+# Latency/memory differences below these are noise, never regressions
+LATENCY_NOISE_MS = 1.0
+MEMORY_NOISE_KIB = 64
+
+
+def make_recipe_html(rng):
+    """Recipe HTML shaped like what the TinyMCE editor saves."""
+    parts = [
+        f"<p>A weeknight favourite. <em>Serves {rng.randint(2, 8)}</em> &ndash; "
+        f"ready in <strong>{rng.randint(15, 120)} minutes</strong>.</p>",
+        "<h2>Ingredients</h2>",
+        "<ul>",
+    ]
+    for ingredient in rng.sample(INGREDIENTS, rng.randint(5, len(INGREDIENTS))):
+        parts.append(
+            f"<li>{rng.randint(1, 4)}&frac12; {rng.choice(UNITS)} "
+            f"<strong>{ingredient}</strong> (finely chopped)&nbsp;</li>"
+        )
+    parts.append("</ul><h2>Instructions</h2><ol>")
+    for step in range(rng.randint(4, 12)):
+        parts.append(
+            f'<li><p style="text-align: left;">Stir the '
+            f"<em>{rng.choice(INGREDIENTS)}</em> and cook for {step + 2} "
+            "minutes.</p></li>"
+        )
+    parts.append("</ol><p>&nbsp;</p>")
+    return "\n".join(parts)
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database with synthetic recipes, meal plans and "
+        "users, request every food_application route through the test client "
+        "and report p50/p95/p99 latency, SQL query count and peak memory per "
+        "route. With --baseline, fails if a route got slower, heavier or "
+        "issues more queries than in the baseline report."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=1000)
+        parser.add_argument("--meal-plans", type=int, default=100)
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=30,
+            help="Timed requests per route (default: 30)",
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Random seed")
+        parser.add_argument(
+            "--output",
+            default="bench-report.json",
+            help="Where to write the JSON report (default: bench-report.json)",
+        )
+        parser.add_argument(
+            "--baseline", default=None, help="Baseline report to compare against"
+        )
+        parser.add_argument(
+            "--save-baseline",
+            action="store_true",
+            help="Write this run's report to --baseline instead of comparing",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.25,
+            help="Allowed p95 latency and peak memory growth over the baseline "
+            "(default: 0.25, i.e. 25%%)",
+        )
+
+    def handle(self, *args, **options):
+        if options["requests"] < 2:
+            raise CommandError("--requests must be at least 2.")
+        if options["save_baseline"] and not options["baseline"]:
+            raise CommandError("--save-baseline needs --baseline.")
+
+        # Everything happens in a test database and a private cache, so the
+        # real data and caches are never touched
+        old_config = setup_databases(
+            verbosity=0, interactive=False, aliases={"default"}
+        )
+        try:
+            with override_settings(
+                ALLOWED_HOSTS=["testserver"],
+                CACHES={
+                    "default": {
+                        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                        "LOCATION": "bench",
+                    },
+                    "fragments": {
+                        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                        "LOCATION": "bench-fragments",
+                    },
+                },
+                RECIPE_DETAIL_CACHE_ALIAS="default",
+            ):
+                recipe_sampler.invalidate()
+                self.seed(options)
+                routes = self.run_routes(options["requests"])
+                recipe_sampler.invalidate()
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        report = {
+            "created_at": timezone.now().isoformat(),
+            "config": {
+                key: options[key]
+                for key in ["recipes", "meal_plans", "users", "requests", "seed"]
+            },
+            "routes": routes,
+        }
+        with open(options["output"], "w") as report_file:
+            json.dump(report, report_file, indent=2)
+        self.stdout.write(f"Report written to {options['output']}")
+
+        if options["save_baseline"]:
+            with open(options["baseline"], "w") as baseline_file:
+                json.dump(report, baseline_file, indent=2)
+            self.stdout.write(f"Baseline saved to {options['baseline']}")
+        elif options["baseline"]:
+            self.compare(report, options["baseline"], options["tolerance"])
+
+        failed = [name for name, result in routes.items() if result["status"] >= 400]
+        if failed:
+            raise CommandError(f"Routes returned errors: {', '.join(failed)}")
+
+    def seed(self, options):
+        rng = random.Random(options["seed"])
+        started = time.perf_counter()
+
+        for n in range(options["users"]):
+            User.objects.create(
+                username=f"bench-user-{n}", password=make_password(None)
+            )
+        Item.objects.bulk_create(
+            [
+                Item(
+                    item_name=(
+                        f"{rng.choice(ADJECTIVES)} {rng.choice(FOODS)} "
+                        f"{rng.choice(DISHES)}"
+                    ),
+                    item_description="A synthetic recipe for benchmarking",
+                    item_recipe=make_recipe_html(rng),
+                    item_price=rng.randint(3, 40),
+                )
+                for n in range(options["recipes"])
+            ],
+            batch_size=500,
+        )
+        # bulk_create() skips the signals that keep these up to date
+        call_command("rebuild_ingredients", workers=0, stdout=StringIO())
+        if search.search_enabled():
+            call_command("rebuild_search_index", stdout=StringIO())
+        recipe_sampler.invalidate()
+
+        for n in range(options["meal_plans"]):
+            create_meal_plan(
+                f"Bench plan {n}",
+                recipe_sampler.sample_ids(7, seed=options["seed"] + n),
+            )
+
+        self.stdout.write(
+            f"Seeded {options['recipes']} recipes, {options['meal_plans']} meal "
+            f"plans and {options['users']} users in "
+            f"{time.perf_counter() - started:.1f}s"
+        )
+
+    def get_routes(self):
+        """
+        (name, method, url, data) for every food_application route.
+
+        A route that isn't listed here is never measured: add every new
+        route in food_application/urls.py to this list.
+        """
+        recipe_ids = recipe_sampler.ids()
+        recipe_id = recipe_ids[len(recipe_ids) // 2]
+        meal_plan_ids = list(
+            MealPlan.objects.order_by("id").values_list("id", flat=True)[:4]
+        )
+        meal_plan_id = meal_plan_ids[0]
+        combined_plans = ",".join(str(plan_id) for plan_id in meal_plan_ids)
+        new_plan = {"plan_name": "Bench plan"}
+        new_plan.update(
+            {f"recipe_{day}": recipe_ids[n] for n, day in enumerate(DAYS_OF_WEEK)}
+        )
+
+        def url(name, *args):
+            return reverse(f"food_application:{name}", args=args)
+
+        return [
+            ("index", "GET", url("index"), None),
+            ("index (later page)", "GET", f"{url('index')}?after={recipe_id}", None),
+            ("search", "GET", f"{url('search')}?q=chicken+soup", None),
+            ("search (page 2)", "GET", f"{url('search')}?q=garlic&page=2", None),
+            ("detail", "GET", url("detail", recipe_id), None),
+            ("create_item", "GET", url("create_item"), None),
+            ("update_item", "GET", url("update_item", recipe_id), None),
+            ("delete_item", "GET", url("delete_item", recipe_id), None),
+            ("meal_planner", "GET", url("meal_planner"), None),
+            ("save_meal_plan", "POST", url("save_meal_plan"), new_plan),
+            ("saved_meal_plans", "GET", url("saved_meal_plans"), None),
+            ("view_meal_plan", "GET", url("view_meal_plan", meal_plan_id), None),
+            ("delete_meal_plan", "GET", url("delete_meal_plan", meal_plan_id), None),
+            ("shopping_list", "GET", url("shopping_list", meal_plan_id), None),
+            (
+                "combined_shopping_list",
+                "GET",
+                f"{url('combined_shopping_list')}?plans={combined_plans}",
+                None,
+            ),
+            ("export_recipes", "GET", url("export_recipes"), None),
+            ("export_meal_plans", "GET", url("export_meal_plans"), None),
+        ]
+
+    def run_routes(self, requests):
+        client = Client()
+        client.force_login(User.objects.order_by("id").first())
+
+        results = {}
+        self.stdout.write(
+            f"{'route':<22} {'status':>6} {'p50 ms':>8} {'p95 ms':>8} "
+            f"{'p99 ms':>8} {'queries':>7} {'peak KiB':>9}"
+        )
+        for name, method, url, data in self.get_routes():
+            result = self.measure(client, method, url, data, requests)
+            results[name] = result
+            self.stdout.write(
+                f"{name:<22} {result['status']:>6} {result['p50_ms']:8.2f} "
+                f"{result['p95_ms']:8.2f} {result['p99_ms']:8.2f} "
+                f"{result['queries']:>7} {result['peak_memory_kib']:9.0f}"
+            )
+        return results
+
+    def measure(self, client, method, url, data, requests):
+        def fetch():
+            if method == "POST":
+                response = client.post(url, data)
+            else:
+                response = client.get(url)
+            if response.streaming:
+                b"".join(response.streaming_content)
+            return response
+
+        fetch()  # Warm up caches
+
+        latencies = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            fetch()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        # One more (warm) request to count queries and measure memory, kept
+        # out of the timings because tracing slows it down
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                response = fetch()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+        return {
+            "status": response.status_code,
+            "p50_ms": percentiles[49],
+            "p95_ms": percentiles[94],
+            "p99_ms": percentiles[98],
+            "queries": len(queries),
+            "peak_memory_kib": peak / 1024,
+        }
+
+    def compare(self, report, baseline_path, tolerance):
+        """Raise CommandError listing every regression against the baseline."""
+        if not os.path.exists(baseline_path):
+            raise CommandError(f"Baseline {baseline_path} does not exist.")
+        with open(baseline_path) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline["config"] != report["config"]:
+            self.stderr.write(
+                "Warning: the baseline was recorded with different options: "
+                f"{baseline['config']}"
+            )
+
+        regressions = []
+        for name, result in report["routes"].items():
+            before = baseline["routes"].get(name)
+            if before is None:
+                continue
+            if result["queries"] > before["queries"]:
+                regressions.append(
+                    f"{name}: {result['queries']} queries (was {before['queries']})"
+                )
+            if result["p95_ms"] > (
+                before["p95_ms"] * (1 + tolerance) + LATENCY_NOISE_MS
+            ):
+                regressions.append(
+                    f"{name}: p95 {result['p95_ms']:.2f} ms "
+                    f"(was {before['p95_ms']:.2f} ms)"
+                )
+            if result["peak_memory_kib"] > (
+                before["peak_memory_kib"] * (1 + tolerance) + MEMORY_NOISE_KIB
+            ):
+                regressions.append(
+                    f"{name}: peak memory {result['peak_memory_kib']:.0f} KiB "
+                    f"(was {before['peak_memory_kib']:.0f} KiB)"
+                )
+
+        if regressions:
+            raise CommandError(
+                "Regressions against the baseline:\n" + "\n".join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
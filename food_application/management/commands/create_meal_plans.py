@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from food_application.sampling import recipe_sampler
+from food_application.services import create_meal_plan
+
+
+class Command(BaseCommand):
+    help = "Create random meal plans in bulk (one transaction per plan)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--count", type=int, default=1, help="Number of plans to create"
+        )
+        parser.add_argument(
+            "--weeks", type=int, default=1, help="Number of weeks in each plan"
+        )
+        parser.add_argument("--name", default="My Meal Plan", help="Plan name")
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=None,
+            help="Seed for reproducible plans (plan n uses seed + n)",
+        )
+
+    def handle(self, *args, **options):
+        if options["weeks"] < 1:
+            raise CommandError("--weeks must be at least 1.")
+        if not recipe_sampler.count():
+            raise CommandError("There are no recipes to plan with.")
+
+        days = options["weeks"] * 7
+        seed = options["seed"]
+        for n in range(options["count"]):
+            recipe_ids = recipe_sampler.sample_ids(
+                days, seed=None if seed is None else seed + n
+            )
+            create_meal_plan(options["name"], recipe_ids)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {options['count']} meal plans of {days} days each."
+            )
+        )
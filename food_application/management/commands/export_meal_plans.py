@@ -0,0 +1,12 @@
+from food_application import exports
+
+from .export_recipes import Command as ExportCommand
+
+
+class Command(ExportCommand):
+    help = (
+        "Export the saved meal plans and their days as JSONL or CSV (one row "
+        "per day), streaming them in chunks. With --cursor, only plans "
+        "changed after that cursor are exported."
+    )
+    export = staticmethod(exports.export_meal_plans)
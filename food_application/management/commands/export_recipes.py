@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from food_application import exports
+
+
+class Command(BaseCommand):
+    help = (
+        "Export the recipe catalog as JSONL or CSV, streaming it in chunks. "
+        "With --cursor, only recipes changed after that cursor are exported."
+    )
+    export = staticmethod(exports.export_recipes)
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format",
+            choices=exports.EXPORT_FORMATS,
+            default="jsonl",
+            help="Output format (default: jsonl)",
+        )
+        parser.add_argument(
+            "--cursor",
+            default=None,
+            help='Only export rows changed after "<updated_at>,<id>" '
+            "(the updated_at and id of the last row of the previous export)",
+        )
+        parser.add_argument(
+            "--output",
+            default=None,
+            help="File to write to (default: standard output)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=exports.EXPORT_CHUNK_SIZE,
+            help=f"Rows fetched per query (default: {exports.EXPORT_CHUNK_SIZE})",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            lines = self.export(
+                options["format"],
+                cursor=options["cursor"],
+                chunk_size=max(1, options["chunk_size"]),
+            )
+        except ValueError as e:
+            raise CommandError(e)
+
+        if options["output"]:
+            with open(options["output"], "w", newline="", encoding="utf-8") as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending="")
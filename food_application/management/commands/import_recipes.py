@@ -0,0 +1,248 @@
+import csv
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from food_application import search
+from food_application.forms import ItemForm
+from food_application.ingredients import parse_recipe_ingredients
+from food_application.models import Item, RecipeIngredient, build_recipe_ingredients
+from food_application.planner import budget_planner
+from food_application.sampling import recipe_sampler
+
+
+def form_data(record):
+    """
+    The form data for one record. Missing fields get the values the recipe
+    form starts with (the model defaults), as if left unchanged in the form.
+    """
+    data = {
+        name: field.initial
+        for name, field in ItemForm.base_fields.items()
+        if field.initial is not None
+    }
+    data.update(record)
+    return data
+
+
+def prepare_batch(batch):
+    """
+    Validate and pre-process a batch of (record_number, record) pairs.
+
+    Runs inside a worker process and never touches the database. A record
+    is a dict (CSV) or a line of JSON. Returns, for each record, either
+    (record_number, item, ingredient_rows, recipe_text, None) or
+    (record_number, None, None, None, error_message).
+    """
+    prepared = []
+    for number, record in batch:
+        if isinstance(record, str):
+            try:
+                record = json.loads(record)
+            except ValueError as e:
+                prepared.append((number, None, None, None, f"Invalid JSON: {e}"))
+                continue
+            if not isinstance(record, dict):
+                prepared.append((number, None, None, None, "Expected a JSON object"))
+                continue
+
+        form = ItemForm(form_data(record))
+        if not form.is_valid():
+            error = "; ".join(
+                f"{field}: {' '.join(messages)}"
+                for field, messages in form.errors.items()
+            )
+            prepared.append((number, None, None, None, error))
+            continue
+
+        item = form.save(commit=False)
+        prepared.append(
+            (
+                number,
+                item,
+                parse_recipe_ingredients(item.item_recipe),
+                search.recipe_text(item.item_recipe),
+                None,
+            )
+        )
+    return prepared
+
+
+class Command(BaseCommand):
+    help = (
+        "Import recipes from a JSONL or CSV file, streaming it in batches. "
+        "Rows are validated like the recipe form and their HTML is processed "
+        "in parallel worker processes; each batch is inserted in one "
+        "transaction. With --checkpoint, an interrupted import can be resumed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            help="JSONL file (one recipe object per line) or CSV file (with a "
+            "header row); the keys are the recipe form fields, e.g. item_name, "
+            "item_description, item_recipe, item_price, item_image",
+        )
+        parser.add_argument(
+            "--format",
+            choices=["jsonl", "csv"],
+            default=None,
+            help="Input format (default: guessed from the file extension)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of records validated and inserted per batch (default: 500)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Number of worker processes (default: one per CPU, 0 = no pool)",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            default=None,
+            help="File recording the last committed record. If it exists, the "
+            "import resumes after that record.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not os.path.exists(path):
+            raise CommandError(f"{path} does not exist.")
+        if not connection.features.can_return_rows_from_bulk_insert:
+            raise CommandError(
+                "import_recipes requires a database that returns ids "
+                "from bulk inserts (SQLite 3.35+, PostgreSQL, ...)."
+            )
+
+        input_format = options["format"] or (
+            "csv" if path.lower().endswith(".csv") else "jsonl"
+        )
+        batch_size = max(1, options["batch_size"])
+        workers = options["workers"]
+        self.checkpoint_path = options["checkpoint"]
+        self.source = os.path.abspath(path)
+
+        self.records_done = self.read_checkpoint()
+        if self.records_done:
+            self.stdout.write(f"Resuming after record {self.records_done}.")
+        self.imported = self.skipped = 0
+        self.started = time.monotonic()
+
+        with open(path, newline="", encoding="utf-8-sig") as input_file:
+            records = self.iter_records(input_file, input_format)
+            batches = self.iter_batches(
+                islice(records, self.records_done, None), batch_size
+            )
+            if workers == 0:
+                for prepared in map(prepare_batch, batches):
+                    self.write_batch(prepared)
+            else:
+                workers = workers or os.cpu_count() or 1
+                with ProcessPoolExecutor(
+                    max_workers=workers, initializer=django.setup
+                ) as pool:
+                    # Keep only a few batches in flight so memory stays
+                    # bounded, and write them in input order so the
+                    # checkpoint always marks a point before which
+                    # everything is committed
+                    pending = deque()
+                    for batch in batches:
+                        pending.append(pool.submit(prepare_batch, batch))
+                        if len(pending) >= workers * 2:
+                            self.write_batch(pending.popleft().result())
+                    while pending:
+                        self.write_batch(pending.popleft().result())
+
+        # bulk_create() doesn't send post_save, so refresh the id array and
+        # the planner's columns here. Other worker processes only see this
+        # through the versions in the default cache: right away with a
+        # shared cache backend, after RECIPE_ID_CACHE_TIMEOUT with locmem
+        recipe_sampler.invalidate()
+        budget_planner.invalidate()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {self.imported} recipes, skipped {self.skipped} "
+                f"invalid records ({self.rate():.0f} records/s)."
+            )
+        )
+
+    def iter_records(self, input_file, input_format):
+        """Yield (record_number, record) pairs, one line or row at a time."""
+        if input_format == "csv":
+            yield from enumerate(csv.DictReader(input_file), start=1)
+        else:
+            lines = (line for line in input_file if line.strip())
+            yield from enumerate(lines, start=1)
+
+    def iter_batches(self, records, batch_size):
+        while batch := list(islice(records, batch_size)):
+            yield batch
+
+    def write_batch(self, prepared):
+        """Insert the valid recipes of one batch, their ingredients and index rows."""
+        valid = [row for row in prepared if row[4] is None]
+        for number, item, rows, text, error in prepared:
+            if error is not None:
+                self.stderr.write(f"Record {number}: {error}")
+
+        with transaction.atomic():
+            items = Item.objects.bulk_create([item for _, item, _, _, _ in valid])
+            RecipeIngredient.objects.bulk_create(
+                build_recipe_ingredients(
+                    [(item.pk, rows) for item, (_, _, rows, _, _) in zip(items, valid)]
+                )
+            )
+            search.add_rows(
+                [
+                    (item.pk, item.item_name, item.item_description, text)
+                    for item, (_, _, _, text, _) in zip(items, valid)
+                ]
+            )
+
+        self.imported += len(valid)
+        self.skipped += len(prepared) - len(valid)
+        if prepared:
+            self.records_done = prepared[-1][0]
+            self.write_checkpoint()
+        self.stdout.write(
+            f"{self.records_done} records read, {self.imported} imported, "
+            f"{self.skipped} skipped ({self.rate():.0f} records/s)"
+        )
+
+    def rate(self):
+        elapsed = time.monotonic() - self.started
+        return (self.imported + self.skipped) / elapsed if elapsed else 0.0
+
+    def read_checkpoint(self):
+        """Return the number of records already imported from this file."""
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return 0
+        with open(self.checkpoint_path) as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+        if checkpoint["source"] != self.source:
+            raise CommandError(
+                f"{self.checkpoint_path} is a checkpoint for {checkpoint['source']}."
+            )
+        return checkpoint["records"]
+
+    def write_checkpoint(self):
+        if not self.checkpoint_path:
+            return
+        # Write then rename, so a crash never leaves a half-written checkpoint
+        temp_path = f"{self.checkpoint_path}.tmp"
+        with open(temp_path, "w") as checkpoint_file:
+            json.dump(
+                {"source": self.source, "records": self.records_done}, checkpoint_file
+            )
+        os.replace(temp_path, self.checkpoint_path)
@@ -0,0 +1,100 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from food_application.ingredients import parse_recipe_ingredients
+from food_application.models import Item, RecipeIngredient, build_recipe_ingredients
+
+
+def parse_batch(batch):
+    """
+    Parse a batch of (item_id, html) pairs.
+
+    Runs inside a worker process, so it only uses the pure-Python parser
+    and never touches the database.
+    """
+    return [(item_id, parse_recipe_ingredients(html)) for item_id, html in batch]
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the RecipeIngredient rows for every recipe. "
+        "HTML parsing runs in parallel worker processes; rows are written "
+        "by this process, one transaction per batch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="Number of recipes parsed and written per batch (default: 200)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Number of worker processes (default: one per CPU, 0 = no pool)",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options["batch_size"])
+        workers = options["workers"]
+
+        batches = self.iter_batches(batch_size)
+        total = 0
+
+        if workers == 0:
+            for parsed in map(parse_batch, batches):
+                total += self.write_batch(parsed)
+        else:
+            workers = workers or os.cpu_count() or 1
+            # Workers import this module, which imports the models: with the
+            # spawn start method (macOS, Windows) they must set Django up first
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=django.setup
+            ) as pool:
+                # Keep only a few batches in flight so memory stays bounded
+                # (Executor.map would queue the whole catalog up front)
+                pending = deque()
+                for batch in batches:
+                    pending.append(pool.submit(parse_batch, batch))
+                    if len(pending) >= workers * 2:
+                        total += self.write_batch(pending.popleft().result())
+                while pending:
+                    total += self.write_batch(pending.popleft().result())
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt ingredients for {total} recipes.")
+        )
+
+    def iter_batches(self, batch_size):
+        """Yield lists of (item_id, html) without loading the whole catalog."""
+        batch = []
+        recipes = Item.objects.order_by("id").values_list("id", "item_recipe")
+        for row in recipes.iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def write_batch(self, parsed):
+        """Replace the ingredient rows for one parsed batch."""
+        item_ids = [item_id for item_id, rows in parsed]
+        with transaction.atomic():
+            RecipeIngredient.objects.filter(item_id__in=item_ids).delete()
+            RecipeIngredient.objects.bulk_create(build_recipe_ingredients(parsed))
+            # The cached shopping lists and the ETags of the pages showing
+            # these recipes are keyed on version and updated_at
+            Item.objects.filter(pk__in=item_ids).update(
+                version=F("version") + 1, updated_at=timezone.now()
+            )
+        return len(item_ids)
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from food_application import search
+from food_application.models import Item
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index (SQLite FTS5) from the Item table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of recipes read and indexed per batch (default: 500)",
+        )
+
+    def handle(self, *args, **options):
+        if not search.search_enabled():
+            raise CommandError("The full-text search index requires SQLite.")
+
+        batch_size = max(1, options["batch_size"])
+        rows = (
+            Item.objects.order_by("id")
+            .values_list("id", "item_name", "item_description", "item_recipe")
+            .iterator(chunk_size=batch_size)
+        )
+        with transaction.atomic():
+            total = search.rebuild_index(rows, batch_size=batch_size)
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} recipes."))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from food_application.page_cache import recipe_detail_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Show the recipe detail cache hit/miss counters. Only meaningful with "
+        "a cache backend shared between processes (e.g. file-based); each "
+        "worker adds its counts every 100 lookups."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset", action="store_true", help="Reset the counters afterwards"
+        )
+
+    def handle(self, *args, **options):
+        stats = recipe_detail_cache.stats()
+        self.stdout.write(
+            f"hits={stats['hits']} misses={stats['misses']} "
+            f"hit_rate={stats['hit_rate']:.1%}"
+        )
+        if options["reset"]:
+            recipe_detail_cache.reset_stats()
@@ -0,0 +1,64 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from food_application.routers import REPLICA_DB_ALIAS
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database to the read replica (see "
+        "food_application/routers.py), once or every --interval seconds. "
+        "Other databases have their own replication."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help="Keep syncing, every this many seconds (default: sync once)",
+        )
+        parser.add_argument(
+            "--pages",
+            type=int,
+            default=1024,
+            help="Pages copied per step, so writers are only briefly blocked "
+            "(default: 1024)",
+        )
+
+    def handle(self, *args, **options):
+        if REPLICA_DB_ALIAS not in settings.DATABASES:
+            raise CommandError(
+                "No replica database is configured (set DJANGO_REPLICA_DB)."
+            )
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        replica = settings.DATABASES[REPLICA_DB_ALIAS]
+        for database in (primary, replica):
+            if database["ENGINE"] != "django.db.backends.sqlite3":
+                raise CommandError("sync_replica only supports SQLite databases.")
+
+        while True:
+            started = time.perf_counter()
+            self.sync(primary["NAME"], replica["NAME"], options["pages"])
+            self.stdout.write(
+                f"Synced {primary['NAME']} to {replica['NAME']} in "
+                f"{time.perf_counter() - started:.2f}s"
+            )
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
+
+    def sync(self, source_path, target_path, pages):
+        # The backup API copies a consistent snapshot even while the primary
+        # is being written to
+        source = sqlite3.connect(source_path)
+        target = sqlite3.connect(target_path)
+        try:
+            source.backup(target, pages=max(1, pages))
+        finally:
+            target.close()
+            source.close()
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from food_application.warmup import WARMUP_PHASES, warm_up
+
+
+class Command(BaseCommand):
+    help = (
+        "Import the heavy modules, compile every template, resolve every named "
+        "route and fill the recipe caches, timing each phase. Startup "
+        "regressions show up as a slower phase."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--phase",
+            action="append",
+            choices=WARMUP_PHASES,
+            dest="phases",
+            help="Only run this phase (repeatable; default: all of them)",
+        )
+        parser.add_argument(
+            "--recipes",
+            type=int,
+            default=getattr(settings, "WARMUP_RECIPES", 100),
+            help="Recipe detail pages to pre-render (default: WARMUP_RECIPES)",
+        )
+
+    def handle(self, *args, **options):
+        timings = warm_up(options["phases"], recipes=options["recipes"])
+        for phase, seconds, summary in timings:
+            self.stdout.write(f"{phase:<10} {seconds * 1000:9.1f} ms  {summary}")
+        total = sum(seconds for phase, seconds, summary in timings)
+        self.stdout.write(self.style.SUCCESS(f"Warmed up in {total:.3f}s"))
@@ -0,0 +1,209 @@
+"""
+Per-request SQL and template instrumentation.
+
+QueryInstrumentationMiddleware records, for every request, the number of
+SQL queries, the time spent in them and the time spent rendering
+templates (timed by the TimedDjangoTemplates backend set in TEMPLATES).
+They are sent back in a Server-Timing header (visible in the browser's
+network panel) and logged as one JSON line on the
+"food_application.requests" logger.
+
+Each query is also fingerprinted (its SQL with the IN (...) lists
+collapsed); the same fingerprint running QUERY_REPEAT_THRESHOLD times or
+more in one request is the signature of an N+1 query, and is logged as a
+warning.
+
+Views can declare how many queries they may run with @query_budget(n) (or
+a query_budget attribute on a class-based view). Going over it logs a
+warning, or raises QueryBudgetExceeded when QUERY_BUDGET_STRICT is on (the
+view tests turn it on with override_settings). The budget counts every
+query of the request, including loading the session and the user.
+
+Queries run while a StreamingHttpResponse is being sent are not counted.
+"""
+
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger("food_application.requests")
+
+# Statistics of the request being handled in this context, if any
+current_stats = ContextVar("current_request_stats", default=None)
+
+IN_LIST_RE = re.compile(r"IN \((?:%s, )*%s\)")
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(max_queries):
+    """Declare the maximum number of queries a view may run per request."""
+
+    def decorator(view_func):
+        view_func.query_budget = max_queries
+        return view_func
+
+    return decorator
+
+
+def fingerprint(sql):
+    """The query's SQL with IN lists of any length made identical."""
+    return IN_LIST_RE.sub("IN (...)", sql)
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = Counter()  # fingerprint -> count
+        self.query_count = 0
+        self.query_time = 0.0
+        self.template_time = 0.0
+        self.rendering = False
+
+    def repeated_queries(self):
+        threshold = getattr(settings, "QUERY_REPEAT_THRESHOLD", 5)
+        return {sql: n for sql, n in self.queries.items() if n >= threshold}
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper counting and timing the current request's queries."""
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.query_time += time.perf_counter() - started
+        stats.query_count += 1
+        stats.queries[fingerprint(sql)] += 1
+
+
+def install_query_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedTemplate(Template):
+    """A template whose renders count towards the request's template time."""
+
+    def render(self, context=None, request=None):
+        stats = current_stats.get()
+        if stats is None or stats.rendering:  # Nested renders are already timed
+            return super().render(context, request)
+        stats.rendering = True
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_time += time.perf_counter() - started
+            stats.rendering = False
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    The Django template backend, returning TimedTemplates. Set as the
+    TEMPLATES backend in settings, so only that engine's templates are
+    timed and nothing is patched.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+class QueryInstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        # New connections get the recorder from FoodApplicationConfig.ready()
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.report(request, response, stats)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.report(request, response, stats)
+
+    def report(self, request, response, stats):
+        total_ms = (time.perf_counter() - stats.started) * 1000
+        query_ms = stats.query_time * 1000
+        template_ms = stats.template_time * 1000
+        repeated = stats.repeated_queries()
+        view_name = request.resolver_match.view_name if request.resolver_match else None
+
+        response.headers["Server-Timing"] = ", ".join(
+            [
+                f'db;dur={query_ms:.1f};desc="{stats.query_count} queries"',
+                f"tpl;dur={template_ms:.1f}",
+                f"total;dur={total_ms:.1f}",
+            ]
+        )
+        logger.info(
+            json.dumps(
+                {
+                    "method": request.method,
+                    "path": request.path,
+                    "view": view_name,
+                    "status": response.status_code,
+                    "duration_ms": round(total_ms, 2),
+                    "queries": stats.query_count,
+                    "query_ms": round(query_ms, 2),
+                    "template_ms": round(template_ms, 2),
+                    "repeated_queries": len(repeated),
+                }
+            )
+        )
+        for sql, count in repeated.items():
+            logger.warning(
+                "Possible N+1 in %s: query ran %d times: %s", view_name, count, sql
+            )
+
+        budget = self.get_query_budget(request)
+        if budget is not None and stats.query_count > budget:
+            message = (
+                f"{view_name} ran {stats.query_count} queries, over its budget "
+                f"of {budget}"
+            )
+            if getattr(settings, "QUERY_BUDGET_STRICT", False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def get_query_budget(self, request):
+        if request.resolver_match is None:
+            return None
+        view = request.resolver_match.func
+        view = getattr(view, "view_class", view)  # Class-based views
+        return getattr(view, "query_budget", None)
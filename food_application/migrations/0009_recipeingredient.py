@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-16 19:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The table starts out empty: Items get their rows when they are next saved.
+# Run "python manage.py rebuild_ingredients" after this migration to fill it
+# for the existing recipes, or their shopping lists stay empty.
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("food_application", "0008_shoppinglist"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecipeIngredient",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("position", models.PositiveIntegerField(default=0)),
+                ("raw_text", models.TextField()),
+                ("name", models.CharField(blank=True, max_length=255)),
+                (
+                    "item",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ingredients",
+                        to="food_application.item",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["item", "position"],
+                "unique_together": {("item", "position")},
+            },
+        ),
+    ]
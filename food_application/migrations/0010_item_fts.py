@@ -0,0 +1,62 @@
+# Generated by Django 5.2.6 on 2026-10-16 19:55
+
+from html import unescape
+
+from django.db import migrations
+from django.utils.html import strip_tags
+
+BATCH_SIZE = 500
+
+
+def create_fts_index(apps, schema_editor):
+    # FTS5 is SQLite-only; other databases keep the icontains search
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    Item = apps.get_model("food_application", "Item")
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS food_application_item_fts "
+            "USING fts5(item_name, item_description, recipe_text, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        # A batch of recipes at a time, so the catalog is never all in memory
+        recipes = Item.objects.values_list(
+            "id", "item_name", "item_description", "item_recipe"
+        ).iterator(chunk_size=BATCH_SIZE)
+        batch = []
+        for item_id, name, description, recipe in recipes:
+            batch.append(
+                [item_id, name, description, unescape(strip_tags(recipe or ""))]
+            )
+            if len(batch) >= BATCH_SIZE:
+                insert_rows(cursor, batch)
+                batch = []
+        if batch:
+            insert_rows(cursor, batch)
+
+
+def insert_rows(cursor, rows):
+    cursor.executemany(
+        "INSERT INTO food_application_item_fts "
+        "(rowid, item_name, item_description, recipe_text) "
+        "VALUES (%s, %s, %s, %s)",
+        rows,
+    )
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS food_application_item_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("food_application", "0009_recipeingredient"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-16 19:56
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("food_application", "0010_item_fts"),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name="mealplanday",
+            unique_together={("meal_plan", "order")},
+        ),
+    ]
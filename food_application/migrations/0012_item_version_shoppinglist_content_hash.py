@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-16 19:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("food_application", "0011_mealplanday_unique_order"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="item",
+            name="version",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name="shoppinglist",
+            name="content_hash",
+            field=models.CharField(
+                blank=True,
+                help_text="SHA-256 of ingredients, so unchanged lists are not saved again",
+                max_length=64,
+            ),
+        ),
+    ]
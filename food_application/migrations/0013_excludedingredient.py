@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-16 19:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("food_application", "0012_item_version_shoppinglist_content_hash"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExcludedIngredient",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("normalized_name", models.CharField(max_length=255)),
+                (
+                    "shopping_list",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="excluded_ingredients",
+                        to="food_application.shoppinglist",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("shopping_list", "normalized_name")},
+            },
+        ),
+    ]
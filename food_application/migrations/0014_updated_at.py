@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-16 20:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("food_application", "0013_excludedingredient"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="item",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="mealplan",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="shoppinglist",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
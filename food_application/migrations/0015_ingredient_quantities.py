@@ -0,0 +1,175 @@
+# Generated by Django 5.2.6 on 2026-10-16 20:29
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+# A frozen copy of the quantity parsing in food_application/ingredients.py as
+# of this migration, so later changes to the parser can't change what it
+# produces. Only the quantity and unit are needed: the names were cleaned
+# when the rows were created.
+UNIT_ALIASES = {
+    "cup": ["cup", "cups", "c."],
+    "tablespoon": ["tablespoon", "tablespoons", "tbsp"],
+    "teaspoon": ["teaspoon", "teaspoons", "tsp"],
+    "ounce": ["ounce", "ounces", "oz"],
+    "pound": ["pound", "pounds", "lb", "lbs"],
+    "gram": ["gram", "grams", "g"],
+    "kilogram": ["kilogram", "kilograms", "kg"],
+    "milliliter": ["milliliter", "milliliters", "ml"],
+    "liter": ["liter", "liters", "l"],
+    "pint": ["pint", "pints", "pt"],
+    "quart": ["quart", "quarts", "qt"],
+    "gallon": ["gallon", "gallons", "gal"],
+    "piece": ["piece", "pieces"],
+    "clove": ["clove", "cloves"],
+    "can": ["can", "cans"],
+    "package": ["package", "packages", "pkg"],
+    "slice": ["slice", "slices"],
+    "medium": ["medium"],
+    "large": ["large"],
+    "small": ["small"],
+    "whole": ["whole"],
+}
+SIZE_UNITS = frozenset(["medium", "large", "small", "whole"])
+FRACTION_CHARS = "½¼¾⅓⅔⅛⅜⅝⅞"
+FRACTION_VALUES = {
+    "½": 1 / 2, "¼": 1 / 4, "¾": 3 / 4, "⅓": 1 / 3, "⅔": 2 / 3,
+    "⅛": 1 / 8, "⅜": 3 / 8, "⅝": 5 / 8, "⅞": 7 / 8,
+}  # fmt: skip
+AMOUNT = (
+    r"\d+\s*/\s*\d+"
+    rf"|\d+(?:\.\d+)?(?:\s+\d+\s*/\s*\d+|\s*[{FRACTION_CHARS}])?"
+    rf"|[{FRACTION_CHARS}]"
+)
+AMOUNT_PART_RE = re.compile(rf"\d+\s*/\s*\d+|\d+(?:\.\d+)?|[{FRACTION_CHARS}]")
+UNIT_SPELLINGS = "|".join(
+    re.escape(alias)
+    for alias in sorted(
+        {alias for aliases in UNIT_ALIASES.values() for alias in aliases},
+        key=lambda alias: (-len(alias), alias),
+    )
+)
+MEASUREMENT_RE = re.compile(
+    rf"^[\d\s/.,{FRACTION_CHARS}]*\s*(?:{UNIT_SPELLINGS})\s+", re.IGNORECASE
+)
+AMOUNT_RE = re.compile(
+    rf"^\s*(?P<amount>{AMOUNT})\s*(?P<unit>{UNIT_SPELLINGS})\s+", re.IGNORECASE
+)
+UNITS = {
+    alias.lower(): "" if unit in SIZE_UNITS else unit
+    for unit, aliases in UNIT_ALIASES.items()
+    for alias in aliases
+}
+
+
+def amount_value(amount):
+    value = 0.0
+    for part in AMOUNT_PART_RE.findall(amount):
+        if part in FRACTION_VALUES:
+            value += FRACTION_VALUES[part]
+        elif "/" in part:
+            numerator, denominator = (int(number) for number in part.split("/"))
+            if not denominator:
+                return None
+            value += numerator / denominator
+        else:
+            value += float(part)
+    return value
+
+
+def parse_quantity(text):
+    """(quantity, unit) of an ingredient line, like IngredientNormalizer.parse()."""
+    if not MEASUREMENT_RE.match(text):
+        return None, ""
+    match = AMOUNT_RE.match(text)
+    quantity = amount_value(match["amount"]) if match else None
+    if quantity is None:
+        return None, ""
+    return quantity, UNITS[match["unit"].lower()]
+
+
+def parse_quantities(apps, schema_editor):
+    # Fill in the new columns from raw_text, a batch of rows at a time
+    Ingredient = apps.get_model("food_application", "Ingredient")
+    RecipeIngredient = apps.get_model("food_application", "RecipeIngredient")
+    names = (
+        RecipeIngredient.objects.exclude(name="")
+        .order_by("name")
+        .values_list("name", flat=True)
+        .distinct()
+    )
+    batch = []
+    for name in names.iterator(chunk_size=BATCH_SIZE):
+        batch.append(Ingredient(name=name))
+        if len(batch) >= BATCH_SIZE:
+            Ingredient.objects.bulk_create(batch)
+            batch = []
+    Ingredient.objects.bulk_create(batch)
+    ingredient_ids = dict(Ingredient.objects.values_list("name", "id"))
+
+    last_id = 0
+    while True:
+        # Keyset batches: rows are updated while the table is read
+        rows = list(
+            RecipeIngredient.objects.filter(pk__gt=last_id)
+            .only("raw_text", "name")
+            .order_by("pk")[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        for row in rows:
+            row.quantity, row.unit = parse_quantity(row.raw_text)
+            row.ingredient_id = ingredient_ids.get(row.name)
+        RecipeIngredient.objects.bulk_update(rows, ["ingredient", "quantity", "unit"])
+        last_id = rows[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("food_application", "0014_updated_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Ingredient",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="recipeingredient",
+            name="quantity",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="recipeingredient",
+            name="unit",
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name="recipeingredient",
+            name="ingredient",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="recipe_lines",
+                to="food_application.ingredient",
+            ),
+        ),
+        migrations.RunPython(parse_quantities, migrations.RunPython.noop),
+    ]
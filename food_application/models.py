@@ -1,6 +1,16 @@
-from django.db import models
+from django.contrib.auth.models import User
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
 from tinymce.models import HTMLField
 
+from . import search
+from .ingredients import parse_recipe_ingredients
+from .page_cache import invalidate_navbar, invalidate_recipe_card, recipe_detail_cache
+from .planner import budget_planner
+from .sampling import recipe_sampler
+
 
 # Create your models here.
 class Item(models.Model):
@@ -16,10 +26,38 @@ class Item(models.Model):
         max_length=500,
         default="https://theme-assets.getbento.com/sensei/cb0fd97.sensei/assets/images/catering-item-placeholder-704x520.png",
     )
+    # Incremented on every save; caches built from this recipe include it in their keys
+    version = models.PositiveIntegerField(default=1, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.item_name
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            self.version = (self.version or 0) + 1
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {
+                    *kwargs["update_fields"],
+                    "version",
+                    "updated_at",
+                }
+        super().save(*args, **kwargs)
+
+    def rebuild_ingredients(self):
+        """
+        Re-parse item_recipe and replace this item's RecipeIngredient rows.
+
+        The shopping list reads these rows instead of parsing the HTML on
+        every request, so they must be rebuilt whenever the recipe changes.
+        """
+        parsed = parse_recipe_ingredients(self.item_recipe)
+        with transaction.atomic():
+            self.ingredients.all().delete()
+            rows = build_recipe_ingredients([(self.pk, parsed)])
+            RecipeIngredient.objects.bulk_create(rows)
+        return rows
+
 
 class MealPlan(models.Model):
     """
@@ -28,11 +66,13 @@ class MealPlan(models.Model):
     Fields:
     - name: A user-friendly name for the meal plan
     - created_at: When the meal plan was created
+    - updated_at: When the meal plan or its days last changed
     - notes: Optional notes about the meal plan
     """
 
     name = models.CharField(max_length=200, default="My Meal Plan")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # Also bumped when its days change
     notes = models.TextField(blank=True, null=True)
 
     def __str__(self):
@@ -50,7 +90,7 @@ class MealPlanDay(models.Model):
     - meal_plan: The meal plan this day belongs to (ForeignKey)
     - day_of_week: Which day (Monday, Tuesday, etc.)
     - recipe: The recipe assigned to this day (ForeignKey)
-    - order: The order of the day (0-6 for Mon-Sun)
+    - order: The order of the day (0-6 for Mon-Sun, 7-13 for a second week...)
     """
 
     meal_plan = models.ForeignKey(
@@ -75,8 +115,8 @@ class MealPlanDay(models.Model):
         ordering = ["order"]  # Order by the order field
         unique_together = [
             "meal_plan",
-            "day_of_week",
-        ]  # Each day should appear once per meal plan
+            "order",
+        ]  # Each slot appears once per meal plan (plans can span several weeks)
 
 
 class ShoppingList(models.Model):
@@ -87,6 +127,7 @@ class ShoppingList(models.Model):
     - meal_plan: The meal plan this shopping list is based on (ForeignKey)
     - created_at: When the shopping list was created
     - ingredients: A text field storing the compiled list of ingredients
+    - updated_at: When the list or its excluded ingredients last changed
     """
 
     meal_plan = models.OneToOneField(
@@ -98,9 +139,242 @@ class ShoppingList(models.Model):
     ingredients = models.TextField(
         blank=True, help_text="Compiled list of ingredients from all recipes"
     )
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text="SHA-256 of ingredients, so unchanged lists are not saved again",
+    )
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Shopping List for {self.meal_plan.name}"
 
     class Meta:
         ordering = ["-created_at"]
+
+
+class ExcludedIngredient(models.Model):
+    """
+    An ingredient the user already has, hidden from a shopping list.
+
+    Fields:
+    - shopping_list: The shopping list it is hidden from (ForeignKey)
+    - normalized_name: The cleaned ingredient name, as shown on the list ("Flour")
+    """
+
+    shopping_list = models.ForeignKey(
+        ShoppingList,
+        on_delete=models.CASCADE,  # If the shopping list is deleted, delete its exclusions
+        related_name="excluded_ingredients",
+    )
+    normalized_name = models.CharField(max_length=255)
+
+    def __str__(self):
+        return self.normalized_name
+
+    class Meta:
+        unique_together = [
+            "shopping_list",
+            "normalized_name",
+        ]  # Each ingredient is excluded at most once per list (also the lookup index)
+
+
+class Ingredient(models.Model):
+    """
+    A canonical ingredient, shared by every recipe line with the same
+    cleaned name, so shopping lists can group recipe lines by its id.
+
+    Fields:
+    - name: The cleaned ingredient name ("Flour")
+    """
+
+    name = models.CharField(max_length=255, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
+class RecipeIngredient(models.Model):
+    """
+    One ingredient line parsed out of an Item's recipe HTML.
+
+    This is derived data: it is rebuilt from item_recipe whenever the Item
+    is saved (see the signal below) or by the rebuild_ingredients command.
+
+    Fields:
+    - item: The recipe this ingredient belongs to (ForeignKey)
+    - position: The order of the line in the recipe (0, 1, 2, ...)
+    - raw_text: The full line, including measurements ("2 cups flour")
+    - name: The cleaned ingredient name used for counting ("Flour")
+    - ingredient: The canonical Ingredient for name (None if name is empty)
+    - quantity: The amount of the measurement (2.0), if the line has one
+    - unit: The canonical unit ("cup"), or "" for a count ("2 large eggs")
+    """
+
+    item = models.ForeignKey(
+        Item,
+        on_delete=models.CASCADE,  # If the recipe is deleted, delete its ingredients
+        related_name="ingredients",
+    )
+    position = models.PositiveIntegerField(default=0)
+    raw_text = models.TextField()
+    name = models.CharField(max_length=255, blank=True)
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.PROTECT,  # Ingredients are never deleted while in use
+        null=True,
+        blank=True,
+        related_name="recipe_lines",
+    )
+    quantity = models.FloatField(null=True, blank=True)
+    unit = models.CharField(max_length=20, blank=True)
+
+    def __str__(self):
+        return self.raw_text
+
+    class Meta:
+        ordering = ["item", "position"]
+        unique_together = ["item", "position"]
+
+
+def build_recipe_ingredients(parsed_recipes):
+    """
+    Build (unsaved) RecipeIngredient rows for parsed recipes, creating the
+    Ingredients they need. Two queries however many recipes there are.
+
+    Args:
+        parsed_recipes: A list of (item_id, parse_recipe_ingredients() rows)
+    """
+    names = {row[2] for item_id, rows in parsed_recipes for row in rows if row[2]}
+    ingredient_ids = {}
+    if names:
+        Ingredient.objects.bulk_create(
+            [Ingredient(name=name) for name in names], ignore_conflicts=True
+        )
+        ingredient_ids = dict(
+            Ingredient.objects.filter(name__in=names).values_list("name", "id")
+        )
+    return [
+        RecipeIngredient(
+            item_id=item_id,
+            position=position,
+            raw_text=raw,
+            name=name,
+            ingredient_id=ingredient_ids.get(name),
+            quantity=quantity,
+            unit=unit,
+        )
+        for item_id, rows in parsed_recipes
+        for position, raw, name, quantity, unit in rows
+    ]
+
+
+# Signal: Rebuild the parsed ingredients whenever an Item is saved
+# (covers RecipeCreateView, RecipeUpdateView and the admin)
+@receiver(post_save, sender=Item)
+def rebuild_item_ingredients(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return  # Loading fixtures - the ingredient rows come from the fixture
+    if update_fields is not None and "item_recipe" not in update_fields:
+        return  # The recipe text didn't change
+    instance.rebuild_ingredients()
+
+
+# Signals: Keep the full-text search index in sync with the Item table
+SEARCH_FIELDS = {"item_name", "item_description", "item_recipe"}
+
+
+@receiver(post_save, sender=Item)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not set(update_fields) & SEARCH_FIELDS:
+        return  # None of the indexed fields changed
+    search.index_item(instance)
+
+
+@receiver(post_delete, sender=Item)
+def remove_from_search_index(sender, instance, **kwargs):
+    search.remove_item(instance.pk)
+
+
+# Signals: Drop the meal planner's cached id list when recipes are added or deleted
+@receiver(post_save, sender=Item)
+def refresh_recipe_ids_on_create(sender, instance, created, **kwargs):
+    if created:
+        recipe_sampler.invalidate()
+
+
+@receiver(post_delete, sender=Item)
+def refresh_recipe_ids_on_delete(sender, instance, **kwargs):
+    recipe_sampler.invalidate()
+
+
+# Signals: The budget planner's columns hold every price, so any change counts
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def refresh_recipe_prices(sender, instance, **kwargs):
+    budget_planner.invalidate()
+
+
+# Signals: Drop cached shopping lists when a plan's days or recipes change
+@receiver(post_save, sender=MealPlanDay)
+@receiver(post_delete, sender=MealPlanDay)
+def invalidate_plan_shopping_list(sender, instance, **kwargs):
+    from .shopping import invalidate_plans
+
+    invalidate_plans([instance.meal_plan_id])
+
+
+# Signal: A change to a day is a change to its meal plan
+@receiver(post_save, sender=MealPlanDay)
+@receiver(post_delete, sender=MealPlanDay)
+def touch_meal_plan(sender, instance, **kwargs):
+    MealPlan.objects.filter(pk=instance.meal_plan_id).update(updated_at=timezone.now())
+
+
+# Signal: Deleting a recipe sets its days' recipe to NULL with a plain UPDATE,
+# which sends no MealPlanDay signals, so touch the plans here (before the
+# days lose the reference)
+@receiver(pre_delete, sender=Item)
+def touch_recipe_meal_plans(sender, instance, **kwargs):
+    MealPlan.objects.filter(days__recipe=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Item)
+@receiver(pre_delete, sender=Item)  # Before the days' recipe is set to NULL
+def invalidate_recipe_shopping_lists(sender, instance, **kwargs):
+    from .shopping import invalidate_plans
+
+    if kwargs.get("created"):
+        return  # A new recipe isn't in any plan yet
+    invalidate_plans(
+        MealPlanDay.objects.filter(recipe=instance)
+        .values_list("meal_plan_id", flat=True)
+        .distinct()
+    )
+
+
+# Signals: Drop the cached detail page when a recipe is edited or deleted
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def invalidate_recipe_detail(sender, instance, **kwargs):
+    recipe_detail_cache.invalidate(instance.pk)
+
+
+# Signals: Drop a recipe's stale card fragment when it is edited or deleted
+@receiver(post_save, sender=Item)
+def invalidate_previous_recipe_card(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_recipe_card(instance.pk, instance.version - 1)
+
+
+@receiver(post_delete, sender=Item)
+def invalidate_deleted_recipe_card(sender, instance, **kwargs):
+    invalidate_recipe_card(instance.pk, instance.version)
+
+
+# Signal: The cached navbar shows the username
+@receiver(post_save, sender=User)
+def invalidate_user_navbar(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and "username" not in update_fields:
+        return  # e.g. last_login, updated on every login
+    invalidate_navbar(instance.pk)
@@ -0,0 +1,124 @@
+"""
+Cache of rendered recipe detail pages.
+
+RecipeDetailView is the most visited page and renders the same recipe HTML
+for every visitor. The recipe part of the page (recipes/detail_body.html)
+doesn't depend on the user, so it is rendered once per Item and kept in
+Django's cache framework; a cache hit needs neither the database nor the
+template engine. Entries are deleted by the Item post_save/post_delete
+signals in models.py.
+
+Works with any cache backend (local-memory, file-based, ...); set
+RECIPE_DETAIL_CACHE_ALIAS to use a cache other than "default".
+
+Smaller pieces of pages are cached with the {% cache %} template tag in the
+"fragments" cache: the navbar (base/navbar.html) per user and auth state,
+and the recipe cards of the home and search grids (home/recipe_card.html)
+per Item id and version. Editing a recipe bumps its version, so its card
+gets a new key by itself; the signals in models.py still delete the stale
+fragments, so they don't take room in the cache until they expire.
+"""
+
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+
+FRAGMENT_CACHE_ALIAS = "fragments"  # The using= of the {% cache %} tags
+
+
+class RecipeDetailCache:
+    """
+    Rendered detail bodies keyed by Item id, with hit/miss counters.
+
+    The counters are kept in process memory and added to counters in the
+    cache every flush_every lookups, so a lookup is a single cache get().
+    With a shared backend (file-based, memcached, ...) the cache counters
+    add up across worker processes; they lag behind by up to flush_every
+    lookups per process.
+    """
+
+    key_prefix = "recipe-detail"
+    timeout = 60 * 60 * 24
+    flush_every = 100
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, "RECIPE_DETAIL_CACHE_ALIAS", "default")]
+
+    def key(self, item_id):
+        return f"{self.key_prefix}:{item_id}"
+
+    def get(self, item_id):
+        """Return the cached body for this Item, or None (and count the miss)."""
+        body = self.cache.get(self.key(item_id))
+        self._count("hits" if body is not None else "misses")
+        return body
+
+    def set(self, item_id, body):
+        self.cache.set(self.key(item_id), str(body), self.timeout)
+
+    def invalidate(self, item_id):
+        self.cache.delete(self.key(item_id))
+
+    def stats(self):
+        """Return {"hits": ..., "misses": ..., "hit_rate": ...}."""
+        self.flush()
+        counters = self.cache.get_many(
+            [f"{self.key_prefix}:hits", f"{self.key_prefix}:misses"]
+        )
+        hits = counters.get(f"{self.key_prefix}:hits", 0)
+        misses = counters.get(f"{self.key_prefix}:misses", 0)
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self._counts.clear()
+        self.cache.delete_many([f"{self.key_prefix}:hits", f"{self.key_prefix}:misses"])
+
+    def flush(self):
+        """Add this process's counts to the counters in the cache."""
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        for name, delta in counts.items():
+            key = f"{self.key_prefix}:{name}"
+            # add() is a no-op if the counter exists; incr() then bumps it
+            self.cache.add(key, 0, None)
+            try:
+                self.cache.incr(key, delta)
+            except ValueError:  # Evicted between add() and incr()
+                self.cache.set(key, delta, None)
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+            pending = self._counts.total()
+        if pending >= self.flush_every:
+            self.flush()
+
+
+def invalidate_recipe_card(item_id, version):
+    caches[FRAGMENT_CACHE_ALIAS].delete(
+        make_template_fragment_key("recipe_card", [item_id, version])
+    )
+
+
+def invalidate_navbar(user_id):
+    caches[FRAGMENT_CACHE_ALIAS].delete(
+        make_template_fragment_key("navbar", [True, user_id])
+    )
+
+
+# Shared cache used by RecipeDetailView
+recipe_detail_cache = RecipeDetailCache()
@@ -0,0 +1,273 @@
+"""
+Weekly meal plans under a budget.
+
+The meal planner's default plan is 7 uniformly random recipes (see
+sampling.py). BudgetPlanner draws plans that also respect:
+
+    budget        the maximum total item_price of the plan
+    max_price     the maximum item_price of any one day's recipe
+    avoid_recent  no recipe from the last N saved meal plans
+
+It keeps the (id, item_price) columns of the whole catalog in memory, so a
+plan needs no query besides the one for the recent plans' recipes. Plans
+are drawn in batches from the recipes passing the per-day filters, and the
+first one within the budget is kept (rejection sampling). When the budget
+is so tight that random plans almost never fit, a random plan is repaired
+instead: its most expensive recipe is replaced by a random one the budget
+can afford, or else by the cheapest recipe left, until the plan fits.
+
+NumPy is listed in requirements.txt but stays optional: when it is
+installed the columns are NumPy arrays and each batch is checked with
+vectorized operations; otherwise the same algorithm runs in pure Python on
+array.array columns, which is fine for a few thousand recipes (and the
+tests of the NumPy version are reported as skipped). The two don't draw
+the same plans for a given seed.
+
+Like the sampler's id array, the columns are dropped by the Item signals
+in models.py, through a version number in the default cache that reaches
+the other processes when the cache backend is shared, and refreshed every
+RECIPE_ID_CACHE_TIMEOUT seconds.
+"""
+
+import heapq
+import random
+import threading
+import time
+from array import array
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+
+from .sampling import bump_version
+
+try:
+    import numpy as np
+except ImportError:  # Optional, see above
+    np = None
+
+# Rejection sampling draws up to REJECTION_BATCHES batches of candidate plans
+REJECTION_BATCH_SIZE = 256
+REJECTION_BATCHES = 8
+
+
+class PlanInfeasible(ValueError):
+    """No plan satisfies the constraints."""
+
+
+class BudgetPlanner:
+    """
+    Draws meal plans under price constraints from cached catalog columns.
+
+    Usage:
+        budget_planner.plan(7, budget=60)                # 7 Items, $60 total
+        budget_planner.plan(7, max_price=10, seed=42)    # Reproducible
+        budget_planner.plan_ids(7, avoid_recent=4)       # Just the ids
+    """
+
+    version_key = "budget-planner:version"
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self._catalog = None
+        self._version = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get_timeout(self):
+        if self.timeout is not None:
+            return self.timeout
+        return getattr(settings, "RECIPE_ID_CACHE_TIMEOUT", 300)
+
+    def load_catalog(self):
+        """Read the (ids, prices) columns of every Item, in id order."""
+        Item = apps.get_model("food_application", "Item")
+        ids = array("q")
+        prices = array("q")
+        rows = (
+            Item.objects.order_by("id")
+            .values_list("id", "item_price")
+            .iterator(chunk_size=10000)
+        )
+        for pk, price in rows:
+            ids.append(pk)
+            prices.append(price)
+        if np is not None:
+            return np.array(ids, dtype=np.int64), np.array(prices, dtype=np.int64)
+        return ids, prices
+
+    def catalog(self):
+        """Return the cached (ids, prices) columns, loading them if needed."""
+        catalog = self._catalog
+        version = cache.get(self.version_key, 0)
+        if (
+            catalog is None
+            or version != self._version
+            or time.monotonic() - self._loaded_at > self.get_timeout()
+        ):
+            with self._lock:
+                if self._catalog is catalog:  # Nobody reloaded it while we waited
+                    self._catalog = self.load_catalog()
+                    self._version = version
+                    self._loaded_at = time.monotonic()
+                catalog = self._catalog
+        return catalog
+
+    def invalidate(self):
+        """Forget the columns, here and in processes sharing the cache."""
+        bump_version(self.version_key)
+        self._catalog = None
+
+    def recent_recipe_ids(self, plans):
+        """Ids of the recipes in the last `plans` saved meal plans."""
+        MealPlan = apps.get_model("food_application", "MealPlan")
+        MealPlanDay = apps.get_model("food_application", "MealPlanDay")
+        recent_plans = MealPlan.objects.order_by("-created_at", "-id").values("id")
+        return set(
+            MealPlanDay.objects.filter(
+                meal_plan__in=recent_plans[:plans], recipe__isnull=False
+            ).values_list("recipe_id", flat=True)
+        )
+
+    def plan_ids(self, k, budget=None, max_price=None, avoid_recent=0, seed=None):
+        """
+        Pick k distinct recipe ids satisfying the constraints.
+
+        Raises:
+            PlanInfeasible: If no plan satisfies them
+        """
+        ids, prices = self.catalog()
+        excluded = self.recent_recipe_ids(avoid_recent) if avoid_recent else set()
+        plan = plan_numpy if np is not None else plan_python
+        return plan(ids, prices, k, budget, max_price, excluded, seed)
+
+    def plan(self, k, seed=None, fields=None, **constraints):
+        """
+        Return k Items satisfying the constraints (see plan_ids()).
+
+        Args:
+            k: Number of recipes to draw
+            seed: Optional seed, to get the same recipes again
+            fields: Only load these columns (defaults to all of them)
+        """
+        Item = apps.get_model("food_application", "Item")
+        for attempt in range(2):
+            picked = self.plan_ids(k, seed=seed, **constraints)
+            queryset = Item.objects.all()
+            if fields:
+                queryset = queryset.only(*fields)
+            items = queryset.in_bulk(picked)
+            if len(items) == len(picked):
+                break
+            # A recipe was deleted by another process; reload the columns once
+            self.invalidate()
+        return [items[pk] for pk in picked if pk in items]
+
+
+def check_pool_size(pool_size, k):
+    if pool_size < k:
+        raise PlanInfeasible(
+            f"Only {pool_size} recipe(s) match the price limit and aren't in "
+            f"the recent plans; a plan needs {k}."
+        )
+
+
+def check_budget(cheapest_total, budget, k):
+    if cheapest_total > budget:
+        raise PlanInfeasible(
+            f"The {k} cheapest matching recipes cost ${cheapest_total} together, "
+            f"over the ${budget} budget."
+        )
+
+
+def plan_numpy(ids, prices, k, budget, max_price, excluded, seed):
+    mask = np.ones(len(ids), dtype=bool)
+    if max_price is not None:
+        mask &= prices <= max_price
+    if excluded:
+        mask &= ~np.isin(ids, np.fromiter(excluded, dtype=np.int64))
+    pool_ids = ids[mask]
+    pool_prices = prices[mask]
+    n = len(pool_ids)
+    check_pool_size(n, k)
+    rng = np.random.default_rng(seed)
+    if budget is None:
+        return pool_ids[rng.choice(n, size=k, replace=False)].tolist()
+    check_budget(int(np.partition(pool_prices, k - 1)[:k].sum()), budget, k)
+
+    # Rejection sampling: k indices per row (with replacement, so rows with
+    # a repeated recipe are rejected too)
+    for _ in range(REJECTION_BATCHES):
+        rows = rng.integers(0, n, size=(REJECTION_BATCH_SIZE, k))
+        fits = pool_prices[rows].sum(axis=1) <= budget
+        sorted_rows = np.sort(rows, axis=1)
+        fits &= (sorted_rows[:, 1:] != sorted_rows[:, :-1]).all(axis=1)
+        hits = np.flatnonzero(fits)
+        if hits.size:
+            return pool_ids[rows[hits[0]]].tolist()
+
+    # Greedy repair
+    chosen = rng.choice(n, size=k, replace=False)
+    total = int(pool_prices[chosen].sum())
+    while total > budget:
+        worst = int(np.argmax(pool_prices[chosen]))
+        allowance = budget - (total - int(pool_prices[chosen[worst]]))
+        available = np.ones(n, dtype=bool)
+        available[chosen] = False
+        affordable = np.flatnonzero(available & (pool_prices <= allowance))
+        if affordable.size:
+            replacement = rng.choice(affordable)
+        else:
+            # Some recipe left is cheaper, or the plan would be the cheapest
+            replacement = np.flatnonzero(available)[np.argmin(pool_prices[available])]
+        total += int(pool_prices[replacement] - pool_prices[chosen[worst]])
+        chosen[worst] = replacement
+    return pool_ids[chosen].tolist()
+
+
+def plan_python(ids, prices, k, budget, max_price, excluded, seed):
+    pool = [
+        index
+        for index, (pk, price) in enumerate(zip(ids, prices))
+        if (max_price is None or price <= max_price) and pk not in excluded
+    ]
+    n = len(pool)
+    check_pool_size(n, k)
+    rng = random.Random(seed) if seed is not None else random
+    if budget is None:
+        return [ids[index] for index in rng.sample(pool, k)]
+    check_budget(sum(heapq.nsmallest(k, (prices[i] for i in pool))), budget, k)
+
+    # Rejection sampling
+    for _ in range(REJECTION_BATCHES * REJECTION_BATCH_SIZE):
+        chosen = rng.sample(pool, k)
+        if sum(prices[index] for index in chosen) <= budget:
+            return [ids[index] for index in chosen]
+
+    # Greedy repair
+    chosen = rng.sample(pool, k)
+    total = sum(prices[index] for index in chosen)
+    while total > budget:
+        worst = max(range(k), key=lambda slot: prices[chosen[slot]])
+        allowance = budget - (total - prices[chosen[worst]])
+        in_plan = set(chosen)
+        affordable = [
+            index
+            for index in pool
+            if prices[index] <= allowance and index not in in_plan
+        ]
+        if affordable:
+            replacement = rng.choice(affordable)
+        else:
+            # Some recipe left is cheaper, or the plan would be the cheapest
+            replacement = min(
+                (index for index in pool if index not in in_plan),
+                key=prices.__getitem__,
+            )
+        total += prices[replacement] - prices[chosen[worst]]
+        chosen[worst] = replacement
+    return [ids[index] for index in chosen]
+
+
+# Shared planner for the meal planner
+budget_planner = BudgetPlanner()
@@ -0,0 +1,168 @@
+"""
+Opt-in CPU and memory profiling of single requests.
+
+A staff user can profile any page by adding ?_profile=cpu, ?_profile=memory
+or ?_profile=cpu,memory (or the same value in an X-Profile request header).
+Other users' switches are ignored. Besides, PROFILING_SAMPLE_RATE profiles
+that fraction of all requests in the PROFILING_SAMPLE_MODES, so a low rate
+can stay on in production.
+
+Results are written to PROFILING_DIR. The response to a staff user's
+request has an X-Profile header listing the files; the files of sampled
+requests are only logged (to the food_application.profiling logger), so
+server paths never reach other users:
+
+    cpu      <name>.prof: cProfile stats, for pstats or snakeviz
+    memory   <name>.mem.txt: peak traced memory and the
+             PROFILING_TOP_ALLOCATIONS lines that allocated the most memory
+             still alive at the end of the request
+
+tracemalloc traces the whole process, so under load a memory profile also
+includes allocations made by concurrent requests. The same goes for CPU
+profiles of async views, which share the event loop's thread.
+"""
+
+import cProfile
+import logging
+import os
+import random
+import re
+import time
+import tracemalloc
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_PARAM = "_profile"
+PROFILE_HEADER = "X-Profile"
+PROFILE_MODES = {"cpu", "memory"}
+
+
+def requested_modes(request):
+    """The profile modes asked for by the request's query parameter or header."""
+    value = request.GET.get(PROFILE_PARAM) or request.headers.get(PROFILE_HEADER)
+    if not value:
+        return set()
+    modes = {mode.strip().lower() for mode in value.split(",")}
+    if modes & {"1", "all"}:
+        return set(PROFILE_MODES)
+    return modes & PROFILE_MODES
+
+
+def sampled_modes():
+    """The modes to profile this request in, if it is picked by sampling."""
+    rate = getattr(settings, "PROFILING_SAMPLE_RATE", 0.0)
+    if rate and random.random() < rate:
+        return set(getattr(settings, "PROFILING_SAMPLE_MODES", ["cpu"]))
+    return set()
+
+
+class RequestProfiler:
+    """Context manager profiling the code it wraps and writing the results."""
+
+    def __init__(self, request, modes):
+        self.request = request
+        self.modes = modes
+        self.files = []
+
+    def __enter__(self):
+        self.started_tracing = False
+        if "memory" in self.modes and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        self.profiler = cProfile.Profile() if "cpu" in self.modes else None
+        if self.profiler:
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.profiler:
+            self.profiler.disable()
+        snapshot = peak = None
+        if "memory" in self.modes and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            if self.started_tracing:
+                tracemalloc.stop()
+
+        directory = getattr(settings, "PROFILING_DIR", "profiles")
+        os.makedirs(directory, exist_ok=True)
+        base_path = os.path.join(directory, self.file_name())
+        if self.profiler:
+            self.profiler.dump_stats(f"{base_path}.prof")
+            self.files.append(f"{base_path}.prof")
+        if snapshot is not None:
+            self.write_memory_report(f"{base_path}.mem.txt", snapshot, peak)
+            self.files.append(f"{base_path}.mem.txt")
+
+    def file_name(self):
+        path = re.sub(r"[^\w-]+", "_", self.request.path).strip("_") or "root"
+        return f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10**9}-{path}"
+
+    def write_memory_report(self, path, snapshot, peak):
+        snapshot = snapshot.filter_traces(
+            [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            ]
+        )
+        top = snapshot.statistics("lineno")[
+            : getattr(settings, "PROFILING_TOP_ALLOCATIONS", 25)
+        ]
+        with open(path, "w") as report:
+            report.write(f"{self.request.method} {self.request.get_full_path()}\n")
+            report.write(f"Peak traced memory: {peak / 1024:.1f} KiB\n\n")
+            for statistic in top:
+                report.write(f"{statistic}\n")
+
+
+class ProfilingMiddleware:
+    """Profiles the requests picked by the switches above; must come after
+    AuthenticationMiddleware."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        modes = requested_modes(request)
+        if modes and not request.user.is_staff:
+            modes = set()
+        requested = bool(modes)
+        modes = modes or sampled_modes()
+        if not modes:
+            return self.get_response(request)
+
+        with RequestProfiler(request, modes) as profiler:
+            response = self.get_response(request)
+        return self.report(request, response, profiler, requested)
+
+    async def __acall__(self, request):
+        modes = requested_modes(request)
+        if modes and not (await request.auser()).is_staff:
+            modes = set()
+        requested = bool(modes)
+        modes = modes or sampled_modes()
+        if not modes:
+            return await self.get_response(request)
+
+        with RequestProfiler(request, modes) as profiler:
+            response = await self.get_response(request)
+        return self.report(request, response, profiler, requested)
+
+    def report(self, request, response, profiler, requested):
+        """Tell the staff user who asked where the files are, else log them."""
+        files = ", ".join(profiler.files)
+        if requested:
+            response[PROFILE_HEADER] = files
+        else:
+            logger.info("Profiled %s %s: %s", request.method, request.path, files)
+        return response
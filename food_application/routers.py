@@ -0,0 +1,157 @@
+"""
+Read/write splitting between the primary database and a read replica.
+
+When a "replica" alias is configured (see DJANGO_REPLICA_DB in settings),
+PrimaryReplicaRouter sends the reads of GET/HEAD requests to it and every
+write to "default". Everything else (management commands, the shell,
+non-GET requests, transactions) reads from the primary too.
+
+The replica lags behind the primary, so a client that just wrote must not
+read from it yet, or e.g. save_meal_plan's redirect to saved_meal_plans
+could miss the new plan. ReplicaRoutingMiddleware takes care of it: as
+soon as a request runs an INSERT, UPDATE or DELETE (seen by an execute
+wrapper on the primary's connection; db_for_write() alone also routes
+reads such as get_or_create()'s SELECT), its later reads go to the
+primary, and the response sets a cookie keeping that client's reads on
+the primary for REPLICA_PIN_SECONDS.
+
+Sessions and users are always read from the primary: a login writes the
+session, and once the cookie expires a replica that is behind would not
+have it yet and log the user out.
+
+With SQLite, ``python manage.py sync_replica`` copies the primary to the
+replica file.
+
+This module does not import the models, so search.py can import it.
+"""
+
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+REPLICA_DB_ALIAS = "replica"
+PIN_COOKIE = "pin_primary"
+WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+# Apps whose tables are always read from the primary (see above)
+PRIMARY_ONLY_APPS = {"sessions", "auth"}
+
+# Routing state of the request being handled in this context, if any
+current_routing = ContextVar("current_request_routing", default=None)
+
+
+class RequestRouting:
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.wrote = False
+
+
+def read_alias():
+    """The database alias reads should go to right now."""
+    routing = current_routing.get()
+    if (
+        routing is None
+        or not routing.use_replica
+        or REPLICA_DB_ALIAS not in settings.DATABASES
+        or connections[DEFAULT_DB_ALIAS].in_atomic_block
+    ):
+        return DEFAULT_DB_ALIAS
+    return REPLICA_DB_ALIAS
+
+
+def note_writes(execute, sql, params, many, context):
+    """Execute wrapper marking the current request as having written."""
+    routing = current_routing.get()
+    if (
+        routing is not None
+        and not routing.wrote
+        and sql.lstrip()[:7].upper().startswith(WRITE_STATEMENTS)
+    ):
+        # Read your own writes for the rest of the request
+        routing.wrote = True
+        routing.use_replica = False
+    return execute(sql, params, many, context)
+
+
+def watch_writes(connection):
+    if note_writes not in connection.execute_wrappers:
+        connection.execute_wrappers.append(note_writes)
+
+
+@receiver(connection_created)
+def watch_new_connection(sender, connection, **kwargs):
+    if connection.alias == DEFAULT_DB_ALIAS:
+        watch_writes(connection)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_ONLY_APPS:
+            return DEFAULT_DB_ALIAS
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        # Connections opened before this module was imported weren't seen
+        # by watch_new_connection(). This is a SELECT as often as a write
+        # (get_or_create()), so only the wrapper marks the request
+        watch_writes(connections[DEFAULT_DB_ALIAS])
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both databases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema along with the data
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        routing = self.get_routing(request)
+        token = current_routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_routing.reset(token)
+        return self.pin(response, routing)
+
+    async def __acall__(self, request):
+        routing = self.get_routing(request)
+        token = current_routing.set(routing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_routing.reset(token)
+        return self.pin(response, routing)
+
+    def get_routing(self, request):
+        return RequestRouting(
+            use_replica=request.method in ("GET", "HEAD")
+            and PIN_COOKIE not in request.COOKIES
+        )
+
+    def pin(self, response, routing):
+        if routing.wrote and REPLICA_DB_ALIAS in settings.DATABASES:
+            response.set_cookie(
+                PIN_COOKIE,
+                "1",
+                max_age=getattr(settings, "REPLICA_PIN_SECONDS", 15),
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
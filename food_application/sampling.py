@@ -0,0 +1,159 @@
+"""
+Random recipe sampling without loading the recipe table.
+
+The meal planner only needs 7 random recipes. Instead of loading every Item
+(with its recipe HTML) and calling random.sample() on the list, the sampler
+keeps a compact array of all Item ids in memory, draws the ids from it and
+then fetches just those rows.
+
+The id array is dropped by the Item post_save/post_delete signals in
+models.py whenever a recipe is added or deleted. invalidate() also bumps a
+version number in the default cache, which every process compares with the
+version of its own array on each use. With a cache backend shared between
+processes (file-based, memcached, ...) that reaches every worker; with the
+per-process local-memory backend it only reaches this process, and other
+workers catch up when their array is refreshed, every
+RECIPE_ID_CACHE_TIMEOUT seconds.
+"""
+
+import random
+import threading
+import time
+from array import array
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+
+
+def bump_version(key):
+    """Increment the shared version number stored in the cache at `key`."""
+    try:
+        cache.incr(key)
+    except ValueError:  # Not set yet, or evicted
+        cache.add(key, 1, None)
+
+
+class RecipeSampler:
+    """
+    Draws random recipes from a cached array of Item ids.
+
+    Usage:
+        recipe_sampler.sample(7)           # 7 random Items
+        recipe_sampler.sample(7, seed=42)  # The same 7 Items every time
+        recipe_sampler.count()             # Number of recipes, no query
+        await recipe_sampler.acount()      # The same, from async code
+    """
+
+    version_key = "recipe-sampler:version"
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self._ids = None
+        self._version = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get_timeout(self):
+        if self.timeout is not None:
+            return self.timeout
+        return getattr(settings, "RECIPE_ID_CACHE_TIMEOUT", 300)
+
+    def is_stale(self, version):
+        return (
+            version != self._version
+            or time.monotonic() - self._loaded_at > self.get_timeout()
+        )
+
+    def ids(self):
+        """Return the cached id array, loading it if needed."""
+        ids = self._ids
+        version = cache.get(self.version_key, 0)
+        if ids is None or self.is_stale(version):
+            with self._lock:
+                if self._ids is ids:  # Nobody reloaded it while we waited
+                    Item = apps.get_model("food_application", "Item")
+                    self._ids = array(
+                        "q",
+                        Item.objects.order_by("id")
+                        .values_list("id", flat=True)
+                        .iterator(chunk_size=10000),
+                    )
+                    self._version = version
+                    self._loaded_at = time.monotonic()
+                ids = self._ids
+        return ids
+
+    async def aids(self):
+        """Async ids(), for async views."""
+        ids = self._ids
+        version = await cache.aget(self.version_key, 0)
+        if ids is None or self.is_stale(version):
+            # No lock: two coroutines may both reload, which is harmless
+            Item = apps.get_model("food_application", "Item")
+            ids = array(
+                "q",
+                [
+                    pk
+                    async for pk in Item.objects.order_by("id").values_list(
+                        "id", flat=True
+                    )
+                ],
+            )
+            self._ids = ids
+            self._version = version
+            self._loaded_at = time.monotonic()
+        return ids
+
+    def invalidate(self):
+        """Forget the id array, here and in processes sharing the cache."""
+        bump_version(self.version_key)
+        self._ids = None
+
+    def count(self):
+        return len(self.ids())
+
+    async def acount(self):
+        return len(await self.aids())
+
+    def sample_ids(self, k, seed=None):
+        """
+        Pick k ids. If there are fewer than k recipes, every recipe is used
+        once and the rest of the slots repeat random recipes.
+        """
+        rng = random.Random(seed) if seed is not None else random
+        ids = self.ids()
+        if not ids:
+            return []
+        picked = rng.sample(ids, min(len(ids), k))
+        while len(picked) < k:
+            picked.append(rng.choice(ids))
+        return picked
+
+    def sample(self, k, seed=None, fields=None):
+        """
+        Return k random Items, padded with None if there are no recipes.
+
+        Args:
+            k: Number of recipes to draw
+            seed: Optional seed, to get the same recipes again
+            fields: Only load these columns (defaults to all of them)
+        """
+        Item = apps.get_model("food_application", "Item")
+        for attempt in range(2):
+            picked = self.sample_ids(k, seed=seed)
+            queryset = Item.objects.all()
+            if fields:
+                queryset = queryset.only(*fields)
+            items = queryset.in_bulk(picked)
+            if len(items) == len(set(picked)):
+                break
+            # A recipe was deleted by another process; reload the ids once
+            self.invalidate()
+
+        recipes = [items[pk] for pk in picked if pk in items]
+        return recipes + [None] * (k - len(recipes))
+
+
+# Shared sampler for the meal planner
+recipe_sampler = RecipeSampler()
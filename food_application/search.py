@@ -0,0 +1,176 @@
+"""
+Full-text recipe search backed by an SQLite FTS5 index.
+
+The index is a virtual table (created in migration 0010) holding, for each
+Item, its name, its description and the plain text of its recipe (HTML tags
+removed). Its rowid is the Item id. It is kept in sync by the Item
+post_save/post_delete signals in models.py, and can be rebuilt from scratch
+with ``python manage.py rebuild_search_index``.
+
+This module does not import the models, so models.py can import it.
+"""
+
+import re
+from html import unescape
+
+from django.db import connection, connections
+from django.utils.html import strip_tags
+
+from .routers import read_alias
+
+FTS_TABLE = "food_application_item_fts"
+
+# Column weights for bm25(): a hit in the name counts more than one in the
+# description, which counts more than one somewhere in the recipe text
+BM25_WEIGHTS = (10.0, 5.0, 1.0)
+
+# Words in the user's query; everything else (quotes, operators...) is ignored
+QUERY_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def search_enabled():
+    """The FTS5 index only exists on SQLite databases."""
+    return connection.vendor == "sqlite"
+
+
+def recipe_text(html_content):
+    """Plain text of a recipe, without HTML tags, attributes or entities."""
+    return unescape(strip_tags(html_content or ""))
+
+
+def build_match_query(query):
+    """
+    Turn free text from the search box into a safe FTS5 MATCH expression.
+
+    Each word becomes a quoted prefix term and all of them must match, so
+    "chick soup" finds "Chicken Noodle Soup". Returns "" if there are no words.
+    """
+    tokens = QUERY_TOKEN_RE.findall(query)
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def index_item(item):
+    """Add or replace one Item in the index."""
+    if not search_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [item.pk])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} "
+            "(rowid, item_name, item_description, recipe_text) "
+            "VALUES (%s, %s, %s, %s)",
+            [
+                item.pk,
+                item.item_name,
+                item.item_description,
+                recipe_text(item.item_recipe),
+            ],
+        )
+
+
+def remove_item(item_id):
+    """Remove one Item from the index."""
+    if not search_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [item_id])
+
+
+def add_rows(rows):
+    """
+    Index new Items in one executemany() call.
+
+    Args:
+        rows: List of (id, item_name, item_description, recipe_text), with
+            the recipe already converted by recipe_text()
+
+    Returns:
+        The number of rows indexed
+    """
+    if not search_enabled() or not rows:
+        return 0
+    with connection.cursor() as cursor:
+        return _insert_rows(cursor, rows)
+
+
+def rebuild_index(rows, batch_size=500):
+    """
+    Replace the whole index.
+
+    Args:
+        rows: Iterable of (id, item_name, item_description, item_recipe)
+        batch_size: Number of rows inserted per executemany() call
+
+    Returns:
+        The number of rows indexed
+    """
+    total = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        batch = []
+        for item_id, name, description, html_content in rows:
+            batch.append([item_id, name, description, recipe_text(html_content)])
+            if len(batch) >= batch_size:
+                total += _insert_rows(cursor, batch)
+                batch = []
+        if batch:
+            total += _insert_rows(cursor, batch)
+        # Merge the index b-trees now rather than on later writes
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+    return total
+
+
+def _insert_rows(cursor, batch):
+    cursor.executemany(
+        f"INSERT INTO {FTS_TABLE} "
+        "(rowid, item_name, item_description, recipe_text) "
+        "VALUES (%s, %s, %s, %s)",
+        batch,
+    )
+    return len(batch)
+
+
+class SearchResults:
+    """
+    Lazy, bm25-ordered list of matching Item ids.
+
+    Supports count() and slicing, so it can be handed straight to Django's
+    Paginator; each page is a single LIMIT/OFFSET query on the index.
+    """
+
+    def __init__(self, query):
+        self.match = build_match_query(query)
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            if not self.match:
+                self._count = 0
+            else:
+                with connections[read_alias()].cursor() as cursor:
+                    cursor.execute(
+                        f"SELECT COUNT(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+                        [self.match],
+                    )
+                    self._count = cursor.fetchone()[0]
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError("SearchResults only supports slicing")
+        start = index.start or 0
+        stop = index.stop if index.stop is not None else self.count()
+        if not self.match or stop <= start:
+            return []
+        weights = ", ".join(str(weight) for weight in BM25_WEIGHTS)
+        with connections[read_alias()].cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+                # rowid breaks ties, so pages never overlap or skip a row
+                f"ORDER BY bm25({FTS_TABLE}, {weights}), rowid LIMIT %s OFFSET %s",
+                [self.match, stop - start, start],
+            )
+            return [row[0] for row in cursor.fetchall()]
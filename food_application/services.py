@@ -0,0 +1,55 @@
+"""
+Meal plan operations shared by the views and the management commands.
+"""
+
+from django.db import transaction
+
+from .models import Item, MealPlan, MealPlanDay
+
+DAYS_OF_WEEK = [
+    "Monday",
+    "Tuesday",
+    "Wednesday",
+    "Thursday",
+    "Friday",
+    "Saturday",
+    "Sunday",
+]
+
+
+def create_meal_plan(name, recipe_ids, notes=None):
+    """
+    Save a meal plan and its days in one transaction.
+
+    Args:
+        name: Name of the meal plan
+        recipe_ids: One recipe id (or None) per day, Monday first. Pass 7 ids
+            for a weekly plan, 14 for two weeks, and so on.
+        notes: Optional notes
+
+    Days without a recipe, or whose recipe no longer exists, are skipped.
+    Whatever happens, the plan is saved completely or not at all: one
+    INSERT for the plan, one SELECT for the recipes and one bulk INSERT
+    for the days.
+
+    Returns:
+        The new MealPlan
+    """
+    wanted_ids = {recipe_id for recipe_id in recipe_ids if recipe_id is not None}
+
+    with transaction.atomic():
+        meal_plan = MealPlan.objects.create(name=name, notes=notes)
+        recipes = Item.objects.only("id").in_bulk(wanted_ids) if wanted_ids else {}
+        MealPlanDay.objects.bulk_create(
+            [
+                MealPlanDay(
+                    meal_plan=meal_plan,
+                    day_of_week=DAYS_OF_WEEK[index % 7],
+                    recipe=recipes[recipe_id],
+                    order=index,
+                )
+                for index, recipe_id in enumerate(recipe_ids)
+                if recipe_id in recipes
+            ]
+        )
+    return meal_plan
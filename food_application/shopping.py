@@ -0,0 +1,227 @@
+"""
+Building shopping lists from meal plans.
+
+A compiled shopping list only depends on which recipe is on which day and
+on the content of those recipes. The compiled result is therefore cached
+under the meal plan, together with a digest of the plan's days and the
+``version`` of every recipe involved: if any of them changes, the digest no
+longer matches and the list is compiled again. The cache entry is also
+deleted straight away by the MealPlanDay/Item signals in models.py.
+
+The merged list is totalled by the database: every RecipeIngredient row
+carries its canonical Ingredient, quantity and unit (parsed once, when the
+recipe is saved), so aggregate_ingredients() is a single GROUP BY over the
+plans' days, however many plans and recipes there are.
+"""
+
+import hashlib
+from itertools import groupby
+from operator import itemgetter
+
+from django.core.cache import cache
+from django.db.models import Count, Sum
+
+from .models import MealPlanDay, RecipeIngredient
+
+SHOPPING_LIST_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def plan_cache_key(plan_id):
+    return f"shopping-list:v2:{plan_id}"
+
+
+def invalidate_plans(plan_ids):
+    """Drop the cached shopping lists of these meal plans."""
+    cache.delete_many([plan_cache_key(plan_id) for plan_id in plan_ids])
+
+
+def load_recipe_ingredients(recipe_ids):
+    """
+    Load the ingredient lines of several recipes with a single query.
+
+    Args:
+        recipe_ids: Iterable of Item ids
+
+    Returns:
+        A dict mapping each Item id to its list of raw_text lines, in
+        recipe order
+    """
+    ingredients_by_recipe = {}
+    rows = (
+        RecipeIngredient.objects.filter(item_id__in=recipe_ids)
+        .order_by("item_id", "position")
+        .values_list("item_id", "raw_text")
+    )
+    for item_id, raw_text in rows:
+        ingredients_by_recipe.setdefault(item_id, []).append(raw_text)
+    return ingredients_by_recipe
+
+
+def get_plan_days(plan_id):
+    """
+    The plan's days as (day_of_week, recipe_id, recipe_name, recipe_version)
+    tuples, in order. One query, no model instances.
+    """
+    return list(
+        MealPlanDay.objects.filter(meal_plan_id=plan_id)
+        .order_by("order")
+        .values_list("day_of_week", "recipe_id", "recipe__item_name", "recipe__version")
+    )
+
+
+def days_digest(days):
+    """A short hash identifying the days, their recipes and recipe versions."""
+    key = "|".join(
+        f"{day_of_week}:{recipe_id}:{version}"
+        for day_of_week, recipe_id, recipe_name, version in days
+    )
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def compile_shopping_list(days):
+    """
+    List the ingredient lines of a plan's days, for the "by day" view.
+
+    Returns:
+        A list of {"recipe_name", "day", "ingredients"} dicts, where
+        ingredients are the full lines, measurements included
+    """
+    ingredients_by_recipe = load_recipe_ingredients(
+        {recipe_id for day_of_week, recipe_id, name, version in days if recipe_id}
+    )
+    return [
+        {
+            "recipe_name": recipe_name,
+            "day": day_of_week,
+            "ingredients": ingredients_by_recipe[recipe_id],
+        }
+        for day_of_week, recipe_id, recipe_name, version in days
+        if ingredients_by_recipe.get(recipe_id)
+    ]
+
+
+def format_amount(quantity, unit):
+    """A total as text: "2 cups", "1 cup", or just "3" for a count."""
+    number = f"{round(quantity, 2):g}"
+    if not unit:
+        return number
+    return f"{number} {unit}" if quantity == 1 else f"{number} {unit}s"
+
+
+def aggregate_ingredients(plan_ids):
+    """
+    Total the ingredients of the plans' days with one GROUP BY query.
+
+    A recipe on several days counts once per day. Quantities are summed per
+    unit (units aren't converted, so "2 cups" and "3 tablespoons" of the
+    same ingredient stay separate); lines without one are only counted.
+
+    Returns:
+        A list of (ingredient, count, amounts) tuples sorted by ingredient,
+        where count is the number of recipe lines using the ingredient and
+        amounts the totals as text ("5 cups + 2 tablespoons", or "")
+    """
+    rows = (
+        RecipeIngredient.objects.filter(
+            item__mealplanday__meal_plan_id__in=plan_ids, ingredient__isnull=False
+        )
+        .values_list("ingredient__name", "unit")
+        .annotate(uses=Count("id"), total=Sum("quantity"))
+        .order_by("ingredient__name", "unit")
+    )
+    totals = []
+    for name, group in groupby(rows, key=itemgetter(0)):
+        count = 0
+        amounts = []
+        for _, unit, uses, total in group:
+            count += uses
+            if total is not None:
+                amounts.append(format_amount(total, unit))
+        totals.append((name, count, " + ".join(amounts)))
+    return totals
+
+
+def get_compiled_shopping_list(plan_id):
+    """
+    Return (compile_shopping_list(), aggregate_ingredients()) for a meal
+    plan, from the cache if the plan's days and recipes haven't changed
+    since it was compiled.
+    """
+    days = get_plan_days(plan_id)
+    digest = days_digest(days)
+    key = plan_cache_key(plan_id)
+
+    cached = cache.get(key)
+    if cached is not None and cached["digest"] == digest:
+        return cached["recipes_with_ingredients"], cached["ingredient_totals"]
+
+    recipes_with_ingredients = compile_shopping_list(days)
+    ingredient_totals = aggregate_ingredients([plan_id])
+    cache.set(
+        key,
+        {
+            "digest": digest,
+            "recipes_with_ingredients": recipes_with_ingredients,
+            "ingredient_totals": ingredient_totals,
+        },
+        SHOPPING_LIST_CACHE_TIMEOUT,
+    )
+    return recipes_with_ingredients, ingredient_totals
+
+
+def get_plans_days(plan_ids):
+    """
+    The days of several plans, in plan and day order, like get_plan_days()
+    but labelled "<plan name>: <day_of_week>". One query for all the plans.
+    """
+    rows = (
+        MealPlanDay.objects.filter(meal_plan_id__in=plan_ids)
+        .order_by("-meal_plan__created_at", "meal_plan_id", "order")
+        .values_list(
+            "meal_plan__name",
+            "day_of_week",
+            "recipe_id",
+            "recipe__item_name",
+            "recipe__version",
+        )
+    )
+    return [
+        (f"{plan_name}: {day_of_week}", recipe_id, recipe_name, version)
+        for plan_name, day_of_week, recipe_id, recipe_name, version in rows
+    ]
+
+
+def compile_combined_shopping_list(plan_ids):
+    """
+    Compile one shopping list for several meal plans (e.g. a month of them).
+
+    The days of every plan are read with one query and the ingredients of
+    every distinct recipe with another, however many days a recipe is on.
+    The merged list is totalled by a third one (see aggregate_ingredients()).
+
+    Returns:
+        (recipes_with_ingredients, ingredients_with_counts) where
+        ingredients_with_counts is the merged list of (ingredient, count,
+        amounts) tuples, sorted by ingredient, counting every day a recipe
+        is on
+    """
+    recipes_with_ingredients = compile_shopping_list(get_plans_days(plan_ids))
+    return recipes_with_ingredients, aggregate_ingredients(plan_ids)
+
+
+def format_shopping_list(ingredients_with_counts):
+    """
+    The text stored in ShoppingList.ingredients: one ingredient per line,
+    without measurements, with a recipe count when it is used more than once.
+    """
+    ingredient_list_text = []
+    for ingredient, count, amounts in ingredients_with_counts:
+        if count > 1:
+            ingredient_list_text.append(f"{ingredient} (in {count} recipes)")
+        else:
+            ingredient_list_text.append(ingredient)
+    return "\n".join(ingredient_list_text)
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode()).hexdigest()
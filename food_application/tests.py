@@ -1,3 +1,1152 @@
-from django.test import TestCase
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache, caches
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.template import engines
+from django.template.backends.django import Template as BackendTemplate
+from django.test import (
+    AsyncRequestFactory,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import ResolverMatch, reverse
+
+from . import async_views, views
+from .ingredients import (
+    IngredientNormalizer,
+    extract_ingredients_from_html,
+    extract_ingredients_from_html_bs4,
+)
+from .management.commands.bench import Command as BenchCommand
+from .middleware import QueryBudgetExceeded, QueryInstrumentationMiddleware
+from .middleware import RequestStats, TimedTemplate, current_stats, query_budget
+from .models import ExcludedIngredient, Item, MealPlan, MealPlanDay
+from .models import RecipeIngredient
+from .page_cache import recipe_detail_cache
+from .planner import BudgetPlanner, PlanInfeasible, np, plan_numpy, plan_python
+from .profiling import ProfilingMiddleware
+from .routers import PIN_COOKIE, PrimaryReplicaRouter, ReplicaRoutingMiddleware
+from .routers import read_alias
+from .sampling import RecipeSampler
+from .search import SearchResults
+from .services import create_meal_plan
+from .shopping import get_compiled_shopping_list
+
+# Recipe HTML in the shapes TinyMCE produces, plus some malformed markup.
+# The streaming extractor must give exactly the same result as BeautifulSoup.
+INGREDIENT_PARITY_CORPUS = [
+    "",
+    "<p>Recipe coming soon!</p>",
+    "<h2>Ingredients</h2><ul><li>2 cups flour</li><li>1 tsp salt</li></ul>",
+    "<h3>Ingredients:</h3><ol><li>1 egg</li></ol><h3>Steps</h3><ol><li>Mix</li></ol>",
+    "<p><strong>Ingredients</strong></p><ul><li>3 cloves garlic</li></ul>",
+    "<p><strong>For the sauce ingredients</strong></p><ul><li>Tomatoes</li></ul>"
+    "<p><strong>For the pasta ingredients</strong></p><ul><li>Pasta</li></ul>",
+    "<ul><li>Butter</li><li>Sugar</li></ul><ol><li>Cream the butter</li></ol>",
+    "<h2>Ingredients</h2><ul><li>Salt</li><li>Salt</li><li>Pepper</li></ul>",
+    "<ul><li>2 <strong>cups</strong> rice</li><li>1&frac12; tsp cumin</li></ul>",
+    "<ul><li>&nbsp;</li><li>Olive oil&nbsp;</li><li> &amp; more </li></ul>",
+    "<ul><li>Outer<ul><li>Inner</li></ul></li></ul>",
+    "<ul><li>a<li>b</li></li></ul>",
+    "<h2> <b>Ingredients</b></h2><ul><li>Whitespace sibling</li></ul>",
+    "<h2><!--Ingredients--></h2><ul><li>Comment heading</li></ul>",
+    "<ul><li>Flour<script>var x = 1;</script><!-- note --></li></ul>",
+    "<p>Ingredients<ul><li>List inside the paragraph</li></ul></p>",
+    "<div><h2>Ingredients</div><ul><li>Heading closed by its parent</li></ul>",
+    "<h2>Ingredients</h3><ul><li>Stray closing tag</li></ul>",
+    "<h2>Ingredients</h2><p>No list here</p>",
+    "<p>1 cup milk<br>2 eggs</p>",
+    "<ul><li>Line one<br/>line two</li><li><img src='x.png'>Picture</li></ul>",
+    "<table><tr><td><ul><li>In a table</li></ul></td></tr></table>",
+    "<h2>INGREDIENTS</h2>\n<ul>\n  <li>\n    1 lb beef\n  </li>\n</ul>",
+]
+
+
+class IngredientExtractionParityTests(SimpleTestCase):
+    def test_matches_beautifulsoup_implementation(self):
+        for html_content in INGREDIENT_PARITY_CORPUS:
+            with self.subTest(html_content=html_content):
+                self.assertEqual(
+                    extract_ingredients_from_html(html_content),
+                    extract_ingredients_from_html_bs4(html_content),
+                )
+
+    def test_heading_list_is_preferred(self):
+        html_content = (
+            "<ul><li>Serves 4</li></ul>"
+            "<h2>Ingredients</h2><ul><li>2 cups flour</li><li>2 cups flour</li></ul>"
+        )
+        self.assertEqual(extract_ingredients_from_html(html_content), ["2 cups flour"])
+
+    def test_views_do_not_import_bs4(self):
+        code = (
+            "import sys, django; django.setup(); "
+            "import food_application.views; "
+            "sys.exit('bs4' in sys.modules)"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": "foodApp.settings"},
+        )
+        self.assertEqual(result.returncode, 0)
+
+
+class IngredientNormalizerTests(SimpleTestCase):
+    def test_strips_measurements(self):
+        normalizer = IngredientNormalizer()
+        examples = {
+            "⅓ cup olive oil": "Olive oil",
+            "5 cloves garlic, grated or minced": "Garlic, grated or minced",
+            "2 Tbsp brown sugar": "Brown sugar",
+            "1½ lb skirt steak (or cut to fit your grill pan)": "Skirt steak",
+            "2 large eggs": "Eggs",
+            "Salt": "Salt",
+            "(optional)": "",
+        }
+        self.assertEqual(normalizer.normalize_many(examples), list(examples.values()))
+
+    def test_parses_quantities(self):
+        normalizer = IngredientNormalizer()
+        examples = {
+            "1 1/2 cups flour": ("Flour", 1.5, "cup"),
+            "½ Tbsp sugar": ("Sugar", 0.5, "tablespoon"),
+            "1½ lb skirt steak": ("Skirt steak", 1.5, "pound"),
+            "2 large eggs": ("Eggs", 2.0, ""),
+            "2 eggs": ("2 eggs", None, ""),  # Nothing stripped, no quantity
+            "Salt to taste": ("Salt to taste", None, ""),
+        }
+        for text, parsed in examples.items():
+            self.assertEqual(normalizer.parse(text), parsed)
+
+    def test_results_are_memoized(self):
+        normalizer = IngredientNormalizer(cache_size=2)
+        normalizer.normalize_many(["1 tsp salt", "1 tsp salt", "2 cups flour"])
+        info = normalizer.cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (1, 2, 2))
+
+    def test_patterns_are_built_from_unit_table(self):
+        normalizer = IngredientNormalizer(unit_aliases={"pinch": ["pinch", "pinches"]})
+        self.assertEqual(normalizer.normalize("2 pinches salt"), "Salt")
+        self.assertEqual(normalizer.normalize("2 cups flour"), "2 cups flour")
+
+
+class RecipeIngredientStoreTests(TestCase):
+    def ingredients(self, recipe):
+        return list(recipe.ingredients.values_list("name", "quantity", "unit"))
+
+    def test_saving_a_recipe_rebuilds_its_ingredients(self):
+        recipe = Item.objects.create(
+            item_name="Bread",
+            item_price=4,
+            item_recipe="<h2>Ingredients</h2><ul><li>2 cups flour</li></ul>",
+        )
+        self.assertEqual(self.ingredients(recipe), [("Flour", 2.0, "cup")])
+        recipe.item_recipe = "<ul><li>1 tsp salt</li><li>Water</li></ul>"
+        recipe.save()
+        self.assertEqual(
+            self.ingredients(recipe), [("Salt", 1.0, "teaspoon"), ("Water", None, "")]
+        )
+
+    def test_command_rebuilds_every_recipe(self):
+        recipes = [
+            Item.objects.create(
+                item_name=f"Recipe {n}",
+                item_price=1,
+                item_recipe=f"<ul><li>{n} cups milk</li></ul>",
+            )
+            for n in range(1, 4)
+        ]
+        RecipeIngredient.objects.all().delete()
+        for workers in (0, 2):  # In this process, then in a pool
+            with self.subTest(workers=workers):
+                out = StringIO()
+                call_command(
+                    "rebuild_ingredients", workers=workers, batch_size=2, stdout=out
+                )
+                self.assertIn("Rebuilt ingredients for 3 recipes.", out.getvalue())
+                self.assertEqual(
+                    [self.ingredients(recipe) for recipe in recipes],
+                    [[("Milk", float(n), "cup")] for n in range(1, 4)],
+                )
+
+    def test_command_changes_cached_shopping_lists(self):
+        recipe = Item.objects.create(
+            item_name="Bread",
+            item_price=4,
+            item_recipe="<ul><li>2 cups flour</li></ul>",
+        )
+        meal_plan = create_meal_plan("Plan", [recipe.id])
+        # Rows out of date, e.g. parsed before a fix to the parser
+        RecipeIngredient.objects.update(quantity=3)
+        _, totals = get_compiled_shopping_list(meal_plan.id)
+        self.assertEqual(totals, [("Flour", 1, "3 cups")])
+        updated_at = Item.objects.get().updated_at
+
+        call_command("rebuild_ingredients", workers=0, stdout=StringIO())
+        _, totals = get_compiled_shopping_list(meal_plan.id)
+        self.assertEqual(totals, [("Flour", 1, "2 cups")])
+        self.assertGreater(Item.objects.get().updated_at, updated_at)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class HomePaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("cook")
+        cls.ids = [
+            Item.objects.create(item_name=f"Recipe {n}", item_price=n).id
+            for n in range(7)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def get_page(self, **params):
+        response = self.client.get(
+            reverse("food_application:index"), {"page_size": 3, **params}
+        )
+        return response.context
+
+    def page_ids(self, context):
+        return [item.id for item in context["item_list"]]
+
+    def test_cursors_walk_forward_and_back(self):
+        first = self.get_page()
+        self.assertEqual(self.page_ids(first), self.ids[:3])
+        self.assertIsNone(first["previous_cursor"])
+
+        second = self.get_page(after=first["next_cursor"])
+        third = self.get_page(after=second["next_cursor"])
+        self.assertEqual(self.page_ids(second), self.ids[3:6])
+        self.assertEqual(self.page_ids(third), self.ids[6:])
+        self.assertIsNone(third["next_cursor"])
+
+        back = self.get_page(before=third["previous_cursor"])
+        self.assertEqual(self.page_ids(back), self.ids[3:6])
+        self.assertEqual(back["next_cursor"], self.ids[5])
+
+    def test_cards_do_not_load_the_recipe_html(self):
+        page = self.get_page()
+        self.assertIn("item_recipe", page["item_list"][0].get_deferred_fields())
+
+
+class SearchIndexTests(TestCase):
+    def search(self, query):
+        return list(SearchResults(query)[0:100])
+
+    def test_index_follows_saves_and_deletes(self):
+        recipe = Item.objects.create(
+            item_name="Pancakes", item_price=3, item_recipe="<p>Whisk the eggs</p>"
+        )
+        self.assertEqual(self.search("whisk"), [recipe.id])
+        recipe.item_name = "Waffles"
+        recipe.save()
+        self.assertEqual(self.search("pancakes"), [])
+        self.assertEqual(self.search("waff"), [recipe.id])
+        recipe.delete()
+        self.assertEqual(self.search("waffles"), [])
+
+    def test_name_matches_rank_first(self):
+        in_recipe = Item.objects.create(
+            item_name="Stew", item_price=1, item_recipe="<p>Add the basil</p>"
+        )
+        in_description = Item.objects.create(
+            item_name="Soup", item_price=1, item_description="With basil"
+        )
+        in_name = Item.objects.create(item_name="Basil Pesto", item_price=1)
+        self.assertEqual(
+            self.search("basil"), [in_name.id, in_description.id, in_recipe.id]
+        )
+
+    def test_pages_of_equal_rank_neither_overlap_nor_skip(self):
+        ids = [
+            Item.objects.create(item_name="Toast", item_price=1).id for _ in range(30)
+        ]
+        results = SearchResults("toast")
+        self.assertEqual(len(results), 30)
+        self.assertEqual(results[0:24] + results[24:48], ids)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class MealPlanQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.recipes = [
+            Item.objects.create(item_name=f"Recipe {n}", item_price=n) for n in range(7)
+        ]
+
+    def create_plans(self, count):
+        recipe_ids = [recipe.id for recipe in self.recipes]
+        return [create_meal_plan(f"Plan {n}", recipe_ids) for n in range(count)]
+
+    def test_saved_meal_plans_query_count_is_constant(self):
+        url = reverse("food_application:saved_meal_plans")
+        for plan_count in (1, 10):
+            self.create_plans(plan_count)
+            with self.assertNumQueries(2):  # COUNT for the paginator + the page
+                response = self.client.get(url)
+            self.assertContains(response, "7</span> day(s) planned")
+
+    def test_shopping_list_stays_within_query_budget(self):
+        for recipe in self.recipes:
+            recipe.item_recipe = "<ul><li>1 cup milk</li><li>2 tsp salt</li></ul>"
+            recipe.save()
+        meal_plan = self.create_plans(1)[0]
+        self.client.force_login(User.objects.create_user("cook"))
+        url = reverse("food_application:shopping_list", args=[meal_plan.id])
+        # Cold (compiles the list and creates the ShoppingList), then cached;
+        # QueryBudgetExceeded is raised if either goes over @query_budget
+        for _ in range(2):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_view_meal_plan_query_count_is_constant(self):
+        for weeks in (1, 4):
+            recipe_ids = [recipe.id for recipe in self.recipes] * weeks
+            meal_plan = create_meal_plan("Plan", recipe_ids)
+            url = reverse("food_application:view_meal_plan", args=[meal_plan.id])
+            # Last-modified timestamps + the plan + its days with recipes
+            with self.assertNumQueries(3):
+                response = self.client.get(url)
+            self.assertContains(response, "Recipe 6", count=weeks * 2)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class ShoppingListCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.recipe = Item.objects.create(
+            item_name="Pancakes",
+            item_price=3,
+            item_recipe="<ul><li>1 cup milk</li><li>2 tsp salt</li></ul>",
+        )
+        cls.meal_plan = create_meal_plan("Plan", [cls.recipe.id] * 2)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_compiled_list_is_cached_until_a_recipe_changes(self):
+        recipes, totals = get_compiled_shopping_list(self.meal_plan.id)
+        self.assertEqual(totals, [("Milk", 2, "2 cups"), ("Salt", 2, "4 teaspoons")])
+        with self.assertNumQueries(1):  # Only the days, for the digest
+            self.assertEqual(
+                get_compiled_shopping_list(self.meal_plan.id), (recipes, totals)
+            )
+
+        self.recipe.item_recipe = "<ul><li>1 cup milk</li></ul>"
+        self.recipe.save()
+        _, totals = get_compiled_shopping_list(self.meal_plan.id)
+        self.assertEqual(totals, [("Milk", 2, "2 cups")])
+
+    def test_repeat_views_do_not_write(self):
+        self.client.force_login(User.objects.create_user("cook"))
+        url = reverse("food_application:shopping_list", args=[self.meal_plan.id])
+        self.client.get(url)  # Creates the ShoppingList
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        writes = [
+            query["sql"]
+            for query in queries
+            if query["sql"].startswith(("INSERT", "UPDATE", "DELETE"))
+        ]
+        self.assertEqual(writes, [])
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class ShoppingListExclusionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        recipe = Item.objects.create(
+            item_name="Pancakes",
+            item_price=3,
+            item_recipe="<ul><li>1 cup milk</li><li>2 tsp salt</li></ul>",
+        )
+        cls.meal_plan = create_meal_plan("Plan", [recipe.id])
+        cls.url = reverse("food_application:shopping_list", args=[cls.meal_plan.id])
+
+    def toggle(self, **names):
+        response = self.client.post(
+            self.url, json.dumps(names), content_type="application/json"
+        )
+        self.assertEqual(response.json(), {"success": True})
+
+    def shown(self):
+        response = self.client.get(self.url)
+        return [row[0] for row in response.context["ingredients_with_counts"]]
+
+    def test_exclusions_are_stored_per_list(self):
+        self.client.force_login(User.objects.create_user("cook"))
+        self.toggle(remove_ingredients=["Salt"])
+        self.toggle(remove_ingredients=["Salt"])  # Already excluded: a no-op
+        self.assertEqual(self.shown(), ["Milk"])
+        self.assertEqual(
+            list(
+                ExcludedIngredient.objects.values_list(
+                    "shopping_list__meal_plan", "normalized_name"
+                )
+            ),
+            [(self.meal_plan.id, "Salt")],
+        )
+
+        # Not kept in the session: another login sees the same list
+        self.client.force_login(User.objects.create_user("other-cook"))
+        self.assertEqual(self.shown(), ["Milk"])
+        self.toggle(restore_ingredients=["Salt"])
+        self.assertEqual(self.shown(), ["Milk", "Salt"])
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.recipe = Item.objects.create(item_name="Pancakes", item_price=3)
+        cls.meal_plan = create_meal_plan("Plan", [cls.recipe.id] * 7)
+
+    def assertNotModifiedUntilChanged(self, url, change):
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(1):  # Only the timestamps
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_recipe_detail(self):
+        url = reverse("food_application:detail", args=[self.recipe.id])
+        self.assertNotModifiedUntilChanged(url, lambda: self.recipe.save())
+
+    def test_meal_plan_changes_with_its_recipes(self):
+        url = reverse("food_application:view_meal_plan", args=[self.meal_plan.id])
+        self.assertNotModifiedUntilChanged(url, lambda: self.recipe.save())
+
+    def test_meal_plan_changes_when_a_recipe_is_deleted(self):
+        soup = Item.objects.create(item_name="Soup", item_price=4)
+        meal_plan = create_meal_plan("Plan", [self.recipe.id, soup.id])
+        for name in ("view_meal_plan", "shopping_list"):
+            with self.subTest(name=name):
+                url = reverse(f"food_application:{name}", args=[meal_plan.id])
+                self.client.get(url)  # Creates the ShoppingList
+                self.assertNotModifiedUntilChanged(url, soup.delete)
+                soup = Item.objects.create(item_name="Soup", item_price=4)
+                MealPlanDay.objects.filter(meal_plan=meal_plan, order=1).update(
+                    recipe=soup
+                )
+
+    def test_logged_in_repeat_visit_costs_two_queries(self):
+        self.client.force_login(User.objects.create_user("cook"))
+        url = reverse("food_application:view_meal_plan", args=[self.meal_plan.id])
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(2):  # The session and the timestamps
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_first_shopping_list_etag_is_current(self):
+        url = reverse("food_application:shopping_list", args=[self.meal_plan.id])
+        etag = self.client.get(url)["ETag"]  # Creates the ShoppingList
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_shopping_list_changes_with_exclusions(self):
+        url = reverse("food_application:shopping_list", args=[self.meal_plan.id])
+        self.client.get(url)  # Creates the ShoppingList
+        self.assertNotModifiedUntilChanged(
+            url,
+            lambda: self.client.post(
+                url,
+                json.dumps({"remove_ingredients": ["salt"]}),
+                content_type="application/json",
+            ),
+        )
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class CombinedShoppingListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        pancakes = Item.objects.create(
+            item_name="Pancakes",
+            item_price=3,
+            item_recipe="<ul><li>2 cups flour</li><li>1 cup milk</li></ul>",
+        )
+        soup = Item.objects.create(
+            item_name="Soup",
+            item_price=5,
+            item_recipe="<ul><li>1 cup milk</li><li>1 tsp salt</li></ul>",
+        )
+        cls.plans = [
+            create_meal_plan(f"Week {n}", [pancakes.id, soup.id, pancakes.id])
+            for n in range(4)
+        ]
+
+    def get(self, plans):
+        url = reverse("food_application:combined_shopping_list")
+        return self.client.get(url, {"plans": plans})
+
+    def test_merged_counts_with_constant_queries(self):
+        for plans in (self.plans[:1], self.plans):
+            # The plans + all their days + the ingredients of both recipes
+            # + the totals (GROUP BY)
+            with self.assertNumQueries(4):
+                response = self.get([plan.id for plan in plans])
+            weeks = len(plans)
+            self.assertEqual(
+                response.context["ingredients_with_counts"],
+                [
+                    ("Flour", 2 * weeks, f"{4 * weeks} cups"),
+                    ("Milk", 3 * weeks, f"{3 * weeks} cups"),
+                    ("Salt", weeks, "1 teaspoon" if weeks == 1 else "4 teaspoons"),
+                ],
+            )
+        self.assertContains(response, "Week 3: Monday")
+
+    def test_stays_within_query_budget_when_logged_in(self):
+        self.client.force_login(User.objects.create_user("cook"))
+        # QueryBudgetExceeded is raised if the view goes over @query_budget
+        self.assertEqual(self.get([plan.id for plan in self.plans]).status_code, 200)
+
+    def test_comma_separated_ids(self):
+        response = self.get(f"{self.plans[0].id},{self.plans[1].id}")
+        self.assertEqual(len(response.context["meal_plans"]), 2)
+
+    def test_invalid_plans(self):
+        self.assertEqual(self.get([]).status_code, 400)
+        self.assertEqual(self.get("one").status_code, 400)
+        self.assertEqual(self.get([self.plans[0].id, 0]).status_code, 404)
+
+
+class AsyncViewParityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("cook")
+        cls.recipes = [
+            Item.objects.create(
+                item_name=f"Chicken Soup {n}",
+                item_price=n,
+                item_recipe="<h2>Ingredients</h2><ul><li>1 chicken</li></ul>",
+            )
+            for n in range(30)
+        ]
+        cls.meal_plan = create_meal_plan(
+            "Plan", [recipe.id for recipe in cls.recipes[:7]]
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def sync_page(self, view, path, **kwargs):
+        request = RequestFactory().get(path)
+        request.user = self.user
+        response = view(request, **kwargs)
+        if hasattr(response, "render"):
+            response.render()
+        return response
+
+    async def async_page(self, view, path, **kwargs):
+        request = AsyncRequestFactory().get(path)
+        request.user = self.user
+
+        async def auser():
+            return self.user
+
+        request.auser = auser
+        return await view(request, **kwargs)
+
+    async def test_async_views_render_the_same_html(self):
+        recipe_id = self.recipes[3].id
+        pages = [
+            (views.IndexClassView.as_view(), async_views.index, "/", {}),
+            (views.IndexClassView.as_view(), async_views.index, "/?after=5", {}),
+            (views.IndexClassView.as_view(), async_views.index, "/?before=20", {}),
+            (views.search, async_views.search, "/search/?q=chick&page=2", {}),
+            (views.search, async_views.search, "/search/", {}),
+            (
+                views.RecipeDetailView.as_view(),
+                async_views.recipe_detail,
+                "/detail/",
+                {"id": recipe_id},
+            ),
+            (
+                views.view_meal_plan,
+                async_views.view_meal_plan,
+                "/plan/",
+                {"plan_id": self.meal_plan.id},
+            ),
+        ]
+        for sync_view, async_view, path, kwargs in pages:
+            with self.subTest(path=path):
+                sync_response = await sync_to_async(self.sync_page)(
+                    sync_view, path, **kwargs
+                )
+                async_response = await self.async_page(async_view, path, **kwargs)
+                self.assertEqual(async_response.status_code, 200)
+                self.assertEqual(async_response.content, sync_response.content)
+
+
+class SaveMealPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.recipes = [
+            Item.objects.create(item_name=f"Recipe {n}", item_price=n) for n in range(3)
+        ]
+
+    def test_plan_is_saved_with_three_queries(self):
+        ids = [self.recipes[0].id, None, 999999, self.recipes[2].id]
+        with self.assertNumQueries(5):  # Plus SAVEPOINT and RELEASE
+            meal_plan = create_meal_plan("Week", ids)
+        self.assertEqual(
+            list(meal_plan.days.values_list("day_of_week", "recipe_id", "order")),
+            [("Monday", self.recipes[0].id, 0), ("Thursday", self.recipes[2].id, 3)],
+        )
+
+    def test_plan_is_saved_completely_or_not_at_all(self):
+        with mock.patch.object(
+            MealPlanDay.objects, "bulk_create", side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                create_meal_plan("Week", [self.recipes[0].id])
+        self.assertFalse(MealPlan.objects.exists())
+
+    def test_view_saves_the_posted_days(self):
+        response = self.client.post(
+            reverse("food_application:save_meal_plan"),
+            {
+                "plan_name": "Week",
+                "recipe_Monday": self.recipes[1].id,
+                "recipe_Tuesday": "None",
+            },
+        )
+        self.assertRedirects(response, reverse("food_application:saved_meal_plans"))
+        meal_plan = MealPlan.objects.get(name="Week")
+        self.assertEqual(
+            list(meal_plan.days.values_list("recipe_id", flat=True)),
+            [self.recipes[1].id],
+        )
+
+
+class RecipeSamplerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.sampler = RecipeSampler()
+
+    def test_samples_are_distinct_and_reproducible(self):
+        for n in range(10):
+            Item.objects.create(item_name=f"Recipe {n}", item_price=n)
+        picked = self.sampler.sample(7, seed=42)
+        self.assertEqual(len({recipe.id for recipe in picked}), 7)
+        self.assertEqual(self.sampler.sample(7, seed=42), picked)
+        with self.assertNumQueries(1):  # The id array is cached
+            self.sampler.sample(7, fields=["item_name"])
+
+    def test_small_catalogs_repeat_or_pad(self):
+        self.assertEqual(self.sampler.sample(3), [None, None, None])
+        recipe = Item.objects.create(item_name="Toast", item_price=1)
+        self.assertEqual(self.sampler.sample(3), [recipe, recipe, recipe])
+
+    def test_follows_created_and_deleted_recipes(self):
+        recipe = Item.objects.create(item_name="Toast", item_price=1)
+        self.assertEqual(self.sampler.count(), 1)
+        Item.objects.create(item_name="Jam", item_price=1)
+        self.assertEqual(self.sampler.count(), 2)
+        # Deleted without signals, like another process would: the
+        # missing row makes the sampler reload the ids
+        Item.objects.filter(pk=recipe.pk)._raw_delete(Item.objects.db)
+        self.assertEqual(
+            [item.item_name for item in self.sampler.sample(2)], ["Jam", "Jam"]
+        )
+
+
+class BudgetPlannerTests(SimpleTestCase):
+    plan = staticmethod(plan_python)
+
+    def catalog(self):
+        ids = list(range(100, 150))
+        prices = [(n * 7) % 50 + 1 for n in range(50)]  # 1..50, shuffled
+        return ids, prices
+
+    def test_plans_respect_the_constraints(self):
+        ids, prices = self.catalog()
+        price_of = dict(zip(ids, prices))
+        # One dollar over the cheapest possible plan of recipes up to $30,
+        # once ids 100-109 are excluded: only a repaired plan can fit
+        cheapest = sorted(p for i, p in zip(ids, prices) if p <= 30 and i >= 110)
+        budget = sum(cheapest[:7]) + 1
+        for seed in range(5):
+            with self.subTest(seed=seed):
+                picked = self.plan(
+                    ids, prices, 7, budget, 30, set(range(100, 110)), seed
+                )
+                self.assertEqual(len(set(picked)), 7)
+                self.assertLessEqual(sum(price_of[pk] for pk in picked), budget)
+                self.assertTrue(all(price_of[pk] <= 30 for pk in picked))
+                self.assertTrue(all(pk >= 110 for pk in picked))
+
+    def test_infeasible_plans(self):
+        ids, prices = self.catalog()
+        with self.assertRaisesMessage(PlanInfeasible, "over the $27 budget"):
+            self.plan(ids, prices, 7, 27, None, set(), 0)  # 1+...+7 = 28
+        with self.assertRaisesMessage(PlanInfeasible, "Only 3 recipe(s)"):
+            self.plan(ids, prices, 7, None, 3, set(), 0)
+
+
+@skipUnless(np is not None, "NumPy is not installed")
+class NumpyBudgetPlannerTests(BudgetPlannerTests):
+    plan = staticmethod(plan_numpy)
+
+    def catalog(self):
+        ids, prices = super().catalog()
+        return np.array(ids), np.array(prices)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class MealPlannerBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.recipes = [
+            Item.objects.create(item_name=f"Recipe {n}", item_price=n)
+            for n in range(1, 21)
+        ]
+
+    def test_plan_within_budget(self):
+        recent = create_meal_plan("Last week", [r.id for r in self.recipes[:7]])
+        url = reverse("food_application:meal_planner")
+        response = self.client.get(url, {"budget": 80, "avoid_recent": 1})
+        recipes = [recipe for day, recipe in response.context["weekly_plan"]]
+        self.assertLessEqual(sum(recipe.item_price for recipe in recipes), 80)
+        self.assertFalse(
+            {recipe.id for recipe in recipes}
+            & {day.recipe_id for day in recent.days.all()}
+        )
+
+        response = self.client.get(url, {"budget": 10})
+        self.assertContains(response, "over the $10 budget")
+
+    def test_negative_parameters_are_ignored(self):
+        url = reverse("food_application:meal_planner")
+        response = self.client.get(url, {"avoid_recent": -1, "seed": -3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["weekly_plan"]), 7)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class RecipeDetailCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        recipe_detail_cache.reset_stats()
+
+    def test_a_lookup_is_one_cache_operation(self):
+        recipe_detail_cache.set(1, "<p>Pancakes</p>")
+        backend = recipe_detail_cache.cache
+        with mock.patch.object(
+            backend, "get", wraps=backend.get
+        ) as get, mock.patch.object(backend, "incr") as incr:
+            self.assertEqual(recipe_detail_cache.get(1), "<p>Pancakes</p>")
+            self.assertIsNone(recipe_detail_cache.get(2))
+        self.assertEqual(get.call_count, 2)
+        incr.assert_not_called()
+        self.assertEqual(
+            recipe_detail_cache.stats(), {"hits": 1, "misses": 1, "hit_rate": 0.5}
+        )
+
+    def test_counters_reach_the_cache_every_flush_every_lookups(self):
+        for _ in range(recipe_detail_cache.flush_every):
+            recipe_detail_cache.get(1)
+        self.assertEqual(
+            recipe_detail_cache.cache.get("recipe-detail:misses"),
+            recipe_detail_cache.flush_every,
+        )
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class RecipeDetailPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.recipe = Item.objects.create(item_name="Pancakes", item_price=3)
+        self.url = reverse("food_application:detail", args=[self.recipe.id])
+
+    def assertServed(self, status, text):
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Recipe-Cache"], status)
+        self.assertContains(response, text)
+
+    def test_body_is_cached_until_the_recipe_changes(self):
+        self.assertServed("MISS", "Pancakes")
+        self.assertServed("HIT", "Pancakes")
+        # Without save() no signal is sent: the cached body is still served
+        Item.objects.filter(pk=self.recipe.pk).update(item_name="Waffles")
+        self.assertServed("HIT", "Pancakes")
+
+        self.recipe.item_name = "Crepes"
+        self.recipe.save()
+        self.assertServed("MISS", "Crepes")
+
+    def test_deleted_recipes_are_dropped(self):
+        self.assertServed("MISS", "Pancakes")
+        recipe_id = self.recipe.id
+        self.recipe.delete()
+        self.assertIsNone(recipe_detail_cache.get(recipe_id))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        caches["fragments"].clear()
+        self.user = User.objects.create_user("first-name")
+        self.client.force_login(self.user)
+        self.recipe = Item.objects.create(item_name="Pancakes", item_price=3)
+
+    def get_index(self):
+        return self.client.get(reverse("food_application:index"))
+
+    def test_recipe_card_is_cached_per_version(self):
+        self.assertContains(self.get_index(), "Pancakes")
+        # Without save() the version doesn't change: the cached card is used
+        Item.objects.filter(pk=self.recipe.pk).update(item_name="Waffles")
+        self.assertContains(self.get_index(), "Pancakes")
+
+        self.recipe.item_name = "Crepes"
+        self.recipe.save()
+        self.assertContains(self.get_index(), "Crepes")
+
+    def test_navbar_follows_username_changes(self):
+        self.assertContains(self.get_index(), "first-name")
+        self.user.username = "second-name"
+        self.user.save()
+        response = self.get_index()
+        self.assertContains(response, "second-name")
+        self.assertNotContains(response, "first-name")
+
+
+class WarmupTests(TestCase):
+    def test_warmup_fills_the_caches_and_times_every_phase(self):
+        cache.clear()
+        recipe = Item.objects.create(item_name="Pancakes", item_price=3)
+        out = StringIO()
+        call_command("warmup", stdout=out)
+        phases = [line.split()[0] for line in out.getvalue().splitlines()[:-1]]
+        self.assertEqual(phases, ["imports", "templates", "urls", "caches"])
+        self.assertIn("Pancakes", recipe_detail_cache.get(recipe.id))
+
+
+class ImportRecipesTests(TestCase):
+    def import_recipes(self, lines, **options):
+        path = os.path.join(self.tmpdir, "recipes.jsonl")
+        with open(path, "w") as recipes_file:
+            recipes_file.write("\n".join(lines))
+        call_command(
+            "import_recipes",
+            path,
+            workers=0,
+            batch_size=2,
+            checkpoint=os.path.join(self.tmpdir, "checkpoint.json"),
+            stdout=StringIO(),
+            stderr=self.errors,
+            **options,
+        )
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.tmpdir = tmpdir.name
+        self.errors = StringIO()
+
+    def test_imports_valid_records_and_reports_invalid_ones(self):
+        recipe = "<h2>Ingredients</h2><ul><li>2 cups flour</li></ul>"
+        self.import_recipes(
+            [
+                json.dumps(
+                    {"item_name": "Bread", "item_price": 4, "item_recipe": recipe}
+                ),
+                json.dumps({"item_name": "", "item_price": 1}),
+                "{not json",
+            ]
+        )
+        bread = Item.objects.get()
+        self.assertEqual(bread.item_description, "No description available")
+        self.assertEqual(
+            list(RecipeIngredient.objects.values_list("item_id", "name")),
+            [(bread.id, "Flour")],
+        )
+        errors = self.errors.getvalue()
+        self.assertIn("Record 2: item_name: This field is required.", errors)
+        self.assertIn("Record 3: Invalid JSON", errors)
+
+    def test_resumes_after_the_checkpoint(self):
+        lines = [
+            json.dumps({"item_name": f"Recipe {n}", "item_price": n}) for n in range(5)
+        ]
+        self.import_recipes(lines[:3])
+        self.import_recipes(lines)
+        self.assertEqual(
+            list(Item.objects.order_by("id").values_list("item_name", flat=True)),
+            [f"Recipe {n}" for n in range(5)],
+        )
+
+    def test_other_processes_see_the_imported_recipes(self):
+        # Instances of their own stand in for another worker's, which share
+        # only the cache with this process
+        sampler, planner = RecipeSampler(), BudgetPlanner()
+        self.assertEqual(sampler.count(), 0)
+        self.assertEqual(len(planner.catalog()[0]), 0)
+        self.import_recipes([json.dumps({"item_name": "Bread", "item_price": 4})])
+        self.assertEqual(sampler.count(), 1)
+        self.assertEqual(len(planner.catalog()[0]), 1)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.recipes = [
+            Item.objects.create(item_name=f"Recipe {n}", item_price=n) for n in range(3)
+        ]
+        cls.meal_plan = create_meal_plan("Plan", [cls.recipes[0].id, None])
+        cls.user = User.objects.create_user("cook")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def export(self, name, **params):
+        response = self.client.get(reverse(f"food_application:{name}"), params)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_incremental_recipe_export(self):
+        rows = [json.loads(line) for line in self.export("export_recipes").splitlines()]
+        self.assertEqual(
+            [row["item_name"] for row in rows], ["Recipe 0", "Recipe 1", "Recipe 2"]
+        )
+
+        self.recipes[0].save()
+        cursor = f"{rows[-1]['updated_at']},{rows[-1]['id']}"
+        rows = [
+            json.loads(line)
+            for line in self.export("export_recipes", cursor=cursor).splitlines()
+        ]
+        self.assertEqual([row["item_name"] for row in rows], ["Recipe 0"])
+
+    def test_meal_plan_csv_has_one_row_per_day(self):
+        lines = self.export("export_meal_plans", format="csv").splitlines()
+        self.assertEqual(
+            lines[0],
+            "id,name,notes,created_at,updated_at,day_order,day_day_of_week,day_recipe_id",
+        )
+        self.assertEqual(len(lines), 2)  # Header + the one day with a recipe
+        self.assertTrue(lines[1].endswith(f",0,Monday,{self.recipes[0].id}"))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(
+            reverse("food_application:export_recipes"), {"cursor": "yesterday"}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_exports_require_login(self):
+        self.client.logout()
+        for name in ("export_recipes", "export_meal_plans"):
+            with self.subTest(name=name):
+                url = reverse(f"food_application:{name}")
+                response = self.client.get(url)
+                self.assertRedirects(response, f"{reverse('users:login')}?next={url}")
+
+
+class BenchCompareTests(SimpleTestCase):
+    config = {"recipes": 100, "meal_plans": 5, "users": 2, "requests": 10, "seed": 1}
+
+    def report(self, queries=3, p95_ms=10.0, peak_memory_kib=500.0, **config):
+        route = {
+            "queries": queries,
+            "p95_ms": p95_ms,
+            "peak_memory_kib": peak_memory_kib,
+        }
+        return {"config": {**self.config, **config}, "routes": {"index": route}}
+
+    def compare(self, report, baseline=None):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        path = os.path.join(tmpdir.name, "baseline.json")
+        if baseline is not None:
+            with open(path, "w") as baseline_file:
+                json.dump(baseline, baseline_file)
+        command = BenchCommand(stdout=StringIO(), stderr=StringIO())
+        command.compare(report, path, tolerance=0.2)
+        return command
+
+    def test_differences_within_tolerance_and_noise_pass(self):
+        # 20% slower plus up to 1 ms and 64 KiB of noise
+        command = self.compare(
+            self.report(p95_ms=12.9, peak_memory_kib=663), self.report()
+        )
+        self.assertIn("No regressions", command.stdout.getvalue())
+
+    def test_regressions_are_listed(self):
+        with self.assertRaises(CommandError) as raised:
+            self.compare(
+                self.report(queries=4, p95_ms=13.1, peak_memory_kib=665),
+                self.report(),
+            )
+        message = str(raised.exception)
+        self.assertIn("index: 4 queries (was 3)", message)
+        self.assertIn("index: p95 13.10 ms (was 10.00 ms)", message)
+        self.assertIn("index: peak memory 665 KiB (was 500 KiB)", message)
+
+    def test_new_routes_and_other_options(self):
+        report = self.report(recipes=200)
+        report["routes"]["search"] = {"queries": 5, "p95_ms": 1, "peak_memory_kib": 1}
+        command = self.compare(report, self.report())
+        self.assertIn("different options", command.stderr.getvalue())
+        with self.assertRaisesMessage(CommandError, "does not exist"):
+            self.compare(self.report())
+
+
+class QueryInstrumentationTests(TestCase):
+    def run_view(self, view, query_count):
+        def get_response(request):
+            for _ in range(query_count):
+                list(Item.objects.filter(pk__in=[1, 2]))
+            return HttpResponse()
+
+        request = RequestFactory().get("/")
+        request.resolver_match = ResolverMatch(view, (), {}, url_name="view")
+        return QueryInstrumentationMiddleware(get_response)(request)
+
+    def test_server_timing_header(self):
+        response = self.run_view(lambda request: None, 2)
+        self.assertRegex(
+            response["Server-Timing"],
+            r'^db;dur=[\d.]+;desc="2 queries", tpl;dur=[\d.]+, total;dur=[\d.]+$',
+        )
+
+    def test_template_time_is_recorded_by_the_backend(self):
+        QueryInstrumentationMiddleware(lambda request: HttpResponse())
+        # Django's own template class is left alone
+        self.assertEqual(
+            BackendTemplate.render.__module__, "django.template.backends.django"
+        )
+        template = engines["django"].from_string("{{ value }}")
+        self.assertIsInstance(template, TimedTemplate)
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        try:
+            self.assertEqual(template.render({"value": "rendered"}), "rendered")
+        finally:
+            current_stats.reset(token)
+        self.assertGreater(stats.template_time, 0)
+
+    @override_settings(QUERY_REPEAT_THRESHOLD=3)
+    def test_repeated_queries_are_reported(self):
+        with self.assertLogs("food_application.requests", "WARNING") as logs:
+            self.run_view(lambda request: None, 3)
+        self.assertIn("Possible N+1 in view: query ran 3 times", logs.output[0])
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_strict_query_budget(self):
+        view = query_budget(2)(lambda request: None)
+        self.run_view(view, 2)
+        with self.assertRaisesMessage(QueryBudgetExceeded, "ran 3 queries"):
+            self.run_view(view, 3)
+
+
+class ProfilingTests(SimpleTestCase):
+    def profile(self, is_staff, query_string="_profile=cpu,memory"):
+        request = RequestFactory().get(f"/?{query_string}")
+        request.user = User(is_staff=is_staff)
+        return ProfilingMiddleware(lambda request: HttpResponse())(request)
+
+    def test_staff_request_is_profiled(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(PROFILING_DIR=directory):
+                response = self.profile(is_staff=True)
+            files = response["X-Profile"].split(", ")
+            self.assertEqual([os.path.dirname(path) for path in files], [directory] * 2)
+            self.assertTrue(files[0].endswith(".prof"))
+            with open(files[1]) as report:
+                self.assertIn("Peak traced memory", report.read())
+
+    @override_settings(PROFILING_SAMPLE_RATE=0)
+    def test_other_users_cannot_profile(self):
+        self.assertNotIn("X-Profile", self.profile(is_staff=False))
+
+    def test_sampled_profiles_are_only_logged(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(PROFILING_DIR=directory, PROFILING_SAMPLE_RATE=1):
+                with self.assertLogs("food_application.profiling", "INFO") as logs:
+                    response = self.profile(is_staff=False)
+        self.assertNotIn("X-Profile", response)
+        self.assertIn(directory, logs.output[0])
+
+
+@mock.patch.dict(
+    settings.DATABASES,
+    {"replica": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}},
+)
+class ReplicaRoutingTests(TransactionTestCase):
+    # Not TestCase: inside its transaction every read goes to the primary
+    def request(self, method="get", run=None, **cookies):
+        aliases = []
+
+        def get_response(request):
+            aliases.append(read_alias())
+            if run:
+                run()
+                aliases.append(read_alias())
+            return HttpResponse()
+
+        factory = RequestFactory()
+        for name, value in cookies.items():
+            factory.cookies[name] = value
+        request = getattr(factory, method)("/")
+        return ReplicaRoutingMiddleware(get_response)(request), aliases
+
+    def create_recipe(self):
+        Item.objects.get_or_create(item_name="Toast", defaults={"item_price": 1})
+
+    def test_reads_of_get_requests_go_to_the_replica(self):
+        response, aliases = self.request()
+        self.assertEqual(aliases, ["replica"])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(read_alias(), "default")  # Outside of a request
+
+    def test_writes_pin_reads_to_the_primary(self):
+        response, aliases = self.request("post", run=self.create_recipe)
+        self.assertEqual(aliases, ["default", "default"])
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        Item.objects.all().delete()
+        response, aliases = self.request(run=self.create_recipe)
+        self.assertEqual(aliases, ["replica", "default"])
+
+        response, aliases = self.request(**{PIN_COOKIE: "1"})
+        self.assertEqual(aliases, ["default"])
+
+    def test_reads_through_db_for_write_do_not_pin(self):
+        self.create_recipe()
+        # get_or_create() finds the row: its SELECT goes through db_for_write
+        response, aliases = self.request(run=self.create_recipe)
+        self.assertEqual(aliases, ["replica", "replica"])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_sessions_and_users_are_read_from_the_primary(self):
+        def read_aliases():
+            router = PrimaryReplicaRouter()
+            aliases.extend(router.db_for_read(model) for model in (Session, User, Item))
+
+        aliases = []
+        self.request(run=read_aliases)
+        self.assertEqual(aliases, ["default", "default", "replica"])
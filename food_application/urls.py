@@ -1,12 +1,27 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+if settings.ASYNC_VIEWS:
+    # Native async versions of the busiest pages (see async_views.py)
+    from . import async_views
+
+    index_view = async_views.index
+    search_view = async_views.search
+    detail_view = async_views.recipe_detail
+    view_meal_plan_view = async_views.view_meal_plan
+else:
+    index_view = views.IndexClassView.as_view()
+    search_view = views.search
+    detail_view = views.RecipeDetailView.as_view()
+    view_meal_plan_view = views.view_meal_plan
+
 
 app_name = "food_application"
 
 urlpatterns = [
-    path("", views.IndexClassView.as_view(), name="index"),  # Home page URL
-    path("search/", views.search, name="search"),  # New search URL
+    path("", index_view, name="index"),  # Home page URL
+    path("search/", search_view, name="search"),  # New search URL
     path(
         "meal-planner/", views.meal_planner, name="meal_planner"
     ),  # Weekly meal planner
@@ -17,22 +32,31 @@ urlpatterns = [
         "meal-planner/saved/", views.saved_meal_plans, name="saved_meal_plans"
     ),  # List saved meal plans
     path(
-        "meal-planner/view/<int:plan_id>/", views.view_meal_plan, name="view_meal_plan"
+        "meal-planner/view/<int:plan_id>/", view_meal_plan_view, name="view_meal_plan"
     ),  # View a specific meal plan
     path(
         "meal-planner/delete/<int:plan_id>/",
         views.delete_meal_plan,
         name="delete_meal_plan",
     ),  # Delete meal plan
+    path(
+        "meal-planner/shopping-list/combined/",
+        views.combined_shopping_list,
+        name="combined_shopping_list",
+    ),  # One shopping list for several meal plans
     path(
         "meal-planner/shopping-list/<int:plan_id>/",
         views.shopping_list,
         name="shopping_list",
     ),  # Shopping list for a meal plan
-    path("item/", views.Item, name="item"),
     path(
-        "<int:id>/", views.RecipeDetailView.as_view(), name="detail"
-    ),  # Detail view for a recipe
+        "export/recipes/", views.export_recipes, name="export_recipes"
+    ),  # Recipe catalog as JSONL/CSV
+    path(
+        "export/meal-plans/", views.export_meal_plans, name="export_meal_plans"
+    ),  # Saved meal plans as JSONL/CSV
+    path("item/", views.Item, name="item"),
+    path("<int:id>/", detail_view, name="detail"),  # Detail view for a recipe
     path(
         "add/", views.RecipeCreateView.as_view(), name="create_item"
     ),  # Create new recipe
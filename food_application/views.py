@@ -1,13 +1,47 @@
 from django.shortcuts import render, redirect
-from django.http import JsonResponse
-from django.db.models import Q  # Import Q for complex queries
-from .models import Item, MealPlan, MealPlanDay, ShoppingList
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.utils.safestring import mark_safe
+from django.http import (
+    Http404,
+    HttpResponseBadRequest,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Count, Prefetch, Q  # Import Q for complex queries
+from .models import ExcludedIngredient, Item, MealPlan, MealPlanDay, ShoppingList
 from .forms import ItemForm
+from . import exports
+from . import search as search_index
+from .conditional import (
+    conditional_page,
+    meal_plan_last_modified,
+    page_changed,
+    recipe_last_modified,
+    shopping_list_last_modified,
+)
+from .middleware import query_budget
+from .page_cache import recipe_detail_cache
+from .planner import PlanInfeasible, budget_planner
+from .sampling import recipe_sampler
+from .services import DAYS_OF_WEEK, create_meal_plan
+from .shopping import (
+    compile_combined_shopping_list,
+    content_hash,
+    format_shopping_list,
+    get_compiled_shopping_list,
+)
+from .ingredients import (  # noqa: F401 - re-exported for existing imports
+    extract_ingredients_from_html,
+    strip_measurements_from_ingredient,
+)
 from django.contrib import messages
-import re
-from bs4 import BeautifulSoup
 import json
 
+from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import (
     ListView,
@@ -21,19 +55,131 @@ from django.urls import reverse_lazy
 
 # Create your views here.
 
+# Columns shown on a recipe card (home page and search results), plus the
+# version its cached fragment is keyed on
+ITEM_CARD_FIELDS = [
+    "id",
+    "item_name",
+    "item_description",
+    "item_price",
+    "item_image",
+    "version",
+]
+
+# Recipe columns shown for each day of a saved meal plan
+MEAL_PLAN_RECIPE_FIELDS = [f"recipe__{field}" for field in ITEM_CARD_FIELDS]
+
+SEARCH_PAGE_SIZE = 24
+MEAL_PLAN_PAGE_SIZE = 24
+# Most meal plans one combined shopping list may cover (a year of weeks)
+MAX_COMBINED_PLANS = 52
+
 
 class IndexClassView(LoginRequiredMixin, ListView):
+    """
+    Home page grid of recipe cards, one page at a time.
+
+    Uses keyset (cursor) pagination ordered by id: ?after=<id> shows the page
+    after that recipe and ?before=<id> the page before it. Filtering on the
+    primary key costs the same on the first page and the thousandth, unlike
+    OFFSET. ?page_size=<n> changes the number of cards (up to max_page_size).
+    """
+
     model = Item
     template_name = "food_application/home/index.html"
     context_object_name = "item_list"
     login_url = "/users/login/"
+    query_budget = 4
+    page_size = 24
+    max_page_size = 100
 
+    def get_page_size(self):
+        try:
+            page_size = int(self.request.GET.get("page_size", self.page_size))
+        except ValueError:
+            page_size = self.page_size
+        return max(1, min(page_size, self.max_page_size))
 
+    def get_cursor(self, name):
+        try:
+            return int(self.request.GET[name])
+        except (KeyError, ValueError):
+            return None
+
+    def get_page_query(self):
+        """The rows of the current page, plus one to tell whether there are more."""
+        page_size = self.get_page_size()
+        # Only load the columns the cards show (never the recipe HTML)
+        queryset = Item.objects.only(*ITEM_CARD_FIELDS)
+        before = self.get_cursor("before")
+        if before is not None:
+            return queryset.filter(id__lt=before).order_by("-id")[: page_size + 1]
+        after = self.get_cursor("after")
+        if after is not None:
+            queryset = queryset.filter(id__gt=after)
+        return queryset.order_by("id")[: page_size + 1]
+
+    def paginate_rows(self, rows):
+        """Turn the rows of get_page_query() into the page, in id order."""
+        page_size = self.get_page_size()
+        if self.get_cursor("before") is not None:
+            self.has_previous = len(rows) > page_size
+            self.has_next = True
+            return rows[:page_size][::-1]
+        self.has_previous = self.get_cursor("after") is not None
+        self.has_next = len(rows) > page_size
+        return rows[:page_size]
+
+    def get_queryset(self):
+        return self.paginate_rows(list(self.get_page_query()))
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        page = context["item_list"]
+        if "total_recipes" not in context:
+            context["total_recipes"] = recipe_sampler.count()
+        context["page_size"] = self.get_page_size()
+        context["previous_cursor"] = page[0].id if page and self.has_previous else None
+        context["next_cursor"] = page[-1].id if page and self.has_next else None
+        return context
+
+
+@method_decorator(conditional_page(recipe_last_modified), name="get")
 class RecipeDetailView(DetailView):
+    """
+    Recipe detail page.
+
+    The recipe part of the page (recipes/detail_body.html) is the same for
+    every visitor, so it is rendered once and cached per Item (see
+    page_cache.py). On a cache hit neither the Item query nor the recipe
+    template runs; only the surrounding page (navbar, messages) is rendered.
+    """
+
     model = Item
     template_name = "food_application/recipes/detail.html"
+    body_template_name = "food_application/recipes/detail_body.html"
     context_object_name = "item"
     pk_url_kwarg = "id"
+    query_budget = 4
+
+    def get(self, request, *args, **kwargs):
+        item_id = self.kwargs[self.pk_url_kwarg]
+        detail_body = recipe_detail_cache.get(item_id)
+        cache_status = "HIT"
+
+        if detail_body is None:
+            cache_status = "MISS"
+            self.object = self.get_object()  # 404 if the recipe doesn't exist
+            detail_body = render_to_string(
+                self.body_template_name, {self.context_object_name: self.object}
+            )
+            recipe_detail_cache.set(item_id, detail_body)
+
+        response = render(
+            request, self.template_name, {"detail_body": mark_safe(detail_body)}
+        )
+        response["X-Recipe-Cache"] = cache_status
+        return response
 
 
 class RecipeCreateView(CreateView):
@@ -59,72 +205,112 @@ class RecipeDeleteView(DeleteView):
 
 
 # Custom Functions Below
+@query_budget(5)
 def search(request):
     """
     Search view that handles recipe searches.
 
     How it works:
     1. Gets the 'q' parameter from the URL (e.g., ?q=pizza)
-    2. Uses Django's Q objects to search multiple fields at once
-    3. The 'icontains' lookup performs case-insensitive partial matching
-    4. Returns matching results to the search_results template
+    2. Looks the words up in the full-text index (see search.py), which covers
+       the name, the description and the recipe text without its HTML
+    3. Results come back best match first (bm25) and are paginated
+    4. Only the columns the result cards show are loaded - never item_recipe
     """
     query = request.GET.get(
         "q", ""
     )  # Get search term from URL, default to empty string
 
-    if query:
-        # Q objects allow complex database queries with OR conditions
-        # icontains = case-insensitive contains
-        # __icontains looks for the query anywhere in the field
-        results = Item.objects.filter(
-            Q(item_name__icontains=query)  # Search in recipe name
-            | Q(item_description__icontains=query)  # Search in description
-            | Q(item_recipe__icontains=query)  # Search in full recipe
-        ).distinct()  # Remove duplicates if a recipe matches multiple fields
+    if query and search_index.search_enabled():
+        paginator = Paginator(search_index.SearchResults(query), SEARCH_PAGE_SIZE)
+        page_obj = paginator.get_page(request.GET.get("page"))
+        # The index returns ids in rank order; fetch those rows and keep the order
+        items_by_id = Item.objects.only(*ITEM_CARD_FIELDS).in_bulk(page_obj.object_list)
+        results = [items_by_id[pk] for pk in page_obj.object_list if pk in items_by_id]
     else:
-        results = Item.objects.none()  # Empty queryset if no search term
+        if query:
+            # Q objects allow complex database queries with OR conditions
+            # icontains = case-insensitive contains
+            results = Item.objects.filter(
+                Q(item_name__icontains=query)  # Search in recipe name
+                | Q(item_description__icontains=query)  # Search in description
+                | Q(item_recipe__icontains=query)  # Search in full recipe
+            ).distinct()  # Remove duplicates if a recipe matches multiple fields
+        else:
+            results = Item.objects.none()  # Empty queryset if no search term
+        paginator = Paginator(
+            results.only(*ITEM_CARD_FIELDS).order_by("id"), SEARCH_PAGE_SIZE
+        )
+        page_obj = paginator.get_page(request.GET.get("page"))
+        results = page_obj.object_list
 
-    context = {"results": results, "query": query, "result_count": results.count()}
+    context = {
+        "results": results,
+        "query": query,
+        "result_count": paginator.count,
+        "page_obj": page_obj,
+    }
     return render(request, "food_application/home/search_results.html", context)
 
 
+# Query parameters of the meal planner handled by the budget planner
+PLAN_CONSTRAINTS = ["budget", "max_price", "avoid_recent"]
+
+
+def int_param(request, name):
+    """The GET parameter as a non-negative int, or None if missing or invalid."""
+    try:
+        value = int(request.GET[name])
+    except (KeyError, ValueError):
+        return None
+    return value if value >= 0 else None
+
+
+@query_budget(5)
 def meal_planner(request):
     """
     Generate a weekly meal plan by randomly selecting 7 recipes from the database.
     Each recipe is assigned to a day of the week (Monday through Sunday).
+
+    The recipes are drawn from a cached array of recipe ids (see sampling.py),
+    so only the 7 chosen rows are loaded. Pass ?seed=<number> to get the same
+    plan again.
+
+    With ?budget=<total>, ?max_price=<per day> and/or ?avoid_recent=<plans>,
+    the budget planner (see planner.py) draws a plan within those limits
+    instead; if none exists, the error is shown above a random plan.
     """
-    import random
-
-    # Get all recipes from the database
-    all_items = list(Item.objects.all())
-
-    # Check if we have enough recipes
-    if len(all_items) < 7:
-        # If less than 7 recipes, we can repeat some or show a message
-        meal_plan = random.sample(all_items, min(len(all_items), 7))
-        # If we have fewer than 7, pad with None or repeat
-        while len(meal_plan) < 7:
-            meal_plan.append(random.choice(all_items) if all_items else None)
-    else:
-        # Randomly select 7 recipes
-        meal_plan = random.sample(all_items, 7)
-
-    # Create a list of days
-    days_of_week = [
-        "Monday",
-        "Tuesday",
-        "Wednesday",
-        "Thursday",
-        "Friday",
-        "Saturday",
-        "Sunday",
-    ]
+    seed = int_param(request, "seed")
+    constraints = {}
+    for name in PLAN_CONSTRAINTS:
+        value = int_param(request, name)
+        if value is not None:
+            constraints[name] = value
+
+    meal_plan = None
+    if constraints:
+        try:
+            meal_plan = budget_planner.plan(
+                7, seed=seed, fields=ITEM_CARD_FIELDS, **constraints
+            )
+            total_recipes = len(budget_planner.catalog()[0])
+        except PlanInfeasible as error:
+            messages.error(request, str(error))
+    if meal_plan is None:
+        # Randomly select 7 recipes (repeating some if there are fewer than 7)
+        meal_plan = recipe_sampler.sample(7, seed=seed, fields=ITEM_CARD_FIELDS)
+        total_recipes = recipe_sampler.count()
 
     # Pair each day with a recipe
-    weekly_plan = list(zip(days_of_week, meal_plan))
+    weekly_plan = list(zip(DAYS_OF_WEEK, meal_plan))
 
-    context = {"weekly_plan": weekly_plan, "total_recipes": len(all_items)}
+    context = {
+        "weekly_plan": weekly_plan,
+        "total_recipes": total_recipes,
+        "plan_total": sum(recipe.item_price for recipe in meal_plan if recipe),
+        "constraints": constraints,
+        "seed": seed,
+    }
 
     return render(request, "food_application/meal_planning/meal_planner.html", context)
 
@@ -135,41 +321,23 @@ def save_meal_plan(request):
 
     Process:
     1. Receive POST data containing recipe IDs for each day
-    2. Create a new MealPlan object
-    3. Create MealPlanDay objects for each day/recipe pair
-    4. Redirect to the saved meal plans list
+    2. Create the MealPlan and its MealPlanDay rows in one transaction
+       (see services.create_meal_plan)
+    3. Redirect to the saved meal plans list
     """
     if request.method == "POST":
         # Get the meal plan name from the form (or use default)
         plan_name = request.POST.get("plan_name", "My Meal Plan")
 
-        # Create a new MealPlan
-        meal_plan = MealPlan.objects.create(name=plan_name)
-
-        # Days of the week
-        days = [
-            "Monday",
-            "Tuesday",
-            "Wednesday",
-            "Thursday",
-            "Friday",
-            "Saturday",
-            "Sunday",
-        ]
-
-        # Loop through each day and save the recipe
-        for index, day in enumerate(days):
-            recipe_id = request.POST.get(f"recipe_{day}")  # Get recipe ID for this day
-
-            if recipe_id and recipe_id != "None":  # If there's a recipe for this day
-                try:
-                    recipe = Item.objects.get(id=recipe_id)
-                    # Create a MealPlanDay entry
-                    MealPlanDay.objects.create(
-                        meal_plan=meal_plan, day_of_week=day, recipe=recipe, order=index
-                    )
-                except Item.DoesNotExist:
-                    pass  # Skip if recipe doesn't exist
+        # Get the recipe ID for each day (None if the day has no recipe)
+        recipe_ids = []
+        for day in DAYS_OF_WEEK:
+            try:
+                recipe_ids.append(int(request.POST.get(f"recipe_{day}")))
+            except (TypeError, ValueError):
+                recipe_ids.append(None)  # Missing, "None" or not a number
+
+        create_meal_plan(plan_name, recipe_ids)
 
         # Show success message
         messages.success(request, f"Meal plan '{plan_name}' saved successfully!")
@@ -178,22 +346,43 @@ def save_meal_plan(request):
     return redirect("food_application:meal_planner")
 
 
+@query_budget(4)
 def saved_meal_plans(request):
     """
-    Display a list of all saved meal plans.
+    Display a paginated list of all saved meal plans.
+
+    The number of days in each plan is counted by the database (annotate),
+    so the page runs the same two queries (count + page) however many plans
+    there are.
     """
-    meal_plans = MealPlan.objects.all()
-    context = {"meal_plans": meal_plans}
+    meal_plans = MealPlan.objects.annotate(day_count=Count("days")).order_by(
+        "-created_at", "-id"
+    )
+    paginator = Paginator(meal_plans, MEAL_PLAN_PAGE_SIZE)
+    page_obj = paginator.get_page(request.GET.get("page"))
+    context = {"meal_plans": page_obj.object_list, "page_obj": page_obj}
     return render(
         request, "food_application/meal_planning/saved_meal_plans.html", context
     )
 
 
+@query_budget(5)
+@conditional_page(meal_plan_last_modified)
 def view_meal_plan(request, plan_id):
     """
     View a specific saved meal plan.
+
+    The days and their recipes (only the columns the page shows) are loaded
+    with one extra query, instead of one query per day.
     """
-    meal_plan = MealPlan.objects.get(id=plan_id)
+    meal_plan = MealPlan.objects.prefetch_related(
+        Prefetch(
+            "days",
+            queryset=MealPlanDay.objects.select_related("recipe").only(
+                "meal_plan", "day_of_week", "order", *MEAL_PLAN_RECIPE_FIELDS
+            ),
+        )
+    ).get(id=plan_id)
     # Get all days for this meal plan (automatically ordered by the 'order' field)
     days = meal_plan.days.all()
 
@@ -220,202 +409,198 @@ def delete_meal_plan(request, plan_id):
     )
 
 
-def extract_ingredients_from_html(html_content):
-    """
-    Extract ingredients from HTML recipe content.
-
-    This function parses the HTML from the item_recipe field and attempts to
-    extract ingredient lists. It looks for common patterns like:
-    - Lists (<ul>, <ol>)
-    - Headers with "Ingredients" text
-    - Paragraphs that might contain ingredients
-
-    Args:
-        html_content: HTML string from the item_recipe field
-
-    Returns:
-        A list of ingredient strings
-    """
-    if not html_content:
-        return []
-
-    # Parse HTML
-    soup = BeautifulSoup(html_content, "html.parser")
-    ingredients = []
-
-    # Method 1: Look for headings containing "ingredient" and get the next list
-    ingredient_headers = soup.find_all(
-        ["h1", "h2", "h3", "h4", "h5", "h6", "p", "strong"],
-        string=re.compile(r"ingredient", re.IGNORECASE),
-    )
-
-    for header in ingredient_headers:
-        # Find the next <ul> or <ol> after this header
-        next_list = header.find_next(["ul", "ol"])
-        if next_list:
-            for li in next_list.find_all("li"):
-                ingredient_text = li.get_text(strip=True)
-                if ingredient_text and ingredient_text not in ingredients:
-                    ingredients.append(ingredient_text)
-
-    # Method 2: If no ingredients found yet, look for any lists in the content
-    if not ingredients:
-        all_lists = soup.find_all(["ul", "ol"])
-        for list_element in all_lists:
-            for li in list_element.find_all("li"):
-                ingredient_text = li.get_text(strip=True)
-                if ingredient_text and ingredient_text not in ingredients:
-                    ingredients.append(ingredient_text)
-
-    return ingredients
-
-
-def strip_measurements_from_ingredient(ingredient_text):
-    """
-    Remove measurement amounts from ingredient text, keeping only the ingredient name.
-
-    This function removes:
-    - Numbers (whole, fractions, decimals)
-    - Common measurement units (cups, tbsp, tsp, oz, lb, etc.)
-    - Parenthetical notes
-
-    Args:
-        ingredient_text: Full ingredient text with measurements
-
-    Returns:
-        Cleaned ingredient name without measurements
-    """
-    # Pattern to match common measurements at the beginning of the string
-    # Matches: numbers, fractions, decimals, and common units
-    measurement_pattern = r"^[\d\s/.,½¼¾⅓⅔⅛⅜⅝⅞]*\s*(?:cup|cups|c\.|tablespoon|tablespoons|tbsp|tsp|teaspoon|teaspoons|ounce|ounces|oz|pound|pounds|lb|lbs|gram|grams|g|kilogram|kilograms|kg|milliliter|milliliters|ml|liter|liters|l|pint|pints|pt|quart|quarts|qt|gallon|gallons|gal|piece|pieces|clove|cloves|can|cans|package|packages|pkg|slice|slices|medium|large|small|whole)\s+"
-
-    # Remove measurements from the beginning
-    cleaned = re.sub(measurement_pattern, "", ingredient_text, flags=re.IGNORECASE)
-
-    # Remove parenthetical notes like "(optional)" or "(or substitute X)"
-    cleaned = re.sub(r"\s*\([^)]*\)", "", cleaned)
-
-    # Remove any leading/trailing whitespace and commas
-    cleaned = cleaned.strip().strip(",").strip()
-
-    # Capitalize first letter
-    if cleaned:
-        cleaned = cleaned[0].upper() + cleaned[1:]
-
-    return cleaned
-
-
+# A cold view of a plan: timestamps, session, user, plan, days, ingredient
+# lines, totals, exclusions, get_or_create (SELECT, SAVEPOINT, INSERT,
+# RELEASE), then the timestamps again for fresh validators (page_changed())
+@query_budget(13)
+@conditional_page(shopping_list_last_modified)
 def shopping_list(request, plan_id):
     """
     Generate and display a shopping list from a meal plan.
 
     This view:
     1. Gets the meal plan and all its recipes
-    2. Extracts ingredients from each recipe's item_recipe field
-    3. Compiles them into a unified shopping list with recipe counts
+    2. Loads each recipe's pre-parsed ingredients (RecipeIngredient) in one query
+    3. Totals them into a unified shopping list with recipe counts and
+       quantities, in the database (cached until the plan or one of its
+       recipes changes)
     4. Handles POST requests to remove ingredients user already has at home
-    5. Saves or updates the ShoppingList model
+       (stored as ExcludedIngredient rows, so they work on every device)
+    5. Saves the ShoppingList model, only if its content changed
     6. Displays the ingredients to the user
     """
     meal_plan = MealPlan.objects.get(id=plan_id)
 
-    # Handle POST request to remove ingredients
+    # Handle POST request to remove (or restore) ingredients
     if request.method == "POST":
         try:
             data = json.loads(request.body)
-            ingredients_to_remove = data.get("remove_ingredients", [])
+            ingredients_to_remove = set(data.get("remove_ingredients", []))
+            ingredients_to_restore = set(data.get("restore_ingredients", []))
 
             # Get or create the shopping list
             shopping_list_obj, created = ShoppingList.objects.get_or_create(
                 meal_plan=meal_plan
             )
 
-            # Get existing excluded ingredients (stored in a new field or use a session)
-            # For now, we'll store them in the session
-            if "excluded_ingredients" not in request.session:
-                request.session["excluded_ingredients"] = {}
-
-            # Add the plan-specific excluded ingredients
-            plan_key = f"plan_{plan_id}"
-            if plan_key not in request.session["excluded_ingredients"]:
-                request.session["excluded_ingredients"][plan_key] = []
-
-            # Add new ingredients to exclude
-            for ingredient in ingredients_to_remove:
-                if ingredient not in request.session["excluded_ingredients"][plan_key]:
-                    request.session["excluded_ingredients"][plan_key].append(ingredient)
-
-            request.session.modified = True
+            # Apply the toggles as one batch insert and one batch delete.
+            # The unique index on (shopping_list, normalized_name) turns
+            # ingredients that are already excluded into no-ops.
+            with transaction.atomic():
+                ExcludedIngredient.objects.bulk_create(
+                    [
+                        ExcludedIngredient(
+                            shopping_list=shopping_list_obj, normalized_name=name
+                        )
+                        for name in ingredients_to_remove - ingredients_to_restore
+                    ],
+                    ignore_conflicts=True,
+                )
+                if ingredients_to_restore:
+                    ExcludedIngredient.objects.filter(
+                        shopping_list=shopping_list_obj,
+                        normalized_name__in=ingredients_to_restore,
+                    ).delete()
+                # The page changed; make browsers fetch it again (see conditional.py)
+                ShoppingList.objects.filter(pk=shopping_list_obj.pk).update(
+                    updated_at=timezone.now()
+                )
 
             return JsonResponse({"success": True})
         except Exception as e:
             return JsonResponse({"success": False, "error": str(e)}, status=400)
 
     # GET request - display the shopping list
-    days = meal_plan.days.all()
-
-    # Dictionary to store ingredients by recipe
-    recipes_with_ingredients = []
-    all_ingredients = []
-    ingredient_counter = {}  # Track how many recipes each ingredient appears in
-
-    for day in days:
-        if day.recipe:
-            # Extract ingredients from the recipe
-            ingredients = extract_ingredients_from_html(day.recipe.item_recipe)
-
-            if ingredients:
-                recipes_with_ingredients.append(
-                    {
-                        "recipe_name": day.recipe.item_name,
-                        "day": day.day_of_week,
-                        "ingredients": ingredients,  # Keep full measurements for "by day" view
-                    }
-                )
-                all_ingredients.extend(ingredients)
-
-                # Strip measurements and count occurrences
-                for ingredient in ingredients:
-                    cleaned_ingredient = strip_measurements_from_ingredient(ingredient)
-                    if cleaned_ingredient:
-                        if cleaned_ingredient in ingredient_counter:
-                            ingredient_counter[cleaned_ingredient] += 1
-                        else:
-                            ingredient_counter[cleaned_ingredient] = 1
-
-    # Get excluded ingredients from session
-    excluded_ingredients = []
-    if "excluded_ingredients" in request.session:
-        plan_key = f"plan_{plan_id}"
-        excluded_ingredients = request.session["excluded_ingredients"].get(plan_key, [])
+    # The compiled list is cached until the plan's days or recipes change,
+    # so repeat views don't touch the ingredients at all (see shopping.py)
+    # The totals (ingredient, count, amounts) come sorted from a GROUP BY query
+    recipes_with_ingredients, ingredient_totals = get_compiled_shopping_list(plan_id)
+
+    # Get the ingredients the user already has, as a set (one query)
+    excluded_ingredients = set(
+        ExcludedIngredient.objects.filter(
+            shopping_list__meal_plan_id=plan_id
+        ).values_list("normalized_name", flat=True)
+    )
 
     # Filter out excluded ingredients
-    ingredient_counter = {
-        k: v for k, v in ingredient_counter.items() if k not in excluded_ingredients
+    ingredients_with_counts = [
+        row for row in ingredient_totals if row[0] not in excluded_ingredients
+    ]
+
+    # The ingredients field stores a simple text list without measurements
+    ingredient_list_text = format_shopping_list(ingredients_with_counts)
+    ingredient_list_hash = content_hash(ingredient_list_text)
+
+    # Get or create the shopping list, and only write to the database
+    # when the list actually changed
+    shopping_list_obj, created = ShoppingList.objects.get_or_create(
+        meal_plan=meal_plan,
+        defaults={
+            "ingredients": ingredient_list_text,
+            "content_hash": ingredient_list_hash,
+        },
+    )
+    changed = created
+    if shopping_list_obj.content_hash != ingredient_list_hash:
+        shopping_list_obj.ingredients = ingredient_list_text
+        shopping_list_obj.content_hash = ingredient_list_hash
+        shopping_list_obj.save(
+            update_fields=["ingredients", "content_hash", "updated_at"]
+        )
+        changed = True
+    if changed:
+        # updated_at moved on: the ETag computed before the view is stale
+        page_changed(request)
+
+    context = {
+        "meal_plan": meal_plan,
+        "recipes_with_ingredients": recipes_with_ingredients,
+        "ingredients_with_counts": ingredients_with_counts,  # (ingredient, count, amounts)
+        "shopping_list": shopping_list_obj,
     }
 
-    # Convert to list of tuples (ingredient, count) and sort alphabetically
-    ingredients_with_counts = sorted(ingredient_counter.items(), key=lambda x: x[0])
+    return render(request, "food_application/meal_planning/shopping_list.html", context)
 
-    # Get or create the shopping list
-    shopping_list_obj, created = ShoppingList.objects.get_or_create(meal_plan=meal_plan)
 
-    # Update the ingredients field (storing as a simple text list without measurements)
-    ingredient_list_text = []
-    for ingredient, count in ingredients_with_counts:
-        if count > 1:
-            ingredient_list_text.append(f"{ingredient} (in {count} recipes)")
-        else:
-            ingredient_list_text.append(ingredient)
+# Session, user, plans, days, ingredient lines, totals
+@query_budget(6)
+def combined_shopping_list(request):
+    """
+    One shopping list for several meal plans: ?plans=1&plans=2 (or ?plans=1,2).
 
-    shopping_list_obj.ingredients = "\n".join(ingredient_list_text)
-    shopping_list_obj.save()
+    The plans' days and the ingredients of their distinct recipes are read
+    with one query each (see compile_combined_shopping_list()), however many
+    plans there are. The list is read-only: the ingredients removed from a
+    plan's own shopping list stay on it.
+    """
+    try:
+        plan_ids = {
+            int(plan_id)
+            for value in request.GET.getlist("plans")
+            for plan_id in value.split(",")
+            if plan_id.strip()
+        }
+    except ValueError:
+        return HttpResponseBadRequest("plans must be meal plan ids")
+    if not plan_ids:
+        return HttpResponseBadRequest("Choose at least one meal plan")
+    if len(plan_ids) > MAX_COMBINED_PLANS:
+        return HttpResponseBadRequest(
+            f"A combined list can cover at most {MAX_COMBINED_PLANS} meal plans"
+        )
+
+    meal_plans = list(
+        MealPlan.objects.filter(id__in=plan_ids)
+        .only("id", "name", "created_at")
+        .order_by("-created_at", "-id")
+    )
+    if len(meal_plans) != len(plan_ids):
+        raise Http404("Meal plan not found")
 
+    recipes_with_ingredients, ingredients_with_counts = compile_combined_shopping_list(
+        plan_ids
+    )
     context = {
-        "meal_plan": meal_plan,
+        "meal_plans": meal_plans,
         "recipes_with_ingredients": recipes_with_ingredients,
-        "ingredients_with_counts": ingredients_with_counts,  # List of (ingredient, count) tuples
-        "shopping_list": shopping_list_obj,
+        "ingredients_with_counts": ingredients_with_counts,
     }
+    return render(
+        request,
+        "food_application/meal_planning/combined_shopping_list.html",
+        context,
+    )
 
-    return render(request, "food_application/meal_planning/shopping_list.html", context)
+
+def export_response(request, export_func, name):
+    """
+    Stream an export (see exports.py) as a file download.
+
+    ?format=jsonl (default) or csv; ?cursor=<updated_at>,<id> only exports
+    the rows changed after that cursor.
+    """
+    export_format = request.GET.get("format", "jsonl")
+    if export_format not in exports.EXPORT_FORMATS:
+        return HttpResponseBadRequest("format must be jsonl or csv")
+    try:
+        lines = export_func(export_format, cursor=request.GET.get("cursor"))
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    content_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    response = StreamingHttpResponse(lines, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{name}.{export_format}"'
+    return response
+
+
+@login_required
+def export_recipes(request):
+    """Download the recipe catalog as JSONL or CSV."""
+    return export_response(request, exports.export_recipes, "recipes")
+
+
+@login_required
+def export_meal_plans(request):
+    """Download the saved meal plans, with their days, as JSONL or CSV."""
+    return export_response(request, exports.export_meal_plans, "meal-plans")
@@ -0,0 +1,170 @@
+"""
+Warm-up of a freshly started process, before it serves requests.
+
+Right after a deploy, the first requests of every worker would otherwise
+import the views, compile templates, build the URL resolver and fill the
+caches from cold. warm_up() does all of it up front, in phases:
+
+    imports     the modules the request path imports lazily
+    templates   load (and so compile, with the cached loader) every
+                template of every engine
+    urls        populate the URL resolver, then reverse and resolve every
+                named route
+    caches      the recipe id list, the detail bodies of the
+                WARMUP_RECIPES most recently updated recipes and the recipe
+                cards of the first home page
+
+It runs from ``python manage.py warmup``, or from
+FoodApplicationConfig.ready() when WARMUP_ON_STARTUP is on. With a server
+that loads the application before forking its workers (gunicorn
+--preload), the workers then start with everything in memory; the
+database connections are closed at the end so no worker inherits one.
+"""
+
+import importlib
+import logging
+import os
+import time
+import uuid
+
+from django.db import DatabaseError, connections
+from django.http import HttpRequest
+from django.template import TemplateSyntaxError, engines
+from django.template.loader import render_to_string
+from django.urls import NoReverseMatch, URLResolver, converters, get_resolver
+from django.urls import resolve, reverse
+
+logger = logging.getLogger("food_application.warmup")
+
+WARMUP_PHASES = ["imports", "templates", "urls", "caches"]
+
+# Imported by views, forms and templates on first use
+HEAVY_MODULES = [
+    "food_application.views",
+    "food_application.async_views",
+    "food_application.exports",
+    "food_application.shopping",
+    "django.contrib.admin.templatetags.admin_list",
+    "tinymce.widgets",
+    "widget_tweaks.templatetags.widget_tweaks",
+    "PIL.Image",
+    "PIL.WebPImagePlugin",
+    "PIL.JpegImagePlugin",
+]
+
+
+def warm_up(phases=None, recipes=100):
+    """Run the phases (all by default); returns [(phase, seconds, summary)]."""
+    timings = []
+    for phase in phases or WARMUP_PHASES:
+        started = time.perf_counter()
+        summary = PHASES[phase](recipes=recipes)
+        seconds = time.perf_counter() - started
+        logger.info("Warm-up %s: %.3fs (%s)", phase, seconds, summary)
+        timings.append((phase, seconds, summary))
+    connections.close_all()
+    return timings
+
+
+def warm_imports(**kwargs):
+    for module in HEAVY_MODULES:
+        importlib.import_module(module)
+    return f"{len(HEAVY_MODULES)} modules"
+
+
+def warm_templates(**kwargs):
+    loaded = failed = 0
+    for engine in engines.all():
+        for directory in engine.template_dirs:
+            for root, _, files in os.walk(directory):
+                for file_name in files:
+                    name = os.path.relpath(os.path.join(root, file_name), directory)
+                    try:
+                        engine.get_template(name.replace(os.sep, "/"))
+                    except (TemplateSyntaxError, UnicodeDecodeError):
+                        failed += 1  # Not a Django template (e.g. a .js file)
+                    else:
+                        loaded += 1
+    return f"{loaded} templates compiled, {failed} skipped"
+
+
+def sample_value(converter):
+    """A value the path converter accepts, to reverse a route with."""
+    if isinstance(converter, converters.IntConverter):
+        return 1
+    if isinstance(converter, converters.UUIDConverter):
+        return uuid.UUID(int=0)
+    return "warmup"
+
+
+def named_routes(resolver, namespace="", parent_converters=None):
+    """Yield (name, converters) for every named route under the resolver."""
+    for pattern in resolver.url_patterns:
+        route_converters = {
+            **(parent_converters or {}),
+            **getattr(pattern.pattern, "converters", {}),
+        }
+        if isinstance(pattern, URLResolver):
+            prefix = f"{namespace}{pattern.namespace}:" if pattern.namespace else ""
+            yield from named_routes(pattern, prefix or namespace, route_converters)
+        elif pattern.name:
+            yield f"{namespace}{pattern.name}", route_converters
+
+
+def warm_urls(**kwargs):
+    from django.contrib import admin
+
+    # The admin's URLs list the registered models, which may not all be
+    # registered yet when this runs from AppConfig.ready()
+    admin.autodiscover()
+    resolved = skipped = 0
+    for name, route_converters in named_routes(get_resolver()):
+        kwargs = {key: sample_value(value) for key, value in route_converters.items()}
+        try:
+            resolve(reverse(name, kwargs=kwargs))
+        except NoReverseMatch:
+            skipped += 1  # Regex routes (e.g. the admin's app_list)
+        else:
+            resolved += 1
+    return f"{resolved} named routes resolved, {skipped} skipped"
+
+
+def warm_caches(recipes=100, **kwargs):
+    from .models import Item
+    from .page_cache import recipe_detail_cache
+    from .sampling import recipe_sampler
+    from .views import IndexClassView, RecipeDetailView
+
+    try:
+        recipe_count = len(recipe_sampler.ids())
+
+        bodies = 0
+        for item in Item.objects.order_by("-updated_at")[:recipes]:
+            recipe_detail_cache.set(
+                item.pk,
+                render_to_string(
+                    RecipeDetailView.body_template_name,
+                    {RecipeDetailView.context_object_name: item},
+                ),
+            )
+            bodies += 1
+
+        view = IndexClassView()
+        view.setup(HttpRequest())
+        cards = view.get_queryset()
+        for item in cards:
+            render_to_string("food_application/home/recipe_card.html", {"item": item})
+    except DatabaseError as error:  # e.g. before the first migrate
+        return f"skipped: {error}"
+    return (
+        f"{recipe_count} recipe ids, {bodies} detail pages, "
+        f"{len(cards)} home page cards"
+    )
+
+
+PHASES = {
+    "imports": warm_imports,
+    "templates": warm_templates,
+    "urls": warm_urls,
+    "caches": warm_caches,
+}
@@ -1,8 +1,10 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from .thumbnails import delete_thumbnails, generate_thumbnails, thumbnail_executor
+
 
 # Create your models here.
 class Profile(models.Model):
@@ -18,6 +20,14 @@ class Profile(models.Model):
     def __str__(self):
         return f"{self.user.username}'s Profile"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered to tell when the image changes (see update_thumbnails)
+        if "image" in field_names:
+            instance._loaded_image = instance.image.name
+        return instance
+
 
 # Signal: Automatically create Profile when User is created
 @receiver(post_save, sender=User)
@@ -33,3 +43,37 @@ def save_user_profile(sender, instance, **kwargs):
         instance.profile.save()
     except Profile.DoesNotExist:
         Profile.objects.create(user=instance)
+
+
+# Signal: Create the thumbnails of a new image in the background, and drop
+# those of the image it replaced (see users/thumbnails.py). The default image
+# is shared by every new profile: its thumbnails are made on first use only
+@receiver(post_save, sender=Profile)
+def update_thumbnails(sender, instance, created, **kwargs):
+    old_name = getattr(instance, "_loaded_image", None)
+    new_name = instance.image.name
+    if not created and old_name == new_name:
+        return
+    instance._loaded_image = new_name
+    if old_name and old_name != default_image():
+        discard_thumbnails(old_name)
+    if new_name and new_name != default_image():
+        transaction.on_commit(
+            lambda: thumbnail_executor.submit(generate_thumbnails, new_name)
+        )
+
+
+@receiver(post_delete, sender=Profile)
+def delete_profile_thumbnails(sender, instance, **kwargs):
+    if instance.image.name and instance.image.name != default_image():
+        discard_thumbnails(instance.image.name)
+
+
+def default_image():
+    return Profile._meta.get_field("image").default
+
+
+def discard_thumbnails(name):
+    """Delete an image's thumbnails unless another profile still shows it."""
+    if not Profile.objects.filter(image=name).exists():
+        delete_thumbnails(name)
@@ -0,0 +1,16 @@
+from django import template
+
+from users.thumbnails import thumbnail_url as get_thumbnail_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def thumbnail_url(image, size, image_format="webp"):
+    """
+    URL of a square variant of an ImageField file (see users/thumbnails.py).
+
+    Usage: {% thumbnail_url user.profile.image 128 %}
+    or {% thumbnail_url user.profile.image 128 "jpeg" %}
+    """
+    return get_thumbnail_url(image, int(size), image_format)
@@ -1,3 +1,81 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from .thumbnails import thumbnail_dir, thumbnail_executor
+
+
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.profile = User.objects.create(username="cook").profile
+
+    def upload(self, name):
+        output = BytesIO()
+        Image.new("RGB", (1200, 800), "orange").save(output, "JPEG")
+        return default_storage.save(name, ContentFile(output.getvalue()))
+
+    def render(self, size, image_format="webp"):
+        return Template(
+            "{% load thumbnails %}{% thumbnail_url image size image_format %}"
+        ).render(
+            Context(
+                {
+                    "image": self.profile.image,
+                    "size": size,
+                    "image_format": image_format,
+                }
+            )
+        )
+
+    def test_variants_are_generated_once(self):
+        self.profile.image = self.upload("profile_images/photo.jpg")
+        self.profile.save()
+
+        url = self.render(100)  # Rounded up to 128
+        self.assertTrue(url.endswith("/128.webp"))
+        name = url.removeprefix("/media/")
+        with default_storage.open(name) as variant, Image.open(variant) as image:
+            self.assertEqual((image.format, image.size), ("WEBP", (128, 128)))
+        modified = default_storage.get_modified_time(name)
+        self.assertEqual(self.render(128), url)
+        self.assertEqual(default_storage.get_modified_time(name), modified)
+        self.assertTrue(self.render(64, "jpeg").endswith("/64.jpeg"))
+
+    def test_changing_the_image_drops_the_old_variants(self):
+        old_name = self.upload("profile_images/old.jpg")
+        self.profile.image = old_name
+        self.profile.save()
+        self.render(64)
+        self.assertEqual(len(default_storage.listdir(thumbnail_dir(old_name))[1]), 1)
+
+        self.profile.image = self.upload("profile_images/new.jpg")
+        self.profile.save()
+        self.assertEqual(default_storage.listdir(thumbnail_dir(old_name))[1], [])
+
+    def test_missing_image_falls_back_to_the_original(self):
+        with self.assertLogs("users.thumbnails", "WARNING"):
+            self.assertEqual(self.render(64), self.profile.image.url)
+
+    def test_only_uploaded_images_are_generated_in_the_background(self):
+        with mock.patch.object(thumbnail_executor, "submit") as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                User.objects.create(username="baker")  # The default image
+            submit.assert_not_called()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.profile.image = self.upload("profile_images/photo.jpg")
+                self.profile.save()
+            submit.assert_called_once()
@@ -0,0 +1,137 @@
+"""
+Small, cached variants of Profile images.
+
+The original upload can be several MB, while pages show it as a 64-256 px
+avatar. thumbnail_url() returns the URL of a square variant of the image in
+one of THUMBNAIL_SIZES and THUMBNAIL_FORMATS, generating it on first use.
+Variants are stored with the default storage under THUMBNAIL_DIR (in
+MEDIA_ROOT), in a directory named after a hash of the original's name:
+
+    thumbnails/<hash>/128.webp
+
+Uploads never overwrite an existing file (Django picks a new name), so a
+new image always gets new variants. When a profile's image changes, the
+signals in users/models.py delete the old image's variants unless another
+profile still uses it, and generate the new ones in a background thread so
+that the first page view finds them ready. The default image every new
+profile starts with is left out; its variants are made on first use.
+"""
+
+import hashlib
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+
+# Generation is CPU-bound and rare, two threads are plenty
+thumbnail_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="thumbnails")
+
+# One lock per variant, so that two requests don't both create it, while
+# different images are generated in parallel. Striped to keep the number of
+# locks bounded: variants with the same slot merely wait for each other
+_generation_locks = [threading.Lock() for _ in range(32)]
+
+
+def thumbnail_sizes():
+    return sorted(getattr(settings, "THUMBNAIL_SIZES", [64, 128, 256]))
+
+
+def thumbnail_dir(name):
+    digest = hashlib.sha1(name.encode()).hexdigest()[:16]
+    return posixpath.join(getattr(settings, "THUMBNAIL_DIR", "thumbnails"), digest)
+
+
+def thumbnail_name(name, size, image_format):
+    return posixpath.join(thumbnail_dir(name), f"{size}.{image_format}")
+
+
+def generation_lock(variant):
+    return _generation_locks[hash(variant) % len(_generation_locks)]
+
+
+def snap_size(size):
+    """The smallest available size at least as large as size (or the largest)."""
+    sizes = thumbnail_sizes()
+    return next((available for available in sizes if available >= size), sizes[-1])
+
+
+def make_thumbnail(source, size, image_format):
+    """Encode a size x size, centre-cropped variant of the image file source."""
+    with Image.open(source) as image:
+        # Lets the JPEG decoder downscale while decoding, much faster for
+        # large photos
+        image.draft("RGB", (size, size))
+        image = ImageOps.exif_transpose(image)
+        if image_format == "jpeg" or image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if image_format == "webp" else "RGB")
+        image = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        output = BytesIO()
+        image.save(
+            output,
+            THUMBNAIL_FORMATS[image_format],
+            quality=getattr(settings, "THUMBNAIL_QUALITY", 85),
+        )
+    return output.getvalue()
+
+
+def generate_thumbnail(name, size, image_format):
+    """Create the variant if it doesn't exist yet; returns its storage name."""
+    variant = thumbnail_name(name, size, image_format)
+    if default_storage.exists(variant):
+        return variant
+    with generation_lock(variant):
+        if not default_storage.exists(variant):
+            with default_storage.open(name, "rb") as source:
+                content = make_thumbnail(source, size, image_format)
+            default_storage.save(variant, ContentFile(content))
+    return variant
+
+
+def generate_thumbnails(name):
+    """Create every variant of an image (run in thumbnail_executor)."""
+    for size in thumbnail_sizes():
+        for image_format in THUMBNAIL_FORMATS:
+            try:
+                generate_thumbnail(name, size, image_format)
+            except (OSError, ValueError):
+                logger.exception("Cannot create thumbnails of %s", name)
+                return
+
+
+def delete_thumbnails(name):
+    directory = thumbnail_dir(name)
+    try:
+        _, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for file_name in files:
+        default_storage.delete(posixpath.join(directory, file_name))
+
+
+def thumbnail_url(image, size, image_format="webp"):
+    """
+    URL of a variant of the ImageField file image, generating it if needed.
+
+    Falls back to the original's URL if it can't be read as an image, and
+    returns "" if there is no image.
+    """
+    if not image:
+        return ""
+    if image_format not in THUMBNAIL_FORMATS:
+        raise ValueError(f"Unknown thumbnail format: {image_format!r}")
+    try:
+        variant = generate_thumbnail(image.name, snap_size(size), image_format)
+    except (OSError, ValueError):
+        logger.warning("Cannot create a thumbnail of %s", image.name, exc_info=True)
+        return image.url
+    return default_storage.url(variant)